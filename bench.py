@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Bench                                                                #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Mikrobenchmarky horkých cest herní logiky (GameEngine, Tetrominoe, Bot)      #
+# a highscores. Každý benchmark pracuje nad pevnou deskou a posloupností       #
+# tetromin se seedem, měří počet operací za sekundu a špičku alokované paměti  #
+# (tracemalloc) na jednu dávku operací. Výsledky lze uložit jako baseline      #
+# a při dalším běhu s ní porovnat; zpomalení nad toleranci vrátí nenulový      #
+# návratový kód.                                                               #
+#                                                                              #
+# Metody GameBoard jen předávají práci enginu, měří se proto přímo GameEngine. #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python bench.py --save-baseline bench_baseline.json                      #
+#   $ python bench.py --baseline bench_baseline.json --tolerance 0.2           #
+#                                                                              #
+################################################################################
+
+
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+from engine import GameEngine, GamePhase, Tetrominoe, TetrominoeShape
+import highscores
+import bot
+
+
+
+
+# seed všech náhodných fixtur
+SEED = 1234
+# počet operací v dávce, pro kterou se měří alokace
+ALLOCATION_BATCH = 100
+
+
+
+def fixtureEngine(fullLines=0):
+    '''
+    Engine s rozehranou deskou: spodních 8 řádků je zaplněno až na pevně
+    zvolené díry, navíc fullLines zcela plných řádků nad nimi.
+    '''
+    rng = random.Random(SEED)
+    engine = GameEngine(seed=SEED)
+    for y in range(8):
+        holes = set(rng.sample(range(engine.width), 2))
+        for x in range(engine.width):
+            if x not in holes:
+                engine.rows[y] |= 1 << x
+                engine.colors[y][x] = rng.randint(1, TetrominoeShape.count)
+    for y in range(8, 8 + fullLines):
+        engine.rows[y] = engine.fullRow
+        engine.colors[y] = [TetrominoeShape.IShape] * engine.width
+    for x in range(engine.width):
+        height = engine.height
+        while height and not engine.rows[height - 1] >> x & 1:
+            height -= 1
+        engine.columnHeights[x] = height
+    return engine
+
+
+
+def copyBoard(source, target):
+    # obnoví desku target do stavu desky source
+    target.rows[:] = source.rows
+    target.colors[:] = [list(row) for row in source.colors]
+    target.columnHeights[:] = source.columnHeights
+    target.currentTetrominoe = None
+    target.fullLines = []
+    target.phase = GamePhase.Falling
+
+
+
+# Benchmarky: každá funkce připraví fixturu a vrátí funkci provádějící
+# jednu měřenou operaci.
+
+def benchStep():
+    fixture = fixtureEngine()
+    engine = fixtureEngine()
+    def op():
+        # pád, umisťování a generování tetromin; po konci hry začneme znovu
+        engine.step()
+        if engine.phase == GamePhase.GameOver:
+            copyBoard(fixture, engine)
+    return op
+
+
+def benchMove():
+    engine = fixtureEngine()
+    engine.spawn(Tetrominoe(shape=TetrominoeShape.TShape))
+    direction = [1]
+    def op():
+        if not engine.move(direction[0], 0):
+            direction[0] = -direction[0]
+    return op
+
+
+def benchRotate():
+    engine = fixtureEngine()
+    engine.spawn(Tetrominoe(shape=TetrominoeShape.LShape))
+    engine.move(0, -3)
+    return engine.rotate
+
+
+def benchCanPlace():
+    engine = fixtureEngine()
+    engine.spawn(Tetrominoe(shape=TetrominoeShape.JShape))
+    tetrominoe = engine.currentTetrominoe
+    position = engine.currentPosition
+    def op():
+        engine.canPlaceTetrominoe(tetrominoe, position, 0, -1)
+    return op
+
+
+def benchDropDistance():
+    engine = fixtureEngine()
+    engine.spawn(Tetrominoe(shape=TetrominoeShape.SShape))
+    return engine.dropDistance
+
+
+def benchMarkFullLines():
+    engine = fixtureEngine(fullLines=4)
+    return engine.markFullLines
+
+
+def benchClearLines():
+    fixture = fixtureEngine(fullLines=4)
+    engine = fixtureEngine(fullLines=4)
+    def op():
+        # včetně obnovení desky, jinak by nebylo co mazat
+        copyBoard(fixture, engine)
+        engine.markFullLines()
+        engine.clearLines()
+    return op
+
+
+def benchTetrominoeRotate():
+    return Tetrominoe(shape=TetrominoeShape.TShape).rotate
+
+
+def benchBestPlacement():
+    engine = fixtureEngine()
+    engine.spawn(Tetrominoe(shape=TetrominoeShape.TShape))
+    player = bot.Bot()
+    def op():
+        player.bestPlacement(engine)
+    return op
+
+
+def benchAddHighscore(records):
+    table = highscores.Highscores(records)
+    rng = random.Random(SEED)
+    for i in range(records):
+        table.addHighscore("hrac%d" % i, rng.randrange(1000000))
+    def op():
+        table.addHighscore("novy", rng.randrange(1000000))
+    return op
+
+
+def benchStoreHighscore(records, directory, cleanup):
+    # addHighscore včetně zápisu do databáze (jedna transakce na záznam);
+    # databáze se zavře po měření (cleanup je contextlib.ExitStack)
+    fileName = os.path.join(directory, "highscores-%d.db" % records)
+    table = highscores.Highscores(records)
+    table.open(fileName, None)
+    cleanup.callback(table.close)
+    rng = random.Random(SEED)
+    for i in range(records):
+        table.addHighscore("hrac%d" % i, rng.randrange(1000000))
+    def op():
+        table.addHighscore("novy", rng.randrange(1000000))
+    return op
+
+
+def benchImportData(records, directory):
+    fileName = os.path.join(directory, "highscores-%d.txt" % records)
+    table = highscores.Highscores(records)
+    rng = random.Random(SEED)
+    table._setRecords(sorted((("hrac%d" % i, rng.randrange(1000000)) for i in range(records)),
+                             key=lambda record: record[1], reverse=True))
+    table.exportData(fileName)
+    def op():
+        highscores.Highscores(records).importData(fileName)
+    return op
+
+
+
+def measure(op, minTime, repeats):
+    '''
+    Vrací nejlepší naměřený počet operací za sekundu z repeats opakování,
+    z nichž každé trvá alespoň minTime sekund.
+    '''
+    best = 0.0
+    for i in range(repeats):
+        count = 0
+        batch = 1
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < minTime:
+            for j in range(batch):
+                op()
+            count += batch
+            batch *= 2
+            elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed)
+    return best
+
+
+def measureAllocations(op, count):
+    '''
+    Vrací špičku paměti (v bajtech) alokované během count operací.
+    '''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        for i in range(count):
+            op()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mikrobenchmarky QTetrisu.")
+    parser.add_argument("--filter", default="", help="spustí jen benchmarky, jejichž jméno obsahuje tento text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimální doba jednoho měření v sekundách")
+    parser.add_argument("--repeats", type=int, default=3, help="počet opakování měření (bere se nejlepší)")
+    parser.add_argument("--highscore-records", type=int, default=2000, help="velikost tabulky highscores")
+    parser.add_argument("--baseline", help="JSON s baseline, se kterou se výsledky porovnají")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="povolené relativní zpomalení oproti baseline")
+    parser.add_argument("--save-baseline", help="uloží výsledky jako baseline do zadaného JSON")
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    # dočasné soubory benchmarků (databáze, xml) se na konci smažou; co setup
+    # benchmarku zaregistruje do cleanup, se uvolní hned po jeho měření
+    with tempfile.TemporaryDirectory(prefix="qtetris-bench-") as directory:
+        cleanup = contextlib.ExitStack()
+        records = args.highscore_records
+        benchmarks = (
+            ("GameEngine.step", benchStep),
+            ("GameEngine.move", benchMove),
+            ("GameEngine.rotate", benchRotate),
+            ("GameEngine.canPlaceTetrominoe", benchCanPlace),
+            ("GameEngine.dropDistance", benchDropDistance),
+            ("GameEngine.markFullLines", benchMarkFullLines),
+            ("GameEngine.clearLines", benchClearLines),
+            ("Tetrominoe.rotate", benchTetrominoeRotate),
+            ("Bot.bestPlacement", benchBestPlacement),
+            ("Highscores.addHighscore[%d]" % records, lambda: benchAddHighscore(records)),
+            ("Highscores.addHighscore[%d, db]" % records, lambda: benchStoreHighscore(records, directory, cleanup)),
+            ("Highscores.importData[%d]" % records, lambda: benchImportData(records, directory)),
+        )
+
+        results = {}
+        regressions = []
+        print("%-36s %14s %14s %10s" % ("benchmark", "ops/s", "peak alloc B", "vs base"))
+        for name, setup in benchmarks:
+            if args.filter not in name:
+                continue
+            # highscores jsou řádově pomalejší => měříme je kratšími dávkami
+            slow = name.startswith("Highscores.importData")
+            with cleanup:
+                opsPerSecond = measure(setup(), args.min_time, 1 if slow else args.repeats)
+            with cleanup:
+                allocated = measureAllocations(setup(), 1 if slow else ALLOCATION_BATCH)
+            results[name] = {"opsPerSecond": opsPerSecond, "allocatedBytes": allocated}
+
+            comparison = ""
+            if name in baseline:
+                ratio = opsPerSecond / baseline[name]["opsPerSecond"]
+                comparison = "%+.1f %%" % ((ratio - 1) * 100)
+                if ratio < 1 - args.tolerance:
+                    regressions.append(name)
+                    comparison += " !"
+            print("%-36s %14.0f %14d %10s" % (name, opsPerSecond, allocated, comparison))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if regressions:
+        print("regressions (slower than %d %% of baseline): %s"
+              % ((1 - args.tolerance) * 100, ", ".join(regressions)), file=sys.stderr)
+        return 1
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
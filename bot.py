@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Bot                                                                  #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Počítačový hráč QTetrisu. Pro padající tetromino projde všechna umístění     #
+# (natočení, sloupec), do kterých jej lze shora spustit, a každé ohodnotí      #
+# váženou heuristikou (výška zdi, díry, hrbolatost, zbourané řady). Místo      #
+# opakovaného zkoušení canPlaceTetrominoe() se místo dopadu počítá přímo       #
+# z výšek sloupců udržovaných enginem a výsledná deska se vyhodnocuje nad      #
+# bitovými maskami řádků.                                                      #
+#                                                                              #
+################################################################################
+
+
+
+from engine import Tetrominoe, TetrominoeShape
+
+
+
+
+def _distinctRotations(shape):
+    # natočení tvaru, která dávají navzájem různé čtveřice bodů
+    # (tvar O má jen jedno, ostatní čtyři)
+    rotations = []
+    seen = set()
+    for rotation, points in enumerate(Tetrominoe.rotationsTable[shape]):
+        if points not in seen:
+            seen.add(points)
+            rotations.append((rotation, points))
+    return tuple(rotations)
+
+# distinctRotations[shape] je n-tice dvojic (natočení, body)
+distinctRotations = (None,) + tuple(_distinctRotations(shape) for shape in range(1, TetrominoeShape.count + 1))
+
+
+
+def enumeratePlacements(engine, shape):
+    '''
+    Generuje všechna umístění tetromina tvaru shape, do kterých jej lze shora
+    svisle spustit, jako trojice (natočení, x, y), kde (x, y) je poloha
+    těžiště po dopadu. Místo dopadu se počítá z engine.columnHeights.
+    '''
+    width = engine.width
+    height = engine.height
+    columnHeights = engine.columnHeights
+
+    for rotation, points in distinctRotations[shape]:
+        minX = -min(x for x, y in points)
+        maxX = width - 1 - max(x for x, y in points)
+        topY = max(y for x, y in points)
+        for baseX in range(minX, maxX + 1):
+            # těžiště dopadne tak, aby žádný čtvereček neležel pod vrcholem
+            # svého sloupce
+            baseY = max(columnHeights[baseX + x] - y for x, y in points)
+            if baseY + topY < height:
+                yield rotation, baseX, baseY
+
+
+
+def placementFeatures(rows, width, points, baseX, baseY):
+    '''
+    Umístí body tetromina do kopie řádků rows, smaže plné řádky a vrátí
+    příznaky výsledné desky jako n-tici
+    (zbourané řady, součet výšek sloupců, díry, hrbolatost).
+    '''
+    rows = list(rows)
+    for x, y in points:
+        rows[baseY + y] |= 1 << (baseX + x)
+
+    fullRow = (1 << width) - 1
+    lines = 0
+    for y in sorted(set(baseY + y for x, y in points), reverse=True):
+        if rows[y] == fullRow:
+            del rows[y]
+            lines += 1
+
+    # průchod shora dolů: covered jsou sloupce, ve kterých už jsme narazili
+    # na obsazené políčko, prázdná políčka pod nimi jsou díry
+    heights = [0] * width
+    covered = 0
+    holes = 0
+    for y in range(len(rows) - 1, -1, -1):
+        row = rows[y]
+        if not covered and not row:
+            # prázdné řádky nad zdí přeskočíme
+            continue
+        new = row & ~covered
+        if new:
+            covered |= new
+            x = 0
+            while new:
+                if new & 1:
+                    heights[x] = y + 1
+                new >>= 1
+                x += 1
+        holes += bin(covered & ~row).count("1")
+
+    bumpiness = 0
+    for x in range(width - 1):
+        bumpiness += abs(heights[x] - heights[x + 1])
+
+    return lines, sum(heights), holes, bumpiness
+
+
+
+class Bot(object):
+    '''
+    Hráč volící pro každé tetromino umístění s nejlepším ohodnocením
+    lines*linesWeight + height*heightWeight + holes*holesWeight
+    + bumpiness*bumpinessWeight.
+    '''
+
+    # váhy heuristiky (převzaté z běžně používaného nastavení tetrisových botů)
+    LINES_WEIGHT = 0.760666
+    HEIGHT_WEIGHT = -0.510066
+    HOLES_WEIGHT = -0.35663
+    BUMPINESS_WEIGHT = -0.184483
+
+
+    def __init__(self, linesWeight=LINES_WEIGHT, heightWeight=HEIGHT_WEIGHT,
+            holesWeight=HOLES_WEIGHT, bumpinessWeight=BUMPINESS_WEIGHT):
+        self.weights = (linesWeight, heightWeight, holesWeight, bumpinessWeight)
+
+
+    def evaluate(self, features):
+        return sum(weight * feature for weight, feature in zip(self.weights, features))
+
+
+    def bestPlacement(self, engine):
+        '''
+        Vrátí nejlépe ohodnocené umístění padajícího tetromina jako dvojici
+        (natočení, x), případně None, nelze-li tetromino nikam umístit.
+        '''
+        tetrominoe = engine.currentTetrominoe
+        if not tetrominoe:
+            return None
+
+        # engine.rows obsahuje jen napevno umístěná políčka, placementFeatures()
+        # si je kopíruje
+        rows = engine.rows
+        rotationsTable = Tetrominoe.rotationsTable[tetrominoe.shape]
+        best = None
+        bestValue = None
+        for rotation, x, y in enumeratePlacements(engine, tetrominoe.shape):
+            value = self.evaluate(placementFeatures(rows, engine.width, rotationsTable[rotation], x, y))
+            if bestValue is None or value > bestValue:
+                best = (rotation, x)
+                bestValue = value
+        return best
+
+
+
+def moveToPlacement(engine, rotation, x):
+    '''
+    Natočí padající tetromino a posune jej do sloupce x (bez pádu).
+    Nejde-li tetromino u horního okraje otočit, zkusí jej nejdřív posunout
+    o jedna dolů. Vrací True, podařilo-li se cílového umístění dosáhnout.
+    '''
+    tetrominoe = engine.currentTetrominoe
+    if not tetrominoe:
+        return False
+
+    for i in range(4):
+        if tetrominoe.rotation == rotation:
+            break
+        if not engine.rotate() and not (engine.move(0, -1) and engine.rotate()):
+            return False
+
+    relX = 1 if x > engine.currentPosition[0] else -1
+    while engine.currentPosition[0] != x:
+        if not engine.move(relX, 0):
+            return False
+    return True
+
+
+
+_defaultBot = Bot()
+
+def aiPolicy(engine):
+    '''
+    Strategie pro simulate.py hrající pomocí Bot s výchozími vahami.
+    '''
+    return _defaultBot.bestPlacement(engine)
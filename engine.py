@@ -0,0 +1,707 @@
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   GameEngine                                                           #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Herní logika tetrisu bez jakékoliv závislosti na Qt. Třída GameEngine drží   #
+# stav hrací desky a padajícího tetromina a nabízí operace step, move, rotate, #
+# spawn a lock. Operace nic nevykreslují ani neposílají signály, pouze vrací   #
+# seznam událostí (viz GameEvent), na které může reagovat okenní část hry      #
+# nebo třeba simulace běžící bez GUI.                                          #
+#                                                                              #
+# Ve hře proti soupeřům (versus.py) přibývají na dno desky řádky odpadu        #
+# (addGarbage), vloží se vždy před vygenerováním dalšího tetromina.            #
+#                                                                              #
+################################################################################
+
+
+
+import random
+
+
+
+
+class TetrominoeShape:
+    NoShape = 0
+    OShape = 1
+    TShape = 2
+    SShape = 3
+    ZShape = 4
+    LShape = 5
+    JShape = 6
+    IShape = 7
+    count = 7
+    Flash1 = 8
+    Flash2 = 9
+    # řádky poslané soupeřem (viz GameEngine.addGarbage())
+    Garbage = 10
+
+
+
+#############################################################################
+
+
+
+class Tetrominoe(object):
+    '''
+    Padající tetromino. Je to jen dvojice (tvar, natočení); souřadnice čtverečků
+    pro všechna čtyři natočení každého tvaru jsou předpočítané v rotationsTable,
+    takže otočení ani vytvoření tetromina nic dalšího nealokuje.
+    '''
+    __slots__ = ("shape", "rotation")
+
+    # relativní polohy čtverečků tetromin; (0,0) je těžiště kolem
+    # něhož se tetromino otáčí
+    pointsTable = ((None),                             # NoShape
+                   ((0,0), (1,0),   (0,-1),  (1,-1)),  # OShape
+                   ((0,0), (-1,0),  (1,0),   (0,-1)),  # TShape
+                   ((0,0), (-1,0),  (0,-1),  (1,-1)),  # ZShape
+                   ((0,0), (1,0),   (0,-1),  (-1,-1)), # SShape
+                   ((0,0), (-1,-1), (-1,0),  (1,0)),   # LShape
+                   ((0,0), (-1,0),  (1,0),   (1, -1)), # JShape
+                   ((0,0), (-1,0),  (1,0),   (2,0)),   # IShape
+                   )
+
+
+    # rotationsTable[shape][rotation] je čtveřice relativních souřadnic (x, y);
+    # naplní se hned pod definicí třídy
+    rotationsTable = None
+    # boundsTable[shape][rotation] je čtveřice (minX, maxX, minY, maxY) rozsahu
+    # relativních souřadnic a masksTable[shape][rotation] n-tice dvojic
+    # (relativní y, bitová maska řádku posunutá tak, že bit 0 <=> x = minX);
+    # používá je GameEngine.canPlaceTetrominoe()
+    boundsTable = None
+    masksTable = None
+    # bottomsTable[shape][rotation] je n-tice dvojic (relativní x, nejnižší
+    # relativní y ve sloupci x); používá ji GameEngine.dropDistance()
+    bottomsTable = None
+
+
+    def __init__(self, tetrominoe=None, shape=None, rotation=0):
+        '''
+        Generuje tetromino náhodného (případně zadaného) tvaru.
+        '''
+        if not tetrominoe:
+            self.shape = shape or random.randint(1, TetrominoeShape.count)
+            self.rotation = rotation
+        else:
+            self.shape = tetrominoe.shape
+            self.rotation = tetrominoe.rotation
+
+
+    @property
+    def points(self):
+        # tuple 4x (x, y) pro aktuální natočení
+        return self.rotationsTable[self.shape][self.rotation]
+
+
+    def rotate(self):
+        '''
+        Provádí rotaci tetromina okolo bodu (0,0) ve směru hodinových ručiček.
+        '''
+        self.rotation = (self.rotation + 1) & 3
+
+
+
+def _rotations(shape, points):
+    # čtyři natočení tvaru; každé vzniká otočením předchozího okolo bodu (0,0)
+    # ve směru hodinových ručiček, tvar O se neotáčí
+    rotations = [points]
+    for i in range(3):
+        if shape != TetrominoeShape.OShape:
+            points = tuple((y, -x) for x, y in points)
+        rotations.append(points)
+    return tuple(rotations)
+
+def _bounds(points):
+    xs = [x for x, y in points]
+    ys = [y for x, y in points]
+    return (min(xs), max(xs), min(ys), max(ys))
+
+
+def _masks(points):
+    # body tetromina po řádcích jako bitové masky, nejlevější sloupec je bit 0
+    minX = min(x for x, y in points)
+    masks = {}
+    for x, y in points:
+        masks[y] = masks.get(y, 0) | 1 << (x - minX)
+    return tuple(sorted(masks.items()))
+
+def _bottoms(points):
+    # nejnižší bod tetromina v každém jeho sloupci
+    bottoms = {}
+    for x, y in points:
+        bottoms[x] = min(y, bottoms.get(x, y))
+    return tuple(sorted(bottoms.items()))
+
+Tetrominoe.rotationsTable = (None,) + tuple(_rotations(shape, Tetrominoe.pointsTable[shape])
+                                            for shape in range(1, TetrominoeShape.count + 1))
+Tetrominoe.boundsTable = (None,) + tuple(tuple(_bounds(points) for points in rotations)
+                                         for rotations in Tetrominoe.rotationsTable[1:])
+Tetrominoe.masksTable = (None,) + tuple(tuple(_masks(points) for points in rotations)
+                                        for rotations in Tetrominoe.rotationsTable[1:])
+Tetrominoe.bottomsTable = (None,) + tuple(tuple(_bottoms(points) for points in rotations)
+                                          for rotations in Tetrominoe.rotationsTable[1:])
+
+
+
+#############################################################################
+
+
+
+class GameEvent:
+    '''
+    Názvy událostí, které vrací metody GameEngine. Událost je dvojice
+    (název, parametr); názvy odpovídají Qt signálům třídy GameBoard.
+    '''
+    TetrominoeSpawned = "tetrominoeSpawned"
+    TetrominoeFell = "tetrominoeFell"
+    # parametrem je seznam y-ových souřadnic plných řádků
+    FullLines = "fullLines"
+    # parametrem je počet zbouraných řádků
+    Scored = "scored"
+    GameOver = "gameOver"
+
+
+
+#############################################################################
+
+
+
+class GamePhase:
+    '''
+    Stavy, ve kterých se GameEngine může nacházet (atribut GameEngine.phase).
+    '''
+    # tetromino padá (případně se čeká na vygenerování nového)
+    Falling = "falling"
+    # plné řádky jsou označené a čekají na clearLines(); step() nic nedělá
+    Clearing = "clearing"
+    GameOver = "gameOver"
+
+
+
+#############################################################################
+
+
+
+class GameScore(object):
+    '''
+    Skóre a level jedné hry. Level se neodvíjí od počtu zbouraných řad, ale od
+    toho, kolikrát hráč skóroval (kolikrát se bourání podařilo).
+    '''
+
+    # přidělené skóre se liší podle počtu zbouraných řad
+    SCORE_TABLE = (0, 100, 300, 500, 800)
+    # kolikrát je třeba skórovat, než se postoupí na další level
+    DESTRUCTIONS_TO_LEVEL_UP = 7
+
+    # hra běží s pevným krokem FRAME_RATE snímků za sekundu
+    FRAME_RATE = 60
+    # gravitace se udává v 1/GRAVITY_UNIT políčka za snímek
+    GRAVITY_UNIT = 65536
+    # gravitace podle levelu (GRAVITY[level - 1]): level 1 padá o políčko za 500 ms,
+    # každý další level je o čtvrtinu rychlejší; od levelu 24 (a pro všechny
+    # vyšší) je to 20G, tedy 20 políček za snímek
+    GRAVITY = (2185, 2913, 3884, 5178, 6904, 9206, 12274, 16366, 21821, 29094,
+               38792, 51723, 68964, 91952, 122603, 163471, 217961, 290614, 387486, 516648,
+               688864, 918485, 1224647, 20 * GRAVITY_UNIT)
+
+
+    def __init__(self, destructionsToLevelUp=DESTRUCTIONS_TO_LEVEL_UP):
+        self.destructionsToLevelUp = destructionsToLevelUp
+        self.reset()
+
+
+    def reset(self):
+        self.score = 0
+        self.scoredCount = 0
+        self.lines = 0
+        self.level = 1
+
+
+    def scored(self, linesCount):
+        '''
+        Připočte skóre za linesCount zbouraných řad. Vrací True, pokud hráč
+        zároveň postoupil na další level.
+        '''
+        self.scoredCount += 1
+        self.lines += linesCount
+
+        levelUp = self.scoredCount % self.destructionsToLevelUp == 0
+        if levelUp:
+            self.level += 1
+
+        self.score += self.SCORE_TABLE[linesCount] * self.level
+        return levelUp
+
+
+    def gravity(self):
+        '''
+        Gravitace aktuálního levelu v 1/GRAVITY_UNIT políčka za snímek.
+        '''
+        return self.GRAVITY[min(self.level, len(self.GRAVITY)) - 1]
+
+
+
+#############################################################################
+
+
+
+class GameEngine(object):
+    '''
+        Herní logika tetrisu nezávislá na Qt. Geometrie hrací desky je stejná
+    jako u GameBoard, tedy bod (0,0) je levý dolní roh.
+        Metoda step() odpovídá jednomu tiku časovače: není-li na desce padající
+    tetromino, vygeneruje nové, jinak se jej pokusí posunout o jedna dolů
+    a nepodaří-li se to, tetromino napevno umístí (lock).
+        Deska má dvě vrstvy: rows a colors obsahují jen napevno umístěná
+    políčka a během pádu tetromina se nemění, padající tetromino je nad nimi
+    určeno jen dvojicí currentTetrominoe a currentPosition. Test kolize
+    (canPlaceTetrominoe) proto do desky nic nezapisuje a lze jej volat
+    kdykoliv, např. pro stín tetromina nebo z bota.
+        Plné řádky se při autoClear=True smažou hned při umístění tetromina.
+    Při autoClear=False zůstanou označeny hodnotou TetrominoeShape.Flash1
+    (aby je šlo nechat zablikat), engine přejde do stavu GamePhase.Clearing,
+    ve kterém step() nic nedělá, a řádky smaže až volání clearLines().
+    '''
+
+    # výchozí a největší povolené rozměry hrací desky
+    WIDTH = 10
+    HEIGHT = 19
+    MAX_WIDTH = 64
+    MAX_HEIGHT = 64
+
+
+    def __init__(self, width=WIDTH, height=HEIGHT, autoClear=True, seed=None):
+        self.width = width
+        self.height = height
+        self.autoClear = autoClear
+
+        # vlastní generátor náhodných tvarů, aby šla hra se stejným seedem zopakovat
+        self.random = random.Random()
+        self.seed = None
+        # počet provedených kroků hry (volání step(), která něco udělala)
+        self.tick = 0
+
+        # rows[y] je bitová maska napevno obsazených políček řádku y
+        # (bit x <=> sloupec x), padající tetromino v ní není
+        self.rows = None
+        # colors[y][x] je jedna z hodnot třídy TetrominoeShape (barva napevno
+        # umístěného políčka)
+        self.colors = None
+        # maska zcela zaplněného řádku
+        self.fullRow = (1 << width) - 1
+        # columnHeights[x] je výška sloupce x, tedy o jedna vyšší y-ová souřadnice
+        # nejvyššího napevno umístěného políčka (0 pro prázdný sloupec)
+        self.columnHeights = None
+        self.currentTetrominoe = None
+        # pozice těžiště tetromina (jeho bodu s relativními souřadnicemi (0,0))
+        self.currentPosition = (0, 0)
+        # y-ové souřadnice plných řádků čekajících na smazání
+        self.fullLines = []
+        # jedna z hodnot třídy GamePhase
+        self.phase = GamePhase.Falling
+        # políčka (x, y), jejichž barva se změnila od posledního takeDirtyCells();
+        # dirtyAll znamená, že se změnila celá deska
+        self.dirtyCells = set()
+        self.dirtyAll = True
+        # řádky odpadu od soupeřů čekající na vložení, dvojice (počet, sloupec díry)
+        self.pendingGarbage = []
+
+        self.clear(seed)
+
+
+    def clear(self, seed=None):
+        '''
+        Připraví herní desku pro novou hru. Hra se zadaným seedem vygeneruje
+        vždy stejnou posloupnost tetromin; bez seedu se zvolí náhodný.
+        '''
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.random.seed(self.seed)
+        self.tick = 0
+        self.rows = [0] * self.height
+        self.colors = [[TetrominoeShape.NoShape] * self.width for y in range(self.height)]
+        self.columnHeights = [0] * self.width
+        self.currentTetrominoe = None
+        self.currentPosition = (0, 0)
+        self.fullLines = []
+        self.phase = GamePhase.Falling
+        self.dirtyCells = set()
+        self.dirtyAll = True
+        self.pendingGarbage = []
+
+
+    def takeDirtyCells(self):
+        '''
+        Vrátí množinu políček (x, y) změněných od posledního volání a začne
+        sledovat změny znovu. Vrací None, pokud se změnila celá deska.
+        '''
+        dirtyCells = None if self.dirtyAll else self.dirtyCells
+        self.dirtyCells = set()
+        self.dirtyAll = False
+        return dirtyCells
+
+
+    def markRowsDirty(self, rows):
+        # všechna políčka zadaných řádků budou překreslena
+        if not self.dirtyAll:
+            self.dirtyCells.update((x, y) for y in rows for x in range(self.width))
+
+
+    def step(self):
+        '''
+        Jeden krok hry. Vrací seznam vzniklých událostí.
+        '''
+        if self.phase != GamePhase.Falling:
+            return []
+        self.tick += 1
+
+        # tetromino bylo v předchozím kroku napevno umístěno => je třeba vygenerovat nové
+        if not self.currentTetrominoe:
+            return self.spawn()
+        # tetromino padá dolů
+        if not self.move(0, -1):
+            return self.lock()
+        return []
+
+
+    def fall(self, cells, lock=True):
+        '''
+        Až cells kroků hry najednou (gravitace vyšší než políčko za snímek).
+        Výsledek je stejný jako u cells volání step(), pád o více políček se
+        ale provede jedním posunem podle dropDistance(). Skončí po umístění
+        tetromina; při lock=False už tetromino, které leží, neumístí (prodleva
+        před umístěním). Vrací seznam vzniklých událostí.
+        '''
+        events = []
+        while cells > 0 and self.phase == GamePhase.Falling:
+            if not self.currentTetrominoe:
+                self.tick += 1
+                cells -= 1
+                events.extend(self.spawn())
+                continue
+            distance = self.dropDistance(limit=cells)
+            if distance:
+                self.tick += distance
+                cells -= distance
+                self.move(0, -distance)
+            elif lock:
+                self.tick += 1
+                events.extend(self.lock())
+                break
+            else:
+                break
+        return events
+
+
+    def dropDistance(self, tetrominoe=None, position=None, limit=None):
+        '''
+        Vrací, o kolik políček může tetrominoe (výchozí je padající tetromino)
+        z pozice position klesnout, nejvýše však o limit políček, je-li zadán.
+        Vzdálenost se určí z výšek sloupců (columnHeights) v O(4): v každém
+        sloupci tetromina je to mezera mezi jeho nejnižším bodem a vrcholem
+        sloupce. Jen je-li tetromino pod převisem (níž než vrchol některého
+        ze svých sloupců), se pád zkouší postupně po políčkách.
+        '''
+        tetrominoe = tetrominoe or self.currentTetrominoe
+        baseX, baseY = position or self.currentPosition
+        if limit is None:
+            limit = self.height
+
+        distance = limit
+        columnHeights = self.columnHeights
+        for x, y in tetrominoe.bottomsTable[tetrominoe.shape][tetrominoe.rotation]:
+            gap = baseY + y - columnHeights[baseX + x]
+            if gap < 0:
+                break
+            distance = min(distance, gap)
+        else:
+            return distance
+
+        # pod převisem výška sloupce o nejbližší překážce nic neříká
+        distance = 0
+        while distance < limit and self.canPlaceTetrominoe(tetrominoe, (baseX, baseY), 0, -distance - 1):
+            distance += 1
+        return distance
+
+
+    def isGrounded(self):
+        # padající tetromino leží na dně nebo na umístěných políčkách
+        return bool(self.currentTetrominoe) and not self.dropDistance(limit=1)
+
+
+    def spawn(self, tetrominoe=None):
+        '''
+        Umístí na vrchol desky nové (případně zadané) tetromino. Nevejde-li se,
+        hra končí. Předtím vloží na dno desky čekající řádky odpadu.
+        '''
+        if self.pendingGarbage:
+            events = self.insertGarbage()
+            if self.phase == GamePhase.GameOver:
+                return events
+
+        self.currentTetrominoe = tetrominoe or Tetrominoe(shape=self.random.randint(1, TetrominoeShape.count))
+        self.currentPosition = (self.width // 2, self.height - 1)
+
+        events = [(GameEvent.TetrominoeSpawned, self.currentTetrominoe.shape)]
+        # kontrola, zda se nově vygenerované tetromino vůbec vejde na hrací plochu
+        if not self.canPlaceTetrominoe(self.currentTetrominoe, self.currentPosition):
+            self.phase = GamePhase.GameOver
+            events.append((GameEvent.GameOver, None))
+
+        self.markTetrominoeDirty()
+        return events
+
+
+    def lock(self):
+        '''
+        Napevno umístí aktuální tetromino a označí plné řádky.
+        '''
+        baseX, baseY = self.currentPosition
+        shape = self.currentTetrominoe.shape
+        for x, y in self.currentTetrominoe.points:
+            x += baseX
+            y += baseY
+            self.rows[y] |= 1 << x
+            self.colors[y][x] = shape
+            if self.columnHeights[x] <= y:
+                self.columnHeights[x] = y + 1
+        # zaplnit se mohly jen řádky, do kterých tetromino dopadlo
+        lockedRows = set(baseY + y for x, y in self.currentTetrominoe.points)
+        self.currentTetrominoe = None
+        events = [(GameEvent.TetrominoeFell, None)]
+
+        if self.markFullLines(lockedRows):
+            events.append((GameEvent.FullLines, list(self.fullLines)))
+            self.phase = GamePhase.Clearing
+            if self.autoClear:
+                events.extend(self.clearLines())
+        return events
+
+
+    def addGarbage(self, count, hole):
+        '''
+        Zařadí count řádků odpadu, které jsou plné až na díru ve sloupci hole.
+        Na desku se dostanou až před vygenerováním dalšího tetromina (viz
+        insertGarbage()), aby nevjely do padajícího tetromina.
+        '''
+        self.pendingGarbage.append((count, hole % self.width))
+
+
+    def insertGarbage(self):
+        '''
+        Vloží čekající řádky odpadu na dno desky, ostatní řádky se posunou
+        nahoru. Vytlačí-li se tím políčka nad vrchol desky, hra končí.
+        Vrací seznam vzniklých událostí.
+        '''
+        overflow = False
+        for count, hole in self.pendingGarbage:
+            count = min(count, self.height)
+            overflow = overflow or any(self.rows[self.height - count:])
+            del self.rows[self.height - count:]
+            del self.colors[self.height - count:]
+            row = self.fullRow & ~(1 << hole)
+            for i in range(count):
+                self.rows.insert(0, row)
+                self.colors.insert(0, [TetrominoeShape.Garbage] * self.width)
+                self.colors[0][hole] = TetrominoeShape.NoShape
+            for x in range(self.width):
+                if self.columnHeights[x] or x != hole:
+                    self.columnHeights[x] = min(self.height, self.columnHeights[x] + count)
+        self.pendingGarbage = []
+
+        if overflow:
+            # vrchol sloupce mohl být vytlačen, výšky se určí znovu
+            for x in range(self.width):
+                height = self.columnHeights[x]
+                while height and not self.rows[height - 1] >> x & 1:
+                    height -= 1
+                self.columnHeights[x] = height
+            self.dirtyAll = True
+            self.phase = GamePhase.GameOver
+            return [(GameEvent.GameOver, None)]
+
+        # posunula se všechna neprázdná políčka
+        self.markRowsDirty(range(max(self.columnHeights)))
+        return []
+
+
+    def hardDrop(self):
+        '''
+        Nechá padající tetromino okamžitě dopadnout a napevno jej umístí.
+        Vrací události vzniklé umístěním.
+        '''
+        if self.phase != GamePhase.Falling or not self.currentTetrominoe:
+            return []
+        distance = self.dropDistance()
+        if distance:
+            self.move(0, -distance)
+        return self.lock()
+
+
+    def move(self, relX, relY):
+        '''
+        Podaří-li se tetromino posunout, vrací True, jinak False.
+        '''
+        if not self.currentTetrominoe:
+            return False
+        if not self.canPlaceTetrominoe(self.currentTetrominoe, self.currentPosition, relX, relY):
+            return False
+
+        # deska se nemění, překreslit je třeba jen starou a novou polohu tetromina
+        self.markTetrominoeDirty()
+        self.currentPosition = (self.currentPosition[0] + relX, self.currentPosition[1] + relY)
+        self.markTetrominoeDirty()
+        return True
+
+
+    def rotate(self):
+        '''
+        Otočí padající tetromino. Podaří-li se to, vrací True, jinak False.
+        '''
+        if not self.currentTetrominoe:
+            return False
+
+        if not self.canPlaceTetrominoe(self.currentTetrominoe, self.currentPosition, relRotation=1):
+            return False
+
+        self.markTetrominoeDirty()
+        self.currentTetrominoe.rotate()
+        self.markTetrominoeDirty()
+        return True
+
+
+    def markFullLines(self, rows=None):
+        '''
+        Políčka v plných řádcích přepíše hodnotou TetrominoeShape.Flash1 a vrátí
+        počet celých řádků. Prohledávají se jen zadané řádky rows (None => celá
+        deska), na vysoké desce tak stačí projít řádky umístěného tetromina.
+        '''
+        fullRow = self.fullRow
+        if rows is None:
+            rows = range(self.height)
+        self.fullLines = sorted(y for y in rows if self.rows[y] == fullRow)
+
+        for y in self.fullLines:
+            self.colors[y] = [TetrominoeShape.Flash1] * self.width
+        self.markRowsDirty(self.fullLines)
+        return len(self.fullLines)
+
+
+    def flashFullLines(self):
+        '''
+        V plných řádcích změní políčka s hodnotou Flash1 na hodnotu Flash2 a opačně.
+        '''
+        for y in self.fullLines:
+            if self.colors[y][0] == TetrominoeShape.Flash1:
+                self.colors[y] = [TetrominoeShape.Flash2] * self.width
+            else:
+                self.colors[y] = [TetrominoeShape.Flash1] * self.width
+        self.markRowsDirty(self.fullLines)
+
+
+    def clearLines(self):
+        '''
+        Smaže řádky označené v markFullLines() a vrátí událost se skóre.
+        '''
+        linesCount = len(self.fullLines)
+        if not linesCount:
+            return []
+
+        # změní se řádky od nejnižšího mazaného až po nejvyšší neprázdný
+        # (ten určují výšky sloupců, není třeba procházet prázdné řádky)
+        top = max(self.columnHeights) - 1
+        self.markRowsDirty(range(self.fullLines[0], top + 1))
+
+        # plné řádky vyjmeme (odshora, aby se neposunuly indexy dosud
+        # nezpracovaných řádků), vyšší řádky tím klesnou samy
+        for y in reversed(self.fullLines):
+            del self.rows[y]
+            del self.colors[y]
+        # navrch doplníme prázdné řádky
+        for i in range(linesCount):
+            self.rows.append(0)
+            self.colors.append([TetrominoeShape.NoShape] * self.width)
+
+        # sloupce klesnou o počet smazaných řádků pod svým vrcholem; byl-li smazán
+        # i vrchol sloupce, najdeme nový vrchol pod ním
+        for x in range(self.width):
+            height = self.columnHeights[x]
+            for y in self.fullLines:
+                if y < self.columnHeights[x]:
+                    height -= 1
+            while height and not self.rows[height - 1] >> x & 1:
+                height -= 1
+            self.columnHeights[x] = height
+
+        self.fullLines = []
+        self.phase = GamePhase.Falling
+        return [(GameEvent.Scored, linesCount)]
+
+
+    def canPlaceTetrominoe(self, tetrominoe, position, relX=0, relY=0, relRotation=0):
+        '''
+        Otestuje je-li možné tetrominoe umístit na hrací ploše na pozici
+        position s relativním posunutím (relX, relY) a natočením pootočeným
+        o relRotation čtvrtotáček doprava. Překážkou jsou jen napevno
+        umístěná políčka, padající tetromino se neuvažuje. Metoda stav
+        enginu nemění.
+        Vrací True, je-li to možné, jinak False.
+        '''
+        rotation = (tetrominoe.rotation + relRotation) & 3
+        minX, maxX, minY, maxY = tetrominoe.boundsTable[tetrominoe.shape][rotation]
+        baseX = position[0] + relX
+        baseY = position[1] + relY
+
+        # vylezli jsme mimo hrací plochu
+        if baseX + minX < 0 or baseX + maxX >= self.width \
+                or baseY + minY < 0 or baseY + maxY >= self.height:
+            return False
+
+        # některé políčko není prázdné
+        rows = self.rows
+        leftX = baseX + minX
+        for y, mask in tetrominoe.masksTable[tetrominoe.shape][rotation]:
+            if rows[baseY + y] & mask << leftX:
+                return False
+        return True
+
+
+    def currentCells(self):
+        '''
+        Vrací slovník {(x, y): tvar} políček padajícího tetromina.
+        '''
+        if not self.currentTetrominoe:
+            return {}
+        baseX, baseY = self.currentPosition
+        shape = self.currentTetrominoe.shape
+        return dict(((baseX + x, baseY + y), shape) for x, y in self.currentTetrominoe.points)
+
+
+    def ghostCells(self):
+        '''
+        Vrací slovník {(x, y): tvar} políček, na která by padající tetromino
+        dopadlo (stín tetromina).
+        '''
+        if not self.currentTetrominoe:
+            return {}
+        baseX, baseY = self.currentPosition
+        baseY -= self.dropDistance()
+        shape = self.currentTetrominoe.shape
+        return dict(((baseX + x, baseY + y), shape) for x, y in self.currentTetrominoe.points)
+
+
+    def markTetrominoeDirty(self):
+        # políčka padajícího tetromina budou překreslena
+        if not self.dirtyAll:
+            baseX, baseY = self.currentPosition
+            for x, y in self.currentTetrominoe.points:
+                self.dirtyCells.add((baseX + x, baseY + y))
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Environment                                                          #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#           NumPy                                                              #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Prostředí s mnoha nezávislými hrami, které postupují současně (pro trénink   #
+# botů a studie vyváženosti). Všech N desek je jedno pole NumPy a krok step()  #
+# provede akce, pád, umístění, mazání řad a počítání skóre i levelů pro        #
+# všechny hry najednou. Pravidla odpovídají GameEngine s autoClear=True        #
+# a GameScore: akce hráče se provede před krokem hry stejně jako při           #
+# přehrávání záznamu (replay.playHeadless), jen tvary tetromin generuje        #
+# generátor NumPy, takže posloupnosti se od GameEngine se stejným seedem liší. #
+#                                                                              #
+# Použití (porovnání rychlosti s postupným krokováním GameEngine):             #
+#   $ python environment.py --count 4096 --steps 200                           #
+#                                                                              #
+################################################################################
+
+
+
+import sys
+import time
+import argparse
+
+import numpy
+
+from engine import GameEngine, GamePhase, GameScore, Tetrominoe, TetrominoeShape
+import replay
+
+
+
+
+# akce hráče jsou stejné jako v záznamech her; ACTION_QUICKFALL posune
+# tetromino o jedna dolů navíc, ACTION_NONE nedělá nic
+ACTION_LEFT = replay.ACTION_LEFT
+ACTION_RIGHT = replay.ACTION_RIGHT
+ACTION_ROTATE = replay.ACTION_ROTATE
+ACTION_QUICKFALL = replay.ACTION_QUICKFALL
+ACTION_HARDDROP = replay.ACTION_HARDDROP
+ACTION_NONE = 5
+ACTIONS = (ACTION_LEFT, ACTION_RIGHT, ACTION_ROTATE, ACTION_QUICKFALL, ACTION_HARDDROP, ACTION_NONE)
+
+# PIECE_ROWS[tvar, natočení, k] je bitová maska čtverečků tetromina na řádku
+# o k - 2 nad těžištěm; bit x + 2 <=> relativní x-ová souřadnice x
+PIECE_ROWS = numpy.zeros((TetrominoeShape.count + 1, 4, 5), dtype=numpy.int64)
+for _shape in range(1, TetrominoeShape.count + 1):
+    for _rotation, _points in enumerate(Tetrominoe.rotationsTable[_shape]):
+        for _x, _y in _points:
+            PIECE_ROWS[_shape, _rotation, _y + 2] |= 1 << (_x + 2)
+
+SCORE_TABLE = numpy.array(GameScore.SCORE_TABLE, dtype=numpy.int64)
+
+
+
+def _collides(rows):
+    # rows (..., 5) jsou řádky desky vymaskované řádky tetromina; redukce přes
+    # takhle krátkou osu (any) je v NumPy řádově pomalejší než ruční OR
+    return (rows[..., 0] | rows[..., 1] | rows[..., 2] | rows[..., 3] | rows[..., 4]) != 0
+
+
+
+class BatchEnvironment(object):
+    '''
+        count her se společnými rozměry desky. Stav je uložen po sloupcích:
+    board (hry, řádky) jsou bitové masky řádků napevno umístěných políček,
+    shape, rotation, x, y popisují padající tetromino (shape 0 => hra čeká
+    na nové tetromino) a score, scoredCount, lines, level odpovídají GameScore.
+        Každá deska je v board obklopená okrajem šířky PADDING, ve kterém jsou
+    všechna políčka obsazená (bit x + PADDING <=> sloupec x, řádek
+    y + PADDING <=> řádek y). Test kolize tak nemusí hlídat meze desky, jen
+    maskuje řádky tetromina s řádky desky.
+        Skončené hry (done) se na začátku dalšího kroku samy začnou znovu,
+    takže step() lze volat pořád dokola.
+    '''
+
+    # těžiště je vždy na desce, ostatní čtverečky jsou od něj nejvýše o 2
+    # políčka a posun či otočení přidá nejvýše jedno
+    PADDING = 3
+
+
+    def __init__(self, count, width=GameEngine.WIDTH, height=GameEngine.HEIGHT, seed=None,
+            destructionsToLevelUp=GameScore.DESTRUCTIONS_TO_LEVEL_UP):
+        # řádek desky i s okraji musí být nejvýše 64bitový (numpy.uint64)
+        if width + 2 * self.PADDING > 64:
+            raise ValueError("board width %d exceeds %d columns of 64-bit rows" % (width, 64 - 2 * self.PADDING))
+        self.count = count
+        self.width = width
+        self.height = height
+        self.destructionsToLevelUp = destructionsToLevelUp
+        self.random = numpy.random.default_rng(seed)
+
+        padding = self.PADDING
+        # maska zaplněného řádku (vnitřek desky), plného řádku včetně okrajů
+        # a prázdného řádku, ve kterém jsou obsazené jen okraje
+        self.fullRow = (1 << width) - 1
+        self.solidRow = (1 << (width + 2 * padding)) - 1
+        self.emptyRow = self.solidRow & ~(self.fullRow << padding)
+        # řádky vnitřku desky v poli board
+        self.inside = slice(padding, padding + height)
+
+        # nejmenší celočíselný typ, do kterého se vejde řádek i s okraji
+        bits = width + 2 * padding
+        self.dtype = numpy.uint16 if bits <= 16 else numpy.uint32 if bits <= 32 else numpy.uint64
+        # PIECE_ROWS s řádky indexovanými tvar * 4 + natočení
+        self.pieceRowsTable = PIECE_ROWS.astype(self.dtype).reshape(-1, 5)
+        self.board = numpy.full((count, height + 2 * padding), self.solidRow, dtype=self.dtype)
+        # board jako jednorozměrné pole (pohled) a vzdálenost sousedních desek
+        # v něm; indexování jedním polem indexů je rychlejší než dvojicí
+        self.flatBoard = self.board.reshape(-1)
+        self.stride = height + 2 * padding
+        self.shape = numpy.zeros(count, dtype=numpy.int64)
+        self.rotation = numpy.zeros(count, dtype=numpy.int64)
+        self.x = numpy.zeros(count, dtype=numpy.int64)
+        self.y = numpy.zeros(count, dtype=numpy.int64)
+
+        self.score = numpy.zeros(count, dtype=numpy.int64)
+        self.scoredCount = numpy.zeros(count, dtype=numpy.int64)
+        self.lines = numpy.zeros(count, dtype=numpy.int64)
+        self.level = numpy.ones(count, dtype=numpy.int64)
+        # počet kroků každé hry (obdoba GameEngine.tick)
+        self.ticks = numpy.zeros(count, dtype=numpy.int64)
+        self.done = numpy.zeros(count, dtype=bool)
+
+        self.reset()
+
+
+    def reset(self, mask=None):
+        '''
+        Začne znovu hry vybrané maskou mask (výchozí všechny) a vrátí pozorování.
+        '''
+        if mask is None:
+            mask = slice(None)
+        self.board[mask, self.inside] = self.emptyRow
+        self.shape[mask] = 0
+        self.rotation[mask] = 0
+        self.score[mask] = 0
+        self.scoredCount[mask] = 0
+        self.lines[mask] = 0
+        self.level[mask] = 1
+        self.ticks[mask] = 0
+        self.done[mask] = False
+        return self.observe()
+
+
+    def rows(self):
+        # bitové masky řádků všech desek (hry, výška) ve tvaru GameEngine.rows
+        return (self.board[:, self.inside] >> self.dtype(self.PADDING)) & self.dtype(self.fullRow)
+
+
+    def observe(self):
+        '''
+        Pozorování všech her: slovník s bitovými maskami řádků desek "rows"
+        (hry, výška), které lze předat evaluation.evaluateBoards(), a padajícími
+        tetrominy "piece" (hry, 4) ve tvaru (tvar, natočení, x, y).
+        '''
+        return {
+            "rows": self.rows(),
+            "piece": numpy.stack((self.shape, self.rotation, self.x, self.y), axis=1),
+        }
+
+
+    def pieceRows(self, shape, rotation, x, y):
+        # indexy řádků v board (hry, 5) a masky tetromin na nich posunuté na x
+        masks = numpy.take(self.pieceRowsTable, shape * 4 + (rotation & 3), axis=0)
+        masks <<= (x + (self.PADDING - 2)).astype(self.dtype)[:, numpy.newaxis]
+        ys = y[:, numpy.newaxis] + numpy.arange(self.PADDING - 2, self.PADDING + 3)
+        return ys, masks
+
+
+    def fits(self, games, shape, rotation, x, y):
+        '''
+        Pro hry s indexy games otestuje, zda lze tetromino tvaru shape
+        s natočením rotation umístit na (x, y). Vrací pole bool.
+        '''
+        ys, masks = self.pieceRows(shape, rotation, x, y)
+        return ~_collides(self.flatBoard[games[:, numpy.newaxis] * self.stride + ys] & masks)
+
+
+    def move(self, games, relX, relY, relRotation=0):
+        # posune tetromina her games, kde to jde; vrací masku her, kde se to podařilo
+        ok = self.fits(games, self.shape[games], self.rotation[games] + relRotation,
+                       self.x[games] + relX, self.y[games] + relY)
+        moved = games[ok]
+        if relX:
+            self.x[moved] += relX
+        if relY:
+            self.y[moved] += relY
+        if relRotation:
+            self.rotation[moved] = (self.rotation[moved] + relRotation) & 3
+        return ok
+
+
+    def hardDrop(self, games):
+        '''
+        Nechá tetromina her games dopadnout. Kolize se otestuje pro všechny
+        vzdálenosti pádu najednou a tetromino klesne těsně nad první z nich
+        (převisy se tak řeší stejně jako opakovaným posunem dolů).
+        '''
+        y = self.y[games]
+        ys, masks = self.pieceRows(self.shape[games], self.rotation[games], self.x[games], y)
+        # těžiště patří k tetrominu a po pádu o y + 1 je v okraji pod deskou,
+        # tam kolize nastane vždy; vzdálenosti se ale zkoušejí pro všechny hry
+        # do největšího y, u níže položených tetromin by tak řádky vyšly pod
+        # okraj (do sousední hry v flatBoard) => ořízneme je na spodní řádek
+        # okraje a vzdálenosti nad y + 1 rovnou považujeme za kolizi
+        distances = numpy.arange(y.max() + 2)
+        below = numpy.maximum(ys[:, numpy.newaxis, :] - distances[numpy.newaxis, :, numpy.newaxis], 0)
+        below += (games * self.stride)[:, numpy.newaxis, numpy.newaxis]
+        collisions = _collides(self.flatBoard[below] & masks[:, numpy.newaxis, :])
+        collisions |= distances[numpy.newaxis, :] > (y + 1)[:, numpy.newaxis]
+        self.y[games] -= collisions.argmax(axis=1) - 1
+
+
+    def lock(self, games, rewards):
+        '''
+        Napevno umístí tetromina her games, smaže plné řádky a připočte skóre
+        (do self.score i rewards) podle pravidel GameScore.
+        '''
+        if not games.size:
+            return
+        ys, masks = self.pieceRows(self.shape[games], self.rotation[games], self.x[games], self.y[games])
+        self.flatBoard[games[:, numpy.newaxis] * self.stride + ys] |= masks
+        self.shape[games] = 0
+
+        inside = self.board[games, self.inside]
+        full = inside == self.solidRow
+        counts = full.sum(axis=1)
+        scored = counts > 0
+        if not scored.any():
+            return
+        # stabilní seřazení podle příznaku "plný" přesune plné řádky nahoru
+        # a ostatní zachová v původním pořadí, přesunuté řádky vyprázdníme
+        inside, full, linesCount = inside[scored], full[scored], counts[scored]
+        order = numpy.argsort(full, axis=1, kind="stable")
+        inside = numpy.take_along_axis(inside, order, axis=1)
+        inside[numpy.arange(self.height)[numpy.newaxis, :] >= (self.height - linesCount)[:, numpy.newaxis]] = self.emptyRow
+        scored = games[scored]
+        self.board[scored, self.inside] = inside
+
+        self.scoredCount[scored] += 1
+        self.lines[scored] += linesCount
+        self.level[scored] += self.scoredCount[scored] % self.destructionsToLevelUp == 0
+        gain = SCORE_TABLE[linesCount] * self.level[scored]
+        self.score[scored] += gain
+        rewards[scored] += gain
+
+
+    def spawn(self, games):
+        # nová tetromina na vrcholu desek her games; kam se nevejdou, hra končí
+        self.shape[games] = self.random.integers(1, TetrominoeShape.count + 1, size=games.size)
+        self.rotation[games] = 0
+        self.x[games] = self.width // 2
+        self.y[games] = self.height - 1
+        ok = self.fits(games, self.shape[games], self.rotation[games], self.x[games], self.y[games])
+        self.done[games[~ok]] = True
+
+
+    def step(self, actions):
+        '''
+        Provede akce actions (pole délky count hodnot ACTION_*) a jeden krok
+        všech her. Vrací trojici (pozorování, odměny, done), kde odměny jsou
+        přírůstky skóre v tomto kroku a done označuje hry, které skončily.
+        '''
+        actions = numpy.asarray(actions)
+        if self.done.any():
+            self.reset(self.done)
+        rewards = numpy.zeros(self.count, dtype=numpy.int64)
+        falling = self.shape != 0
+
+        # akce hráče
+        self.move(numpy.flatnonzero(falling & (actions == ACTION_LEFT)), -1, 0)
+        self.move(numpy.flatnonzero(falling & (actions == ACTION_RIGHT)), 1, 0)
+        self.move(numpy.flatnonzero(falling & (actions == ACTION_ROTATE)), 0, 0, 1)
+        self.move(numpy.flatnonzero(falling & (actions == ACTION_QUICKFALL)), 0, -1)
+        dropping = falling & (actions == ACTION_HARDDROP)
+        if dropping.any():
+            games = numpy.flatnonzero(dropping)
+            self.hardDrop(games)
+            self.lock(games, rewards)
+
+        # krok hry: kde není padající tetromino, vygeneruje se nové, jinak
+        # tetromino spadne o jedna a nejde-li to, napevno se umístí
+        self.ticks += 1
+        self.spawn(numpy.flatnonzero(self.shape == 0))
+        games = numpy.flatnonzero(falling & ~dropping)
+        moved = self.move(games, 0, -1)
+        self.lock(games[~moved], rewards)
+
+        return self.observe(), rewards, self.done.copy()
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rychlost BatchEnvironment oproti postupnému krokování GameEngine.")
+    parser.add_argument("--count", type=int, default=4096, help="počet současně hraných her")
+    parser.add_argument("--steps", type=int, default=200, help="počet kroků")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = numpy.random.default_rng(args.seed)
+    actions = rng.choice(ACTIONS, size=(args.steps, args.count))
+
+    env = BatchEnvironment(args.count, seed=args.seed)
+    start = time.perf_counter()
+    for step in range(args.steps):
+        env.step(actions[step])
+    batchRate = args.count * args.steps / (time.perf_counter() - start)
+
+    # stejný počet kroků po jednotlivých objektech GameEngine
+    engines = [GameEngine(seed=args.seed + i) for i in range(args.count)]
+    start = time.perf_counter()
+    for step in range(args.steps):
+        stepActions = actions[step].tolist()
+        for engine, action in zip(engines, stepActions):
+            if engine.phase == GamePhase.GameOver:
+                engine.clear()
+            replay.applyInput(engine, action)
+            engine.step()
+    engineRate = args.count * args.steps / (time.perf_counter() - start)
+
+    print("BatchEnvironment %.0f board steps/s, GameEngine %.0f board steps/s (%.1fx)"
+          % (batchRate, engineRate, batchRate / engineRate))
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Evaluation                                                           #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#           NumPy                                                              #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Dávkové ohodnocení hracích desek pomocí NumPy. Desky se předávají najednou   #
+# jako jedno pole, buď tvaru (kandidáti, výška, šířka) s obsazeností políček,  #
+# nebo tvaru (kandidáti, výška) s bitovými maskami řádků (jako                 #
+# GameEngine.rows). Příznaky se počítají vektorově pro celou dávku a jejich    #
+# hodnoty přesně odpovídají skalární funkci boardFeatures().                   #
+#                                                                              #
+# Všechny příznaky kromě completedLines se počítají na desce, ze které už      #
+# byly plné řádky smazány (tak, jak by to udělal engine).                      #
+#                                                                              #
+################################################################################
+
+
+
+import numpy
+
+from engine import Tetrominoe
+import bot
+
+
+
+
+# názvy příznaků vracených evaluateBoards() a boardFeatures()
+FEATURES = ("completedLines", "aggregateHeight", "holes", "bumpiness", "rowTransitions", "wells")
+
+# nejširší deska, jejíž řádky se jako bitové masky vejdou do int64
+MAX_WIDTH = 63
+
+
+
+def rowsToCells(rows, width):
+    '''
+    Převede pole bitových masek řádků tvaru (..., výška) na pole obsazenosti
+    tvaru (..., výška, šířka).
+    '''
+    if width > MAX_WIDTH:
+        raise ValueError("board width %d exceeds %d columns of int64 row bitmasks" % (width, MAX_WIDTH))
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    return (rows[..., numpy.newaxis] >> numpy.arange(width, dtype=numpy.int64)) & 1 != 0
+
+
+
+def clearFullLines(cells):
+    '''
+    Smaže plné řádky desek cells (kandidáti, výška, šířka); vyšší řádky
+    klesnou. Vrací dvojici (nové desky, počty smazaných řádků).
+    '''
+    count, height, width = cells.shape
+    full = cells.all(axis=2)
+    completedLines = full.sum(axis=1)
+    if not completedLines.any():
+        return cells, completedLines
+
+    # stabilní seřazení podle příznaku "plný" přesune plné řádky nahoru
+    # a ostatní zachová v původním pořadí
+    order = numpy.argsort(full, axis=1, kind="stable")
+    cells = numpy.take_along_axis(cells, order[:, :, numpy.newaxis], axis=1)
+    # přesunuté plné řádky vyprázdníme
+    cells[numpy.arange(height)[numpy.newaxis, :] >= (height - completedLines)[:, numpy.newaxis]] = False
+    return cells, completedLines
+
+
+
+def columnHeights(cells):
+    '''
+    Výšky sloupců desek cells (kandidáti, výška, šířka) jako pole (kandidáti, šířka).
+    '''
+    height = cells.shape[1]
+    filled = cells.any(axis=1)
+    # index prvního obsazeného políčka odshora
+    fromTop = numpy.argmax(cells[:, ::-1, :], axis=1)
+    return numpy.where(filled, height - fromTop, 0)
+
+
+
+def evaluateBoards(boards, width=None):
+    '''
+    Spočítá příznaky (viz FEATURES) pro celou dávku desek. boards je buď pole
+    obsazenosti (kandidáti, výška, šířka), nebo pole bitových masek řádků
+    (kandidáti, výška), pak je nutné zadat width. Vrací slovník polí délky
+    počtu kandidátů, navíc pod klíčem "columnHeights" pole (kandidáti, šířka).
+    '''
+    boards = numpy.asarray(boards)
+    if boards.ndim == 2:
+        if width is None:
+            raise ValueError("width is required for row bitmasks")
+        cells = rowsToCells(boards, width)
+    else:
+        cells = boards.astype(bool)
+    count, height, width = cells.shape
+
+    cells, completedLines = clearFullLines(cells)
+    heights = columnHeights(cells)
+
+    # políčko je díra, je-li prázdné a nad ním v témže sloupci je obsazené
+    covered = numpy.logical_or.accumulate(cells[:, ::-1, :], axis=1)[:, ::-1, :]
+    holes = (covered & ~cells).sum(axis=(1, 2))
+
+    bumpiness = numpy.abs(numpy.diff(heights, axis=1)).sum(axis=1)
+
+    # přechody obsazené/prázdné v řádcích, stěny se počítají jako obsazené
+    wall = numpy.ones((count, height, 1), dtype=bool)
+    padded = numpy.concatenate((wall, cells, wall), axis=2)
+    rowTransitions = (padded[:, :, 1:] != padded[:, :, :-1]).sum(axis=(1, 2))
+
+    # studna je sloupec nižší než oba sousední (stěny mají výšku desky),
+    # její hloubka je rozdíl oproti nižšímu ze sousedů
+    wallHeights = numpy.full((count, 1), height)
+    padded = numpy.concatenate((wallHeights, heights, wallHeights), axis=1)
+    depth = numpy.minimum(padded[:, :-2], padded[:, 2:]) - heights
+    wells = numpy.clip(depth, 0, None).sum(axis=1)
+
+    return {
+        "completedLines": completedLines,
+        "aggregateHeight": heights.sum(axis=1),
+        "holes": holes,
+        "bumpiness": bumpiness,
+        "rowTransitions": rowTransitions,
+        "wells": wells,
+        "columnHeights": heights,
+    }
+
+
+
+def boardFeatures(rows, width):
+    '''
+    Skalární obdoba evaluateBoards() pro jednu desku zadanou seznamem bitových
+    masek řádků. Vrací slovník se stejnými klíči jako FEATURES.
+    '''
+    height = len(rows)
+    fullRow = (1 << width) - 1
+    remaining = [row for row in rows if row != fullRow]
+    completedLines = height - len(remaining)
+    rows = remaining + [0] * completedLines
+
+    heights = [0] * width
+    for x in range(width):
+        for y in range(height - 1, -1, -1):
+            if rows[y] >> x & 1:
+                heights[x] = y + 1
+                break
+
+    holes = 0
+    for x in range(width):
+        for y in range(heights[x]):
+            if not rows[y] >> x & 1:
+                holes += 1
+
+    rowTransitions = 0
+    for row in rows:
+        # stěny vlevo i vpravo jsou obsazené
+        padded = [1] + [row >> x & 1 for x in range(width)] + [1]
+        for x in range(width + 1):
+            if padded[x] != padded[x + 1]:
+                rowTransitions += 1
+
+    padded = [height] + heights + [height]
+    wells = 0
+    for x in range(width):
+        wells += max(0, min(padded[x], padded[x + 2]) - heights[x])
+
+    return {
+        "completedLines": completedLines,
+        "aggregateHeight": sum(heights),
+        "holes": holes,
+        "bumpiness": sum(abs(heights[x] - heights[x + 1]) for x in range(width - 1)),
+        "rowTransitions": rowTransitions,
+        "wells": wells,
+    }
+
+
+
+def candidateBoards(engine):
+    '''
+    Sestaví všechna umístění padajícího tetromina (viz bot.enumeratePlacements)
+    a desky, které by jimi vznikly (před smazáním plných řádků). Vrací dvojici
+    (seznam umístění (natočení, x), pole bitových masek (kandidáti, výška)).
+    '''
+    tetrominoe = engine.currentTetrominoe
+    rows = engine.rows
+    rotationsTable = Tetrominoe.rotationsTable[tetrominoe.shape]
+    placements = []
+    boards = []
+    for rotation, placeX, placeY in bot.enumeratePlacements(engine, tetrominoe.shape):
+        board = list(rows)
+        for x, y in rotationsTable[rotation]:
+            board[placeY + y] |= 1 << (placeX + x)
+        placements.append((rotation, placeX))
+        boards.append(board)
+    return placements, numpy.array(boards, dtype=numpy.int64).reshape(len(boards), engine.height)
+
+
+
+def bestPlacement(engine, botWeights=None):
+    '''
+    Vektorová obdoba bot.Bot.bestPlacement(): ohodnotí všechna umístění
+    padajícího tetromina najednou vahami bota botWeights (výchozí bot.Bot()).
+    Deska smí být nejvýše MAX_WIDTH sloupců široká.
+    '''
+    if engine.width > MAX_WIDTH:
+        raise ValueError("board width %d exceeds %d columns of int64 row bitmasks" % (engine.width, MAX_WIDTH))
+    if not engine.currentTetrominoe:
+        return None
+    placements, boards = candidateBoards(engine)
+    if not placements:
+        return None
+
+    linesWeight, heightWeight, holesWeight, bumpinessWeight = botWeights or bot.Bot().weights
+    features = evaluateBoards(boards, engine.width)
+    values = (linesWeight * features["completedLines"] + heightWeight * features["aggregateHeight"]
+              + holesWeight * features["holes"] + bumpinessWeight * features["bumpiness"])
+    return placements[int(numpy.argmax(values))]
+
+
+def aiPolicy(engine):
+    '''
+    Strategie pro simulate.py (--policy evaluation:aiPolicy). Desky širší
+    než MAX_WIDTH ohodnotí skalární bot.Bot.
+    '''
+    if engine.width > MAX_WIDTH:
+        return bot.aiPolicy(engine)
+    return bestPlacement(engine)
@@ -21,25 +21,297 @@
 # ve formě xml dokumentu. Jako šifrování je momentálně užit jednoduchý převod  #
 # xml do base64. Pro změnu šifrování stačí přepsat metody cypher, decypher.    #
 #                                                                              #
+# Žebříček lze napojit na databázi SQLite (metoda open, třída                  #
+# HighscoresStore), do které se každý nový záznam hned zapíše v samostatné     #
+# transakci; export do xml pak slouží jen k přenosu záznamů. Starý soubor      #
+# se při prvním otevření databáze převede, čte se postupně bez sestavení DOM.  #
+#                                                                              #
+# Záznamy jsou stále seřazené sestupně podle skóre v blocích (třída            #
+# SortedRecords), nový záznam se zařadí binárním vyhledáváním a přesune jen    #
+# záznamy svého bloku, ne celé tabulky (měření: bench.py --highscore-records). #
+# Nejnižší skóre žebříčku je vždy poslední. Textový výpis se vytváří           #
+# po stránkách a pamatuje si až do další změny žebříčku.                       #
+#                                                                              #
 ################################################################################
 
 
 
 
+import os
 import xml.dom.minidom
+import xml.etree.ElementTree
 import base64
+import bisect
+import heapq
+import itertools
+import sqlite3
+
+
+
+
+class HighscoresStore(object):
+    '''
+        Úložiště záznamů žebříčku v databázi SQLite. Každý zápis je samostatná
+    transakce, takže záznam přežije i pád hry hned po uložení a soubor nikdy
+    nezůstane rozepsaný. Záznamy, které z žebříčku vypadly, se mažou jednou
+    za maxRecords zápisů a při zavření, databáze tak zůstává malá.
+    '''
+
+    def __init__(self, fileName, maxRecords, legacyRecords=None):
+        '''
+        Otevře (případně vytvoří) databázi fileName. Nemá-li ještě tabulku
+        záznamů, naplní ji záznamy z funkce legacyRecords (převod starého
+        souboru) ve stejné transakci, ve které ji vytvoří: selže-li převod,
+        transakce se odvolá a příští otevření jej zkusí znovu.
+        '''
+        self.maxRecords = maxRecords
+        # počet zápisů od poslední kompakce
+        self.writes = 0
+        self.connection = sqlite3.connect(fileName)
+        try:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            # vytvoření tabulek (DDL) samo transakci nezačne
+            self.connection.execute("BEGIN")
+            with self.connection:
+                created = not self.connection.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records'").fetchone()
+                self.connection.execute("CREATE TABLE IF NOT EXISTS records "
+                        "(id INTEGER PRIMARY KEY, name TEXT NOT NULL, score INTEGER NOT NULL)")
+                # pořadí stejných skóre určuje pořadí vložení (id)
+                self.connection.execute("CREATE INDEX IF NOT EXISTS recordsByScore ON records (score DESC, id)")
+                if created and legacyRecords:
+                    self.connection.executemany("INSERT INTO records (name, score) VALUES (?, ?)",
+                            legacyRecords())
+        except BaseException:
+            self.connection.close()
+            raise
+
+
+    def top(self):
+        '''
+        Vrací maxRecords nejlepších záznamů (jméno, skóre) seřazených sestupně.
+        Díky indexu netrvá déle s rostoucí databází.
+        '''
+        return self.connection.execute("SELECT name, score FROM records ORDER BY score DESC, id LIMIT ?",
+                (self.maxRecords,)).fetchall()
+
+
+    def add(self, name, score):
+        self.addBatch(((name, score),))
+
+
+    def addBatch(self, records):
+        # záznamy (jméno, skóre) v jedné transakci (dávka od serveru žebříčku)
+        with self.connection:
+            self.connection.executemany("INSERT INTO records (name, score) VALUES (?, ?)", records)
+        self.writes += len(records)
+        if self.writes >= self.maxRecords:
+            self.compact()
+
+
+    def compact(self):
+        # smaže záznamy, které už nejsou mezi maxRecords nejlepšími
+        with self.connection:
+            self.connection.execute("DELETE FROM records WHERE id NOT IN "
+                    "(SELECT id FROM records ORDER BY score DESC, id LIMIT ?)", (self.maxRecords,))
+        self.writes = 0
+
+
+    def close(self):
+        self.compact()
+        self.connection.close()
+
+
+
+class SortedRecords(object):
+    '''
+        Záznamy (jméno, skóre) seřazené sestupně podle skóre, uložené po blocích
+    nejvýše 2 * LOAD záznamů. Blok pro nový záznam se najde binárním
+    vyhledáváním v maximech bloků, pozice v celém žebříčku pak Fenwickovým
+    stromem nad velikostmi bloků. Vložení tak přesouvá jen záznamy jednoho
+    bloku místo celé tabulky a stojí O(log n) porovnání; strom se přestaví
+    jen při rozdělení nebo zániku bloku, tedy jednou za LOAD změn.
+    '''
+    LOAD = 1000
+
+    def __init__(self, records=()):
+        # records musí být seřazené sestupně podle skóre
+        records = list(records)
+        self._buckets = [records[i:i + self.LOAD] for i in range(0, len(records), self.LOAD)]
+        # záporná skóre, tedy vzestupně seřazené klíče pro bisect
+        self._keys = [[-score for name, score in bucket] for bucket in self._buckets]
+        self._length = len(records)
+        self._rebuild()
+
+
+    def _rebuild(self):
+        # největší klíč každého bloku a Fenwickův strom jejich velikostí
+        self._maxes = [keys[-1] for keys in self._keys]
+        self._tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, 1):
+            self._tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+
+
+    def _offset(self, bucketIndex):
+        # počet záznamů v blocích před blokem bucketIndex
+        offset = 0
+        while bucketIndex > 0:
+            offset += self._tree[bucketIndex]
+            bucketIndex -= bucketIndex & -bucketIndex
+        return offset
+
+
+    def _locate(self, index):
+        # (blok, pozice v bloku) záznamu s pořadím index (od nuly)
+        bucketIndex = 0
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            child = bucketIndex + step
+            if child < len(self._tree) and self._tree[child] <= index:
+                bucketIndex = child
+                index -= self._tree[child]
+            step >>= 1
+        return bucketIndex, index
+
+
+    def __len__(self):
+        return self._length
+
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self._buckets)
+
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return list(self)[index]
+            result = []
+            if start < stop:
+                bucketIndex, position = self._locate(start)
+                while len(result) < stop - start:
+                    bucket = self._buckets[bucketIndex]
+                    result.extend(bucket[position:position + stop - start - len(result)])
+                    bucketIndex, position = bucketIndex + 1, 0
+            return result
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("record index out of range")
+        bucketIndex, position = self._locate(index)
+        return self._buckets[bucketIndex][position]
+
+
+    def last(self):
+        # poslední (nejnižší) záznam v O(1)
+        return self._buckets[-1][-1]
+
+
+    def bisectRight(self, score):
+        '''
+        Vrací počet záznamů se skóre vyšším nebo rovným score.
+        '''
+        bucketIndex = bisect.bisect_right(self._maxes, -score)
+        if bucketIndex == len(self._buckets):
+            return self._length
+        return self._offset(bucketIndex) + bisect.bisect_right(self._keys[bucketIndex], -score)
+
+
+    def insert(self, record):
+        '''
+        Zařadí záznam za všechny se stejným nebo vyšším skóre a vrací jeho
+        pořadí (od nuly).
+        '''
+        key = -record[1]
+        if not self._buckets:
+            self._buckets.append([record])
+            self._keys.append([key])
+            self._length = 1
+            self._rebuild()
+            return 0
+        bucketIndex = min(bisect.bisect_right(self._maxes, key), len(self._buckets) - 1)
+        bucket, keys = self._buckets[bucketIndex], self._keys[bucketIndex]
+        position = bisect.bisect_right(keys, key)
+        index = self._offset(bucketIndex) + position
+        bucket.insert(position, record)
+        keys.insert(position, key)
+        self._length += 1
+        if len(bucket) > 2 * self.LOAD:
+            # přeplněný blok rozdělíme na poloviny
+            self._buckets[bucketIndex + 1:bucketIndex + 1] = [bucket[self.LOAD:]]
+            self._keys[bucketIndex + 1:bucketIndex + 1] = [keys[self.LOAD:]]
+            del bucket[self.LOAD:], keys[self.LOAD:]
+            self._rebuild()
+        else:
+            self._maxes[bucketIndex] = keys[-1]
+            i = bucketIndex + 1
+            while i < len(self._tree):
+                self._tree[i] += 1
+                i += i & -i
+        return index
+
+
+    def pop(self):
+        '''
+        Odebere a vrátí poslední (nejnižší) záznam.
+        '''
+        if not self._length:
+            raise IndexError("pop from empty records")
+        record = self._buckets[-1].pop()
+        self._keys[-1].pop()
+        self._length -= 1
+        if self._buckets[-1]:
+            self._maxes[-1] = self._keys[-1][-1]
+            i = len(self._buckets)
+            while i < len(self._tree):
+                self._tree[i] -= 1
+                i += i & -i
+        else:
+            del self._buckets[-1], self._keys[-1]
+            self._rebuild()
+        return record
 
 
 
 
 class Highscores(object):
     MAX_NAME_LENGTH = 10
+    # velikost bloků, po kterých se čte soubor ve formátu xml
+    READ_CHUNK_SIZE = 64 * 1024
 
     def __init__(self, maxRecords):
         # maximální počet pozic v žebříčku highscores
         self.maxRecords = maxRecords
-        # záznamy ve tvaru dvojic (jméno, skóre)
-        self.records = []
+        # napojená databáze (viz open()), případně None
+        self.storage = None
+        self._setRecords([])
+
+
+    def _setRecords(self, records):
+        '''
+        Nahradí všechny záznamy seznamem records seřazeným sestupně podle skóre
+        a přepočítá pomocné indexy.
+        '''
+        # záznamy ve tvaru dvojic (jméno, skóre) seřazené sestupně podle skóre
+        self.records = SortedRecords(records)
+        # nejlepší skóre a počet záznamů každého hráče v žebříčku
+        self._bestScores = {}
+        self._recordCounts = {}
+        for name, score in records:
+            if name not in self._bestScores:
+                self._bestScores[name] = score
+            self._recordCounts[name] = self._recordCounts.get(name, 0) + 1
+        self._invalidate()
+
+
+    def _invalidate(self):
+        # žebříček se změnil => vyrenderované stránky už neplatí
+        self._pages = {}
+        self._longest = None
 
     
     def _decypher(self, s):
@@ -49,6 +321,24 @@ class Highscores(object):
         return base64.b64decode(s)
 
 
+    def _decypherChunks(self, chunks):
+        '''
+        Postupně dešifruje byty přicházející po částech z iterátoru chunks
+        a generuje jejich dešifrované části. Při změně šifrování je třeba
+        přepsat i tuto metodu.
+        '''
+        rest = b""
+        for chunk in chunks:
+            # base64 lze dekódovat po celých čtveřicích znaků
+            data = rest + b"".join(chunk.split())
+            usable = len(data) - len(data) % 4
+            rest = data[usable:]
+            if usable:
+                yield base64.b64decode(data[:usable])
+        if rest:
+            yield base64.b64decode(rest)
+
+
     def _cypher(self, s):
         '''
         Přijímá string a vrací jeho zašifrovanou podobu ve formě bytů.
@@ -56,23 +346,74 @@ class Highscores(object):
         return base64.b64encode(s)
 
 
+    def _readRecords(self, file):
+        '''
+        Generuje záznamy (jméno, skóre) ze souboru ve formátu exportData()
+        bez načtení celého dokumentu do paměti.
+        '''
+        parser = xml.etree.ElementTree.XMLPullParser(("start", "end"))
+        root = None
+        chunks = iter(lambda: file.read(self.READ_CHUNK_SIZE), b"")
+        for data in self._decypherChunks(chunks):
+            parser.feed(data)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = element
+                elif element.tag == "item":
+                    yield element.get("playerName")[:self.MAX_NAME_LENGTH], int(element.get("score"))
+                    # zpracované uzly zahodíme
+                    root.clear()
+        parser.close()
+
+
+    def _topRecords(self, records):
+        # maxRecords nejlepších záznamů seřazených sestupně; stejná skóre zůstávají
+        # v pořadí, v jakém by je zařadilo postupné addHighscore()
+        return heapq.nlargest(self.maxRecords, records, key=Highscores._cmpByScore)
+
+
+    def open(self, fileName="highscores.db", legacyFileName="highscores.txt"):
+        '''
+        Napojí žebříček na databázi fileName, do které se pak každý nový záznam
+        hned zapíše, a načte z ní nejlepší záznamy. Je-li databáze nová
+        a existuje-li soubor legacyFileName ve formátu exportData(), záznamy
+        se z něj převedou.
+        '''
+        def legacyRecords():
+            with open(legacyFileName, "rb") as file:
+                return self._topRecords(self._readRecords(file))
+
+        migrate = legacyFileName and os.path.exists(legacyFileName)
+        try:
+            self.storage = HighscoresStore(fileName, self.maxRecords, legacyRecords if migrate else None)
+        except sqlite3.Error:
+            print("highscores.py: can't open database \"%s\"" % fileName)
+            return
+        except Exception:
+            # převod se odvolal a zkusí se znovu při příštím otevření
+            print("highscores.py: input xml file \"%s\" is inconsistent" % legacyFileName)
+            return
+        self._setRecords(self.storage.top())
+
+
+    def close(self):
+        if self.storage:
+            self.storage.close()
+            self.storage = None
+
+
     def importData(self, fileName="highscores.txt"):
         file = None
         try:
             file = open(fileName, "rb")
-            doc = xml.dom.minidom.parseString(self._decypher(file.read()))
-            recordNodes = doc.getElementsByTagName("item")
-
-            for node in recordNodes:
-                name = node.getAttribute("playerName")
-                score = int(node.getAttribute("score"))
-                self.addHighscore(name, score)
+            self._setRecords(self._topRecords(itertools.chain(self.records, self._readRecords(file))))
 
         except IOError:
             # soubor je otevřený ale nemůže se číst
             if file:
                 print("highscores.py: can't read input xml file \"%s\"" % fileName)
-                self.records = []
+                self._setRecords([])
             # jinak soubor neexistuje, což je korektní možnost (nebyl dosud vytvořen)
         except Exception:
             print("highscores.py: input xml file \"%s\" is inconsistent" % fileName)
@@ -97,10 +438,13 @@ class Highscores(object):
         
         file = None
         try:
-            # zápis xml do souboru
-            file = open(fileName, "wb")
+            # zápis xml do dočasného souboru, který pak nahradí původní; při
+            # chybě tak nezůstane rozepsaný soubor
+            file = open(fileName + ".tmp", "wb")
             file.write(self._cypher(doc.toprettyxml(indent="", newl="\n", encoding="utf-8")))
             #doc.writexml(file, indent="", addindent="   ", newl="\n", encoding="utf-8")
+            file.close()
+            os.replace(fileName + ".tmp", fileName)
         except IOError:
             print("highscores.py: can't write xml to file \"%s\"" % fileName)
         finally:
@@ -116,32 +460,51 @@ class Highscores(object):
         2. dlouhé jméno   8,320
         3. poslední         111
         '''
-        ret = ""
+        return self.page(0, max(1, len(self.records)))
 
-        longestRec = self._longestRecord()
-        formatName = "<" + str(self.MAX_NAME_LENGTH) + "s"
-        formatScore = ">" + str(longestRec[1]) + ",d"
-        
-        i = 1
-        for name,score in self.records:
-            if ret: ret += "\n"
-            ret += format(i, ">2d") + ". " + format(name, formatName) + "  " + format(score, formatScore)
-            i += 1
-        return ret
+
+    def pageCount(self, pageSize):
+        # počet stránek výpisu po pageSize záznamech (alespoň jedna)
+        return max(1, (len(self.records) + pageSize - 1) // pageSize)
+
+
+    def page(self, index, pageSize):
+        '''
+        Vrací stránku index (od nuly) výpisu highscores po pageSize záznamech,
+        formátovanou stejně jako __str__(). Stránky se ukládají do cache,
+        dokud se žebříček nezmění.
+        '''
+        key = (index, pageSize)
+        if key not in self._pages:
+            longestRec = self._longestRecord()
+            formatName = "<" + str(self.MAX_NAME_LENGTH) + "s"
+            formatScore = ">" + str(longestRec[1]) + ",d"
+            # pořadí zarovnáme podle nejdelšího čísla na stránce
+            start = index * pageSize
+            end = min(start + pageSize, len(self.records))
+            formatRank = ">" + str(max(2, len(str(end)))) + "d"
+
+            lines = []
+            for i in range(start, end):
+                name, score = self.records[i]
+                lines.append(format(i + 1, formatRank) + ". " + format(name, formatName) + "  " + format(score, formatScore))
+            self._pages[key] = "\n".join(lines)
+        return self._pages[key]
 
 
     def _longestRecord(self):
         '''
         Vrátí nejdelší textovou reprezentaci jména a skóre, které jsou aktuálně
-        uloženy jako tuple (nameLen, scoreLen). Metoda je použávána pro __str__(self).
+        uloženy jako tuple (nameLen, scoreLen). Metoda je použávána pro page().
         '''
-        nameLen = 0
-        scoreLen = 0
-
-        for name, score in self.records:
-            if len(name) > nameLen: nameLen = len(name)
-            if len(format(score, ",d")) > scoreLen: scoreLen = len(format(score, ",d"))
-        return (nameLen, scoreLen)
+        if self._longest is None:
+            nameLen = max([len(name) for name in self._recordCounts] or [0])
+            # nejdelší je zápis nejvyššího, případně nejnižšího (záporného) skóre
+            scoreLen = 0
+            if self.records:
+                scoreLen = max(len(format(self.records[0][1], ",d")), len(format(self.records.last()[1], ",d")))
+            self._longest = (nameLen, scoreLen)
+        return self._longest
 
 
     def _cmpByScore(record):
@@ -156,21 +519,50 @@ class Highscores(object):
         '''
         if len(self.records) < self.maxRecords:
             return True
+        # nejnižší skóre žebříčku je poslední
+        return self.records.last()[1] < candidateScore
+
+
+    def bestScore(self, playerName):
+        '''
+        Vrací nejlepší skóre hráče v žebříčku, případně None.
+        '''
+        return self._bestScores.get(playerName[:self.MAX_NAME_LENGTH])
 
-        for name,score in self.records:
-            if score < candidateScore:
-                return True
-        return False
+
+    def rank(self, score):
+        '''
+        Vrací pořadí (od 1), na které by se záznam se skóre score zařadil.
+        '''
+        return self.records.bisectRight(score) + 1
 
 
     def addHighscore(self, playerName, score):        
+        '''
+        Přidá záznam do žebříčku. Vrací jeho pořadí (od 1), případně None,
+        pokud se do žebříčku nevešel.
+        '''
         # ořízneme jméno na maximální povolenou délku
         playerName = playerName[:self.MAX_NAME_LENGTH]
-        # přidáme záznam
-        self.records.append((playerName, score))
-        # záznamy seřadíme sestupně podle skóre
-        self.records.sort(key=Highscores._cmpByScore, reverse=True)
-        # přebytečné záznamy ořízneme
-        self.records = self.records[:self.maxRecords]
+        # zařadíme záznam za všechny se stejným nebo vyšším skóre
+        if self.records.bisectRight(score) >= self.maxRecords:
+            return None
+        index = self.records.insert((playerName, score))
+        if score > self._bestScores.get(playerName, score - 1):
+            self._bestScores[playerName] = score
+        self._recordCounts[playerName] = self._recordCounts.get(playerName, 0) + 1
+        if self.storage:
+            self.storage.add(playerName, score)
+
+        # přebytečný (nejnižší) záznam ořízneme; bylo-li to nejlepší skóre
+        # hráče, jiné záznamy už v žebříčku nemá
+        if len(self.records) > self.maxRecords:
+            name, score = self.records.pop()
+            self._recordCounts[name] -= 1
+            if not self._recordCounts[name]:
+                del self._recordCounts[name]
+                del self._bestScores[name]
+        self._invalidate()
+        return index + 1
 
 
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Leaderboard                                                          #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Společný žebříček pro více instalací QTetrisu. LeaderboardServer je asyncio  #
+# server nad třídou Highscores (volitelně s databází), LeaderboardClient je    #
+# náhrada Highscores pro hru: drží si lokální kopii žebříčku, nová skóre       #
+# zapisuje nejdřív do ní a na server je odesílá na pozadí (write-behind)       #
+# v dávkách přes pool spojení. Je-li server nedostupný, skóre čekají ve        #
+# frontě, která se při ukončení uloží do souboru a odešle se později.          #
+#                                                                              #
+# Protokol: jeden JSON objekt na řádek v obou směrech, odpovědi chodí ve       #
+# stejném pořadí jako požadavky.                                               #
+#   {"op": "submit", "records": [[jméno, skóre], ...]} -> {"ranks": [...]}     #
+#   {"op": "top", "count": n, "offset": 0}             -> {"records": [...]}   #
+#   {"op": "rank", "score": s}                         -> {"rank": r}          #
+# Každá odpověď obsahuje "ok"; při chybě je "ok" false a "error" popis.        #
+# Odpověď na "submit" odejde až po zápisu skóre do databáze serveru.           #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python leaderboard.py serve --db leaderboard.db                          #
+#   $ python leaderboard.py top                                                #
+#   $ python leaderboard.py load --clients 2000 --submits 10                   #
+#                                                                              #
+################################################################################
+
+
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import collections
+import concurrent.futures
+
+import highscores
+
+
+
+
+HOST = "127.0.0.1"
+PORT = 47500
+# maximální délka jednoho řádku požadavku v bajtech
+MAX_LINE = 1024 * 1024
+
+
+
+class LeaderboardError(Exception):
+    pass
+
+
+
+def encode(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+
+#############################################################################
+
+
+
+class LeaderboardServer(object):
+    '''
+        Server žebříčku. Všechny požadavky obsluhuje jedno vlákno s asyncio
+    smyčkou, takže přístup k tabulce nepotřebuje zámky a server zvládne
+    tisíce současně připojených klientů.
+        S databází (fileName) se tabulka mění jen v paměti a zápis na disk
+    obstarává jediný zapisovač (writeRecords()): posbírá skóre všech dávek
+    "submit", které mezitím přišly, zapíše je v jedné transakci ve vlastním
+    vlákně a teprve pak na dávky odpoví. Smyčka tak na disk nikdy nečeká
+    a jeden commit pokryje libovolný počet současných klientů.
+    '''
+
+    # délka fronty nepřijatých spojení
+    BACKLOG = 4096
+    # maximální počet záznamů vrácených jedním požadavkem "top"
+    MAX_TOP = 1000
+
+
+    def __init__(self, table, fileName=None):
+        # tabulka highscores v paměti a soubor její databáze (None => bez databáze)
+        self.table = table
+        self.fileName = fileName
+        self.server = None
+        self.connections = 0
+
+        # databáze (HighscoresStore) a vlákno, ve kterém se s ní jediným pracuje
+        self.store = None
+        self.writer = None
+        # dávky (záznamy, future) čekající na zápis a úloha zapisovače
+        self.writeQueue = None
+        self.writeTask = None
+
+
+    async def start(self, host=HOST, port=PORT):
+        if self.fileName:
+            loop = asyncio.get_running_loop()
+            self.writer = concurrent.futures.ThreadPoolExecutor(1, "leaderboard-writer")
+            # databáze se otevře (a záznamy načtou) ve vlákně zapisovače, SQLite
+            # spojení se smí používat jen ve vlákně, které jej vytvořilo
+            await loop.run_in_executor(self.writer, self.table.open, self.fileName, None)
+            self.store, self.table.storage = self.table.storage, None
+            self.writeQueue = asyncio.Queue()
+            self.writeTask = asyncio.ensure_future(self.writeRecords())
+        self.server = await asyncio.start_server(self.handleClient, host, port,
+                backlog=self.BACKLOG, limit=MAX_LINE)
+        return self.server
+
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+        if self.writeTask:
+            self.writeTask.cancel()
+            try:
+                await self.writeTask
+            except asyncio.CancelledError:
+                pass
+        if self.writer:
+            if self.store:
+                await asyncio.get_running_loop().run_in_executor(self.writer, self.store.close)
+            self.writer.shutdown()
+
+
+    async def writeRecords(self):
+        '''
+        Jediný zapisovač do databáze: počká na první dávku, přibere všechny,
+        které mezitím přišly, a zapíše je v jedné transakci ve vlákně writer.
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            batches = [await self.writeQueue.get()]
+            while not self.writeQueue.empty():
+                batches.append(self.writeQueue.get_nowait())
+            records = [record for batch, done in batches for record in batch]
+            try:
+                if self.store:
+                    await loop.run_in_executor(self.writer, self.store.addBatch, records)
+            except Exception as e:
+                for batch, done in batches:
+                    if not done.done():
+                        done.set_exception(LeaderboardError("can't store records: %s" % e))
+                continue
+            for batch, done in batches:
+                if not done.done():
+                    done.set_result(None)
+
+
+    async def handleClient(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(await self.handleLine(line))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # klient spojení přerušil nebo poslal příliš dlouhý řádek
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+
+    async def handleLine(self, line):
+        try:
+            response = self.handleRequest(json.loads(line))
+            if "stored" in response:
+                # skóre jsou v tabulce, odpověď počká na jejich zápis na disk
+                await response.pop("stored")
+            response["ok"] = True
+        except (ValueError, KeyError, TypeError, LeaderboardError) as e:
+            response = {"ok": False, "error": str(e)}
+        return encode(response)
+
+
+    def handleRequest(self, request):
+        op = request["op"]
+        if op == "submit":
+            records = [(str(name), int(score)) for name, score in request["records"]]
+            ranks = [self.table.addHighscore(name, score) for name, score in records]
+            response = {"ranks": ranks}
+            # do databáze patří jen skóre, která se do žebříčku vešla
+            accepted = [record for record, rank in zip(records, ranks) if rank]
+            if self.writeQueue is not None and accepted:
+                stored = asyncio.get_running_loop().create_future()
+                self.writeQueue.put_nowait((accepted, stored))
+                response["stored"] = stored
+            return response
+        elif op == "top":
+            offset = max(0, int(request.get("offset", 0)))
+            count = max(0, min(self.MAX_TOP, int(request.get("count", self.table.maxRecords))))
+            return {"records": self.table.records[offset:offset + count],
+                    "total": len(self.table.records)}
+        elif op == "rank":
+            return {"rank": self.table.rank(int(request["score"]))}
+        raise LeaderboardError("unknown operation \"%s\"" % op)
+
+
+
+#############################################################################
+
+
+
+class ConnectionPool(object):
+    '''
+    Nejvýše size otevřených spojení na server sdílených požadavky; spojení
+    se otevírají až při potřebě a po chybě se zahodí.
+    '''
+
+    def __init__(self, host, port, size, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(size)
+        # nepoužívaná otevřená spojení (reader, writer)
+        self.idle = []
+
+
+    async def request(self, message):
+        async with self.semaphore:
+            if self.idle:
+                reader, writer = self.idle.pop()
+            else:
+                reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, limit=MAX_LINE), self.timeout)
+            try:
+                writer.write(encode(message))
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError("connection closed by server")
+            except BaseException:
+                writer.close()
+                raise
+            self.idle.append((reader, writer))
+
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise LeaderboardError(response.get("error"))
+        return response
+
+
+    def close(self):
+        for reader, writer in self.idle:
+            writer.close()
+        self.idle = []
+
+
+
+#############################################################################
+
+
+
+class LeaderboardClient(highscores.Highscores):
+    '''
+        Náhrada Highscores napojená na LeaderboardServer. Metody volané z GUI
+    (isNewHighscore, addHighscore, page, ...) pracují jen s lokální kopií
+    žebříčku, takže nikdy nečekají na síť. Komunikace běží ve vlastním vlákně
+    s asyncio smyčkou: nová skóre odesílá v dávkách po BATCH_SIZE přes pool
+    spojení a po každém odeslání si ze serveru stáhne aktuální žebříček.
+        Skóre se ze fronty odebere až po potvrzení serverem (doručení alespoň
+    jednou); nepotvrzená skóre se při close() uloží do queueFileName.
+    '''
+
+    POOL_SIZE = 4
+    BATCH_SIZE = 100
+    # časový limit jednoho požadavku a prodleva před dalším pokusem (s)
+    TIMEOUT = 5.0
+    RETRY_INTERVAL = 5.0
+    # jak dlouho close() čeká na odeslání zbylých skóre (volá se z GUI při
+    # zavření okna); co se nestihne, odešle se po příštím spuštění z fronty
+    CLOSE_TIMEOUT = 0.4
+
+
+    def __init__(self, maxRecords, host=HOST, port=PORT, queueFileName=None, poolSize=POOL_SIZE):
+        highscores.Highscores.__init__(self, maxRecords)
+        self.host = host
+        self.port = port
+        self.queueFileName = queueFileName
+        self.poolSize = poolSize
+        # chrání lokální kopii žebříčku a frontu před souběhem GUI a síťového vlákna
+        self.lock = threading.Lock()
+        # neodeslaná skóre {pořadové číslo: (jméno, skóre)}
+        self.pending = collections.OrderedDict()
+        self.nextSequence = 0
+        # stav posledního pokusu o spojení se serverem
+        self.online = False
+
+        self.loop = None
+        self.thread = None
+        # úloha _run() běžící ve smyčce síťového vlákna
+        self.task = None
+        self.wakeup = None
+        self.stopping = False
+
+
+    # rozhraní Highscores pro GUI
+
+    def open(self):
+        '''
+        Načte frontu neodeslaných skóre a spustí síťové vlákno.
+        '''
+        if self.queueFileName and os.path.exists(self.queueFileName):
+            try:
+                with open(self.queueFileName, encoding="utf-8") as file:
+                    for name, score in json.load(file):
+                        self._enqueue(name, score)
+            except (IOError, ValueError, TypeError):
+                print("leaderboard.py: queue file \"%s\" is inconsistent" % self.queueFileName)
+            self._mergePending(self.records)
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._runLoop, name="leaderboard", daemon=True)
+        self.thread.start()
+
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        '''
+        Zkusí do timeout sekund odeslat zbylá skóre, ukončí síťové vlákno
+        a neodeslaná skóre uloží do fronty na disku. Celkem čeká nejvýše
+        2 * timeout, i když server neodpovídá.
+        '''
+        if self.loop:
+            self.stopping = True
+            self._wake()
+            self.thread.join(timeout)
+            if self.thread.is_alive() and self.task:
+                # vlákno nestihlo skončit (čeká na server) => síťovou úlohu
+                # zrušíme, smyčku pak zavře samo vlákno
+                self.loop.call_soon_threadsafe(self.task.cancel)
+                self.thread.join(timeout)
+            self.loop = None
+
+        if self.queueFileName:
+            with self.lock:
+                records = list(self.pending.values())
+            try:
+                if records:
+                    with open(self.queueFileName + ".tmp", "w", encoding="utf-8") as file:
+                        json.dump(records, file, ensure_ascii=False)
+                    os.replace(self.queueFileName + ".tmp", self.queueFileName)
+                elif os.path.exists(self.queueFileName):
+                    os.remove(self.queueFileName)
+            except IOError:
+                print("leaderboard.py: can't write queue to file \"%s\"" % self.queueFileName)
+
+
+    def addHighscore(self, playerName, score):
+        playerName = playerName[:self.MAX_NAME_LENGTH]
+        with self.lock:
+            rank = highscores.Highscores.addHighscore(self, playerName, score)
+            self._enqueue(playerName, score)
+        self._wake()
+        return rank
+
+
+    def isNewHighscore(self, candidateScore):
+        with self.lock:
+            return highscores.Highscores.isNewHighscore(self, candidateScore)
+
+
+    def bestScore(self, playerName):
+        with self.lock:
+            return highscores.Highscores.bestScore(self, playerName)
+
+
+    def rank(self, score):
+        with self.lock:
+            return highscores.Highscores.rank(self, score)
+
+
+    def pageCount(self, pageSize):
+        with self.lock:
+            return highscores.Highscores.pageCount(self, pageSize)
+
+
+    def page(self, index, pageSize):
+        with self.lock:
+            return highscores.Highscores.page(self, index, pageSize)
+
+
+    def _wake(self):
+        # probudí síťové vlákno (nové skóre nebo ukončení); před spuštěním
+        # smyčky není co budit, první průchod odešle celou frontu
+        loop = self.loop
+        if loop and self.wakeup:
+            try:
+                loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:
+                # smyčka už skončila
+                pass
+
+
+    def _enqueue(self, name, score):
+        self.pending[self.nextSequence] = (name, score)
+        self.nextSequence += 1
+
+
+    def _mergePending(self, records):
+        # lokální kopie = žebříček ze serveru + dosud neodeslaná skóre
+        self._setRecords(self._topRecords(list(records) + list(self.pending.values())))
+
+
+    # síťové vlákno
+
+    def _runLoop(self):
+        # vlastní odkaz na smyčku, close() může self.loop mezitím zrušit
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        self.task = loop.create_task(self._run())
+        try:
+            loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            # úlohu zrušilo close(), protože nestihla skončit
+            pass
+        finally:
+            loop.close()
+
+
+    async def _run(self):
+        self.wakeup = asyncio.Event()
+        pool = ConnectionPool(self.host, self.port, self.poolSize, self.TIMEOUT)
+        try:
+            while True:
+                self.wakeup.clear()
+                try:
+                    await self._flush(pool)
+                    await self._refresh(pool)
+                    self.online = True
+                except (OSError, asyncio.TimeoutError, ValueError, LeaderboardError):
+                    self.online = False
+                    pool.close()
+                    if self.stopping:
+                        break
+                    # server je nedostupný => další pokus po RETRY_INTERVAL
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), self.RETRY_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.stopping:
+                    break
+                await self.wakeup.wait()
+        finally:
+            pool.close()
+
+
+    async def _flush(self, pool):
+        # odešle všechna čekající skóre v dávkách souběžně přes pool spojení
+        with self.lock:
+            pending = list(self.pending.items())
+        batches = [pending[i:i + self.BATCH_SIZE] for i in range(0, len(pending), self.BATCH_SIZE)]
+        await asyncio.gather(*(self._submit(pool, batch) for batch in batches))
+
+
+    async def _submit(self, pool, batch):
+        await pool.request({"op": "submit", "records": [record for sequence, record in batch]})
+        with self.lock:
+            for sequence, record in batch:
+                del self.pending[sequence]
+
+
+    async def _refresh(self, pool):
+        response = await pool.request({"op": "top", "count": self.maxRecords})
+        with self.lock:
+            self._mergePending(tuple(record) for record in response["records"])
+
+
+
+#############################################################################
+
+
+
+async def serve(args):
+    server = LeaderboardServer(highscores.Highscores(args.records), args.db)
+    await server.start(args.host, args.port)
+    print("leaderboard listening on %s:%d" % (args.host, args.port), file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+async def top(args):
+    pool = ConnectionPool(args.host, args.port, 1, LeaderboardClient.TIMEOUT)
+    try:
+        response = await pool.request({"op": "top", "count": args.count})
+    finally:
+        pool.close()
+    for i, (name, score) in enumerate(response["records"]):
+        print("%4d. %-10s %12d" % (i + 1, name, score))
+
+
+async def load(args):
+    '''
+    Zátěžový test: args.clients současně připojených klientů, každý odešle
+    args.submits skóre (po jednom, s čekáním na odpověď).
+    '''
+    latencies = []
+
+    async def submitter(i):
+        rng = random.Random(i)
+        reader, writer = await asyncio.open_connection(args.host, args.port, limit=MAX_LINE)
+        try:
+            for j in range(args.submits):
+                started = time.perf_counter()
+                writer.write(encode({"op": "submit", "records": [["hrac%d" % i, rng.randrange(1000000)]]}))
+                if not json.loads(await reader.readline())["ok"]:
+                    raise LeaderboardError("submit failed")
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(submitter(i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print("%d clients, %d submits in %.2f s (%.0f submits/s), latency p50 %.1f ms, p99 %.1f ms"
+          % (args.clients, len(latencies), elapsed, len(latencies) / elapsed,
+             latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000))
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Společný žebříček QTetrisu.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    serveParser = commands.add_parser("serve", help="spustí server žebříčku")
+    serveParser.add_argument("--db", help="databáze SQLite, do které se záznamy ukládají")
+    serveParser.add_argument("--records", type=int, default=10000, help="maximální počet záznamů v žebříčku")
+    serveParser.set_defaults(run=serve)
+
+    topParser = commands.add_parser("top", help="vypíše nejlepší záznamy")
+    topParser.add_argument("--count", type=int, default=10)
+    topParser.set_defaults(run=top)
+
+    loadParser = commands.add_parser("load", help="zátěžový test běžícího serveru")
+    loadParser.add_argument("--clients", type=int, default=1000)
+    loadParser.add_argument("--submits", type=int, default=10)
+    loadParser.set_defaults(run=load)
+
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(args.run(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
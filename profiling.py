@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Profiling                                                            #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Volitelné měření času během hry. FrameProfiler zaznamenává dobu zpracování   #
+# tiku časovače (QTetris.timerEvent -> advanceFrames), skutečný interval mezi  #
+# tiky oproti nastavenému (zpoždění časovače a vynechané tiky), zpoždění       #
+# vstupu od stisku klávesy po dokončení překreslení a dobu paintEvent.         #
+# Pro každou veličinu drží klouzavé okno posledních vzorků, ze kterého počítá  #
+# percentily p50/p95/p99; posledních LOG_SIZE vzorků lze uložit jako CSV.      #
+# StartupProfiler rozloží dobu studeného startu na jednotlivé fáze (import,    #
+# načtení obrázků, vytvoření okna, první vykreslení, načtení žebříčku).        #
+#                                                                              #
+################################################################################
+
+
+
+import time
+import collections
+
+
+
+
+class RollingSamples(object):
+    '''
+    Posledních maxSamples naměřených hodnot jedné veličiny (v milisekundách).
+    '''
+
+    def __init__(self, maxSamples=1000):
+        self.samples = collections.deque(maxlen=maxSamples)
+        # počet všech vzorků od začátku měření
+        self.count = 0
+
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+
+
+    def percentiles(self, ps=(50, 95, 99)):
+        '''
+        Vrátí n-tici percentilů ps z vzorků v okně (nejbližší hodnota),
+        při prázdném okně samé nuly.
+        '''
+        if not self.samples:
+            return tuple(0.0 for p in ps)
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, int(round(p / 100 * last)))] for p in ps)
+
+
+
+class FrameProfiler(object):
+    '''
+        Sběr časových údajů z hlavní smyčky hry. Volání jsou levná (jen
+    time.perf_counter a přidání do deque), takže profiler lze nechat zapnutý
+    i během normálního hraní.
+        Tik je považován za vynechaný, když od předchozího uběhlo víc než
+    DROP_FACTOR násobek nastaveného intervalu časovače.
+    '''
+
+    # názvy měřených veličin (a zároveň hodnoty sloupce "kind" v CSV)
+    TICK = "tick"
+    TICK_DRIFT = "tickDrift"
+    INPUT_LATENCY = "inputLatency"
+    PAINT = "paint"
+    KINDS = (TICK, TICK_DRIFT, INPUT_LATENCY, PAINT)
+
+    DROP_FACTOR = 1.5
+    # počet vzorků pro export do CSV (při 60 snímcích za sekundu zhruba
+    # posledních 10 minut hry), starší se zahazují
+    LOG_SIZE = 100000
+
+
+    def __init__(self, maxSamples=1000, logSize=LOG_SIZE):
+        self.start = time.perf_counter()
+        self.stats = dict((kind, RollingSamples(maxSamples)) for kind in self.KINDS)
+        # posledních logSize vzorků (kind, čas od začátku v ms, hodnota v ms)
+        # pro export do CSV
+        self.log = collections.deque(maxlen=logSize)
+
+        self.timerInterval = None
+        self.lastTick = None
+        self.droppedTicks = 0
+        # časy stisků kláves čekajících na překreslení
+        self.pendingInputs = []
+
+
+    def now(self):
+        return time.perf_counter()
+
+
+    def add(self, kind, value, timestamp=None):
+        if timestamp is None:
+            timestamp = self.now()
+        self.stats[kind].add(value)
+        self.log.append((kind, (timestamp - self.start) * 1000, value))
+
+
+    # časovač a tiky
+
+    def timerStarted(self, interval):
+        '''
+        Časovač hry byl (znovu)spuštěn s intervalem interval ms; interval
+        od předchozího tiku se pak nepočítá jako zpoždění.
+        '''
+        self.timerInterval = interval
+        self.lastTick = self.now()
+
+
+    def tickStarted(self):
+        '''
+        Začátek zpracování tiku; vrací časovou značku pro tickFinished().
+        '''
+        now = self.now()
+        if self.lastTick is not None and self.timerInterval:
+            elapsed = (now - self.lastTick) * 1000
+            self.add(self.TICK_DRIFT, elapsed - self.timerInterval, now)
+            if elapsed > self.DROP_FACTOR * self.timerInterval:
+                # místo jednoho tiku uběhlo víc intervalů
+                self.droppedTicks += int(elapsed // self.timerInterval) - 1
+        self.lastTick = now
+        return now
+
+
+    def tickFinished(self, started):
+        self.add(self.TICK, (self.now() - started) * 1000)
+
+
+    # vstup a překreslení
+
+    def inputStarted(self):
+        return self.now()
+
+
+    def inputFinished(self, started, repaintPending):
+        '''
+        Vstup byl zpracován. Čeká-li se na překreslení, zpoždění se změří až
+        po jeho dokončení (paintFinished()), jinak hned.
+        '''
+        if repaintPending:
+            self.pendingInputs.append(started)
+        else:
+            self.add(self.INPUT_LATENCY, (self.now() - started) * 1000)
+
+
+    def paintStarted(self):
+        return self.now()
+
+
+    def paintFinished(self, started):
+        now = self.now()
+        self.add(self.PAINT, (now - started) * 1000, now)
+        for inputStarted in self.pendingInputs:
+            self.add(self.INPUT_LATENCY, (now - inputStarted) * 1000, now)
+        self.pendingInputs = []
+
+
+    # výstupy
+
+    def summary(self):
+        '''
+        Řádky textu s percentily všech veličin pro zobrazení v překryvu.
+        '''
+        lines = []
+        for kind in self.KINDS:
+            p50, p95, p99 = self.stats[kind].percentiles()
+            lines.append("%-12s %6.1f %6.1f %6.1f ms" % (kind, p50, p95, p99))
+        lines.append("dropped ticks %d" % self.droppedTicks)
+        return lines
+
+
+    def exportCsv(self, fileName):
+        with open(fileName, "w") as file:
+            file.write("kind,timeMs,valueMs\n")
+            for kind, timestamp, value in self.log:
+                file.write("%s,%.3f,%.3f\n" % (kind, timestamp, value))
+
+
+
+class StartupProfiler(object):
+    '''
+    Doba startu aplikace rozložená na fáze. Každé volání mark() ukončí
+    fázi, která začala předchozím voláním (první začíná časem start).
+    '''
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.last = self.start
+        # dvojice (název fáze, doba v ms) v pořadí, jak proběhly
+        self.phases = []
+
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000))
+        self.last = now
+
+
+    def report(self):
+        '''
+        Řádky textu s dobou jednotlivých fází a celkovou dobou startu.
+        '''
+        lines = ["%-12s %8.1f ms" % (phase, duration) for phase, duration in self.phases]
+        lines.append("%-12s %8.1f ms" % ("total", (self.last - self.start) * 1000))
+        return lines
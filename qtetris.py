@@ -19,13 +19,30 @@
 
 
 import sys
-import random
+import os
 import re
-import time # sleep
-import threading # zámek Lock
+import time
+import math
+import random
+import collections
+
+# začátek importu (fáze "import" v hlášení o době startu)
+IMPORT_STARTED = time.perf_counter()
+
 from PyQt4 import QtCore, QtGui
 
-import highscores
+import bot
+import replay
+from profiling import FrameProfiler, StartupProfiler
+from engine import GameEngine, GameEvent, GameScore, Tetrominoe, TetrominoeShape
+
+
+
+# obrázky se hledají vedle modulu, nezávisle na aktuálním adresáři
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+def imagePath(name):
+    return os.path.join(IMAGES_DIR, name)
 
 
 
@@ -34,37 +51,76 @@ import highscores
 class QTetris(QtGui.QMainWindow):
     '''
     Centrální třída mající celý tetris na starosti. Spravuje level, rychlost hry a skóre.
+        Hra běží ve snímcích s pevným krokem (GameScore.FRAME_RATE za sekundu):
+    časovač tiká zhruba jednou za snímek a advanceFrames() odehraje tolik snímků,
+    kolik odpovídá uplynulému reálnému času. V každém snímku se gravitace levelu
+    (v 1/GameScore.GRAVITY_UNIT políčka za snímek) přičte k akumulátoru a o celá
+    políčka tetromino spadne najednou, rychlost hry tak nezávisí na intervalu
+    časovače a vysoké levely (až 20G) nezahlcují event loop.
     '''
 
-    # základní rychlost levelu 1
-    BASIC_SPEED = 500
-    # zrychlený pád při stisku šipky dolů
-    QUICKFALL_SPEED = 50
-
-    speed = BASIC_SPEED
-    score = 0
+    # zrychlený pád při stisku šipky dolů: aspoň 1/3 políčka za snímek (~50 ms na políčko)
+    SOFT_DROP_GRAVITY = GameScore.GRAVITY_UNIT // 3
+    # kolik snímků musí tetromino ležet, než se napevno umístí
+    LOCK_DELAY = 30
+    # nejvíce snímků dohnaných v jednom tiku časovače; po delším zaseknutí
+    # se zbytek zahodí
+    MAX_CATCHUP_FRAMES = 5
 
-    # počítá kolikrát hráč skóroval a od toho odvíjí level (není důležité kolik
-    # zboural řad, ale kolikrát se bourání podařilo)
-    scoredCount = 0
-    level = 1
-    # kolikrát je třeba skórovat, než se postoupí na další level
-    DESTRUCTIONS_TO_LEVEL_UP = 7
-
-    # aktuální stav hry (nabývá hodnot POSSIBLE_STATES)
-    state = "neaktivní"
     # regulérní výrazy povolených stavů self.state (řetězce nesmí obsahovat "|")
     POSSIBLE_STATES = ("neaktivní", "level \\d+", "pauza", "konec hry")
 
 
 
-    def __init__(self, parent=None):
+    # fronta skóre neodeslaných na server společného žebříčku
+    LEADERBOARD_QUEUE_FILE = "leaderboard-queue.json"
+    # počet záznamů na jedné stránce výpisu highscores
+    HIGHSCORES_PAGE_SIZE = 20
+
+    # soubor, do kterého se při ukončení uloží naměřené časy (je-li zapnuté měření)
+    PROFILE_FILE = "profile.csv"
+
+    # Držení klávesy posunu do strany: první opakování po DAS milisekundách
+    # (delayed auto shift), další vždy po ARR milisekundách (auto repeat rate);
+    # ARR 0 posune tetromino rovnou až ke stěně. Opakování klávesy od systému
+    # se ignoruje, takže rychlost posunu nezávisí na nastavení klávesnice.
+    DAS = 170
+    ARR = 50
+    # interval časovače snímků hry a zpracování fronty vstupů v milisekundách
+    FRAME_INTERVAL = 16
+
+
+
+    def __init__(self, parent=None, profiler=None, das=DAS, arr=ARR, leaderboardAddress=None,
+            boardWidth=GameEngine.WIDTH, boardHeight=GameEngine.HEIGHT, startup=None,
+            hostAddress=None, joinAddress=None):
         # widgety v okně (labely, hrací plocha)
         QtGui.QMainWindow.__init__(self, parent)
 
+        # měření doby startu (profiling.StartupProfiler), None => neměří se
+        self.startup = startup
+
+        # fronta vstupů (akce, čas stisku) zpracovávaná jednou za snímek
+        # a držené klávesy {klávesa: [akce, čas stisku, počet opakování]}
+        self.das = das
+        self.arr = arr
+        self.inputQueue = collections.deque()
+        self.heldKeys = {}
+        self.inputTimer = QtCore.QBasicTimer()
+
+        # měření časů (profiling.FrameProfiler), None => neměří se
+        self.profiler = profiler
+
         self.setWindowTitle("QTetris")
 
-        self.setWindowIcon(QtGui.QIcon("images/icon.png"))
+        self.setWindowIcon(QtGui.QIcon(imagePath("icon.png")))
+
+        # skóre a level (viz engine.GameScore), gravitace aktuálního levelu
+        # (viz GameScore.gravity()) a aktuální stav hry (nabývá hodnot POSSIBLE_STATES);
+        # veškerý stav hry patří instanci, v jednom procesu tak může běžet více her
+        self.gameScore = GameScore()
+        self.gravity = self.gameScore.gravity()
+        self.state = None
 
         self.scoreLabel = QtGui.QLabel(self)
         self.newScore() # nastavení skóre na nulu
@@ -72,7 +128,8 @@ class QTetris(QtGui.QMainWindow):
         self.stateLabel = QtGui.QLabel(self)
         self.setState("neaktivní")
 
-        self.gameBoard = GameBoard(self, self)
+        # rozměry hrací desky se zadávají pro každou hru (viz --width, --height)
+        self.gameBoard = GameBoard(self, profiler=profiler, boardWidth=boardWidth, boardHeight=boardHeight)
 
 
         # rozvržení
@@ -87,7 +144,14 @@ class QTetris(QtGui.QMainWindow):
         vbox.addLayout(hbox)
         vbox.addWidget(self.gameBoard)
 
-        masterFrame.setLayout(vbox)
+        # vpravo zrcadla desek soupeřů (jen ve hře proti soupeřům)
+        self.opponentsLayout = QtGui.QVBoxLayout()
+
+        masterBox = QtGui.QHBoxLayout()
+        masterBox.addLayout(vbox)
+        masterBox.addLayout(self.opponentsLayout)
+
+        masterFrame.setLayout(masterBox)
 
         self.setCentralWidget(masterFrame)
 
@@ -97,6 +161,14 @@ class QTetris(QtGui.QMainWindow):
         actionNewGame = QtGui.QAction("&Nová hra", self)
         actionNewGame.setShortcut("Ctrl+N")
         self.connect(actionNewGame, QtCore.SIGNAL("triggered()"), self.newGame)
+        # Soubor -> Uložit záznam hry
+        actionSaveReplay = QtGui.QAction("&Uložit záznam hry...", self)
+        actionSaveReplay.setShortcut("Ctrl+S")
+        self.connect(actionSaveReplay, QtCore.SIGNAL("triggered()"), self.saveReplay)
+        # Soubor -> Přehrát záznam hry
+        actionPlayReplay = QtGui.QAction("Př&ehrát záznam hry...", self)
+        actionPlayReplay.setShortcut("Ctrl+O")
+        self.connect(actionPlayReplay, QtCore.SIGNAL("triggered()"), self.openReplay)
         # Soubor -> Pauza
         actionPause = QtGui.QAction(QtGui.QStyle.standardIcon(self.style(), QtGui.QStyle.SP_MediaPause), "&Pauza", self)
         actionPause.setShortcut("P")
@@ -112,37 +184,161 @@ class QTetris(QtGui.QMainWindow):
         # Ostatní -> O programu
         actionAbout = QtGui.QAction(QtGui.QStyle.standardIcon(self.style(), QtGui.QStyle.SP_MessageBoxInformation), "&O programu", self)
         self.connect(actionAbout, QtCore.SIGNAL("triggered()"), self.popupAuthorInfo)
+        # Ostatní -> Automatická hra
+        actionAutoplay = QtGui.QAction("&Automatická hra", self)
+        actionAutoplay.setShortcut("Ctrl+A")
+        actionAutoplay.setCheckable(True)
+        self.connect(actionAutoplay, QtCore.SIGNAL("toggled(bool)"), self.setAutoplay)
+        # Ostatní -> Stín tetromina
+        actionGhost = QtGui.QAction("&Stín tetromina", self)
+        actionGhost.setShortcut("Ctrl+G")
+        actionGhost.setCheckable(True)
+        actionGhost.setChecked(True)
+        self.connect(actionGhost, QtCore.SIGNAL("toggled(bool)"), self.gameBoard.setShowGhost)
 
         menubar = self.menuBar()
         menuFile = menubar.addMenu("&Soubor")
         menuFile.addAction(actionNewGame)
         menuFile.addAction(actionPause)
         menuFile.addSeparator()
+        menuFile.addAction(actionSaveReplay)
+        menuFile.addAction(actionPlayReplay)
+        menuFile.addSeparator()
         menuFile.addAction(actionExit)
 
         menuOther = menubar.addMenu("&Ostatní")
         menuOther.addAction(actionAbout)
         menuOther.addAction(actionHighscore)
+        menuOther.addAction(actionAutoplay)
+        menuOther.addAction(actionGhost)
 
 
         # signály od widgetu self.gameBoard
         self.connect(self.gameBoard, QtCore.SIGNAL("scored(int)"), self.scored)
         self.connect(self.gameBoard, QtCore.SIGNAL("gameOver()"), self.gameOver)
         self.connect(self.gameBoard, QtCore.SIGNAL("tetrominoeFell()"), self.setNormalSpeed)
+        self.connect(self.gameBoard, QtCore.SIGNAL("painted()"), self.firstPainted)
 
         self.timer = QtCore.QBasicTimer()
+        # akumulátor reálného času pro snímky s pevným krokem (v sekundách)
+        # a čas posledního tiku časovače
+        self.frameAccumulator = 0.0
+        self.lastFrame = None
+        # gravitační akumulátor (v 1/GameScore.GRAVITY_UNIT políčka), zrychlený
+        # pád a počet snímků, po které padající tetromino leží
+        self.gravityAccumulator = 0
+        self.softDrop = False
+        self.lockFrames = 0
+
+        # záznam právě hrané hry (replay.Replay), poslední dokončený záznam
+        # a přehrávaný záznam s indexem jeho dalšího vstupu
+        self.recording = None
+        self.lastRecording = None
+        self.playback = None
+        self.playbackIndex = 0
 
         # NOTE: je třeba zavolat adjustZize, jinak bude self.size() dávat blbosti
         self.adjustSize()
-        self.setFixedSize(self.size())
 
 
         # DATA
-        self.highscores = highscores.Highscores(10)
-        self.highscores.importData()
+        # žebříček se načte až po prvním vykreslení okna (viz loadHighscores())
+        self.highscores = None
+        self.leaderboardAddress = leaderboardAddress
+
+        # hra proti soupeřům po síti (versus.VersusGame), None => hraje se sám;
+        # zrcadla soupeřů {číslo hráče: (GameBoard, QLabel)} a časovač síťové části
+        self.versus = None
+        self.opponentBoards = {}
+        self.networkTimer = QtCore.QBasicTimer()
 
         self.reset()
 
+        if hostAddress or joinAddress:
+            self.startVersus(hostAddress, joinAddress)
+
+
+    def firstPainted(self):
+        '''
+        SLOT pro signál "painted()", který GameBoard vyšle po svém prvním
+        vykreslení. Okno už je vidět, žebříček se tedy může načíst, jakmile
+        se event loop dostane ke slovu.
+        '''
+        if self.startup:
+            self.startup.mark("firstPaint")
+        QtCore.QTimer.singleShot(0, self.loadHighscores)
+
+
+    def loadHighscores(self):
+        '''
+        Načte žebříček, pokud ještě není načtený, a vrátí jej. Žebříček
+        je v databázi (starý highscores.txt se při prvním spuštění převede),
+        případně na serveru společného žebříčku (host, port). Moduly žebříčku
+        (sqlite3, asyncio) se importují až zde, aby nezdržovaly start.
+        '''
+        if self.highscores is None:
+            if self.leaderboardAddress:
+                import leaderboard
+                host, port = self.leaderboardAddress
+                self.highscores = leaderboard.LeaderboardClient(10, host, port, self.LEADERBOARD_QUEUE_FILE)
+            else:
+                import highscores
+                self.highscores = highscores.Highscores(10)
+            self.highscores.open()
+
+            if self.startup:
+                self.startup.mark("highscores")
+                print("\n".join(["startup:"] + self.startup.report()), file=sys.stderr)
+                self.startup = None
+        return self.highscores
+
+
+    def startVersus(self, hostAddress=None, joinAddress=None):
+        '''
+        Začne hru proti soupeřům: hostuje ji na adrese hostAddress, nebo se
+        připojí ke hře hostované na joinAddress. Modul versus (socket,
+        selectors) se importuje až zde.
+        '''
+        import versus
+        try:
+            if hostAddress:
+                peer = versus.VersusPeer.host(hostAddress)
+            else:
+                peer = versus.VersusPeer.join(joinAddress)
+        except OSError as e:
+            QtGui.QMessageBox.warning(self, "Hra proti soupeřům", "Spojení se nepodařilo navázat: %s" % e)
+            return
+        self.versus = versus.VersusGame(peer, self.gameBoard.engine)
+        self.networkTimer.start(self.FRAME_INTERVAL, self)
+
+
+    def updateOpponents(self):
+        '''
+        Síťová část snímku hry proti soupeřům: zpracuje přijaté zprávy (odpad
+        se zařadí do enginu), odešle změny vlastní desky a překreslí zrcadla
+        soupeřů, která se změnila.
+        '''
+        for player in self.versus.update():
+            mirror = self.versus.mirrors.get(player)
+            board, label = self.opponentBoards.get(player, (None, None))
+            if board and board.engine is not mirror:
+                # soupeř odešel nebo hraje na desce jiných rozměrů
+                del self.opponentBoards[player]
+                board.deleteLater()
+                label.deleteLater()
+                board = None
+            if mirror is None:
+                continue
+            if board is None:
+                label = QtGui.QLabel(self)
+                board = GameBoard(self, engine=mirror)
+                board.setShowGhost(False)
+                self.opponentsLayout.addWidget(label)
+                self.opponentsLayout.addWidget(board)
+                self.opponentBoards[player] = (board, label)
+            label.setText("hráč %d%s" % (player, ": konec hry" if player in self.versus.lost else ""))
+            board.refresh()
+
 
     def center(self):
         '''
@@ -153,37 +349,40 @@ class QTetris(QtGui.QMainWindow):
         self.move((screen.width() - win.width()) // 2, (screen.height() - win.height()) // 2)
 
 
-    def reset(self):
+    def reset(self, seed=None):
         '''
         Resetuje interní data, jako by byla hra právě spuštěna.
         '''
         self.timer.stop()
-        self.score = 0
-        self.scoredCount = 0
-        self.level = 1
-        self.speed = self.BASIC_SPEED
-        self.gameBoard.clear()
+        self.gameScore.reset()
+        self.gravity = self.gameScore.gravity()
+        self.setNormalSpeed()
+        self.gameBoard.clear(seed)
+        self.recording = None
+        self.playback = None
 
         # zobrazení v GUI
         self.newScore()
 
 
-    def getSpeed(self):
-        return self.speed
-
-
     def newScore(self):
-        self.scoreLabel.setText("skóre: %d" % self.score)
+        self.scoreLabel.setText("skóre: %d" % self.gameScore.score)
 
 
     def handleNewHighscore(self):
         '''
         Dosáhl-li hráč nového highscore, zeptá se jej na jméno a toto uloží.
         '''
-        if self.score != 0 and self.highscores.isNewHighscore(self.score):
+        score = self.gameScore.score
+        # při přehrávání záznamu hráč nic nedosáhl
+        if self.playback:
+            return
+        if score != 0 and self.loadHighscores().isNewHighscore(score):
             playerName, ok = QtGui.QInputDialog.getText(self, "Nové highscore", "Vaše jméno:")
             if ok:
-                self.highscores.addHighscore(playerName, self.score)
+                # LeaderboardClient skóre jen zařadí do fronty, na server jej
+                # odešle síťové vlákno
+                self.highscores.addHighscore(playerName, score)
 
 
     def setState(self, state):
@@ -219,15 +418,14 @@ class QTetris(QtGui.QMainWindow):
         Dovoluje-li to aktuální stav, odpauzuje hru.
         '''
         if self.state == "pauza":
-            self.timer.start(self.speed, self)
-            self.setState("level %d" % self.level)
+            self.restartTimer()
+            self.setState("level %d" % self.gameScore.level)
 
 
     def levelUp(self):
-        self.level += 1
-        self.setState("level %d" % self.level)
-        self.speed = int(self.speed * 0.75) # bloky padají rychleji
-        self.timer.start(self.speed, self)
+        # level už zvýšil self.gameScore
+        self.setState("level %d" % self.gameScore.level)
+        self.gravity = self.gameScore.gravity() # bloky padají rychleji
 
 
 
@@ -235,25 +433,45 @@ class QTetris(QtGui.QMainWindow):
 
     def scored(self, linesCount):
         # SLOT pro signál "scored(int)"
-        # přidělené skóre se liší podle počtu zbouraných řad
-        additionTable = (0, 100, 300, 500, 800)
-
-        self.scoredCount += 1
-        if self.scoredCount % self.DESTRUCTIONS_TO_LEVEL_UP == 0:
+        if self.gameScore.scored(linesCount):
             self.levelUp()
+        # soupeřům se pošle odpad (při přehrávání záznamu ne)
+        if self.versus and not self.playback:
+            self.versus.scored(linesCount)
 
-        self.score += additionTable[linesCount] * self.level
         self.newScore()
 
 
     def showHighscores(self):
+        '''
+        Zobrazí žebříček po stránkách HIGHSCORES_PAGE_SIZE záznamů.
+        '''
         self.pause()
-        msgBox = QtGui.QMessageBox(self)
-        msgBox.setWindowTitle("Dosažená skóre")
-        msgBox.setText(str(self.highscores))
-        # řetězec s highscores je úhledně formátovaný mezerami => nutné použití písma s pevnou šířkou znaků
-        msgBox.setFont(QtGui.QFont("Courier New"))
-        msgBox.show()
+        self.loadHighscores()
+        page = 0
+        pageCount = self.highscores.pageCount(self.HIGHSCORES_PAGE_SIZE)
+        while True:
+            msgBox = QtGui.QMessageBox(self)
+            msgBox.setWindowTitle("Dosažená skóre" if pageCount == 1
+                    else "Dosažená skóre (%d/%d)" % (page + 1, pageCount))
+            msgBox.setText(self.highscores.page(page, self.HIGHSCORES_PAGE_SIZE))
+            # řetězec s highscores je úhledně formátovaný mezerami => nutné použití písma s pevnou šířkou znaků
+            msgBox.setFont(QtGui.QFont("Courier New"))
+            previousButton = nextButton = None
+            if page > 0:
+                previousButton = msgBox.addButton("<< Předchozí", QtGui.QMessageBox.ActionRole)
+            if page + 1 < pageCount:
+                nextButton = msgBox.addButton("Další >>", QtGui.QMessageBox.ActionRole)
+            msgBox.addButton(QtGui.QMessageBox.Ok)
+            msgBox.exec_()
+
+            clicked = msgBox.clickedButton()
+            if previousButton is not None and clicked == previousButton:
+                page -= 1
+            elif nextButton is not None and clicked == nextButton:
+                page += 1
+            else:
+                break
 
 
     def popupAuthorInfo(self):
@@ -267,56 +485,324 @@ class QTetris(QtGui.QMainWindow):
 
 
 
+    def setAutoplay(self, enabled):
+        # SLOT pro menu -> Ostatní -> Automatická hra
+        # tahy bota se nenahrávají => záznam hry by byl neúplný
+        if enabled:
+            self.recording = None
+        self.gameBoard.setAutoplay(enabled)
+
+
     def newGame(self):
         # SLOT pro menu -> Soubor -> Nová hra
         self.reset()
-        self.setState("level %d" % self.level)
-        self.timer.start(self.speed, self)
+        self.startRecording()
+        if self.versus:
+            self.versus.newGame()
+        self.setState("level %d" % self.gameScore.level)
+        self.restartTimer()
 
 
     def gameOver(self):
         # SLOT pro signál "gameOver()"
         self.timer.stop()
         self.setState("konec hry")
+        if self.versus and not self.playback:
+            self.versus.gameOver()
+        if self.recording:
+            self.recording.finish(self.gameBoard.engine.tick)
+            self.lastRecording = self.recording
+            self.recording = None
         self.handleNewHighscore()
 
+
+    # záznamy her
+
+    def startRecording(self):
+        '''
+        Začne nahrávat vstupy právě začínající hry. Při automatické hře se
+        nenahrává (tahy bota nejdou přes handleInput()), ani při hře proti
+        soupeřům (odpad od soupeřů záznam neobsahuje).
+        '''
+        engine = self.gameBoard.engine
+        if not self.gameBoard.autoplayBot and not self.versus:
+            self.recording = replay.Replay(engine.seed, engine.width, engine.height)
+
+
+    def saveReplay(self):
+        # SLOT pro menu -> Soubor -> Uložit záznam hry
+        self.pause()
+        recording = self.lastRecording or self.recording
+        if not recording:
+            QtGui.QMessageBox.information(self, "Záznam hry", "Zatím není co uložit.")
+            return
+        fileName = QtGui.QFileDialog.getSaveFileName(self, "Uložit záznam hry", "", "Záznamy QTetrisu (*.qtr)")
+        if fileName:
+            try:
+                recording.save(fileName)
+            except IOError:
+                QtGui.QMessageBox.warning(self, "Záznam hry", "Záznam se nepodařilo uložit.")
+
+
+    def openReplay(self):
+        # SLOT pro menu -> Soubor -> Přehrát záznam hry
+        self.pause()
+        fileName = QtGui.QFileDialog.getOpenFileName(self, "Přehrát záznam hry", "", "Záznamy QTetrisu (*.qtr)")
+        if not fileName:
+            return
+        try:
+            recording = replay.Replay.load(fileName)
+        except (IOError, replay.ReplayError):
+            QtGui.QMessageBox.warning(self, "Záznam hry", "Soubor není platný záznam hry.")
+            return
+        self.playReplay(recording)
+
+
+    def playReplay(self, recording):
+        '''
+        Přehraje záznam hry v reálném čase; vstupy z klávesnice se po tu dobu
+        ignorují.
+        '''
+        engine = self.gameBoard.engine
+        if (recording.width, recording.height) != (engine.width, engine.height):
+            QtGui.QMessageBox.warning(self, "Záznam hry", "Záznam je z hrací desky jiných rozměrů.")
+            return
+        self.reset(recording.seed)
+        self.playback = recording
+        self.playbackIndex = 0
+        self.setState("level %d" % self.gameScore.level)
+        self.restartTimer()
+
+
+    def playbackInputs(self):
+        # provede vstupy přehrávaného záznamu zadané po engine.tick krocích hry
+        tick = self.gameBoard.engine.tick
+        inputs = self.playback.inputs
+        while self.playbackIndex < len(inputs) and inputs[self.playbackIndex][0] <= tick:
+            self.handleInput(inputs[self.playbackIndex][1])
+            self.playbackIndex += 1
+        if self.playback.endTick is not None and tick >= self.playback.endTick:
+            self.timer.stop()
+            self.setState("konec hry")
+            return False
+        return True
+
+
+    def playbackNextTick(self):
+        # krok hry, ve kterém má přehrávaný záznam další vstup (nebo konec)
+        if self.playbackIndex < len(self.playback.inputs):
+            return self.playback.inputs[self.playbackIndex][0]
+        if self.playback.endTick is not None:
+            return self.playback.endTick
+        return sys.maxsize
+
+
+    def handleInput(self, action, refresh=True):
+        '''
+        Provede akci hráče (konstanta ACTION_* z modulu replay) a zaznamená ji.
+        Posun a otočení, které se nepovedly (např. opakování u stěny), nic
+        nezměnily, a do záznamu se proto nezapisují. Při refresh=False se
+        hrací deska nepřekreslí (viz processInputs()). Vrací True, pokud akce
+        něco změnila.
+        '''
+        tick = self.gameBoard.engine.tick
+        changed = False
+        if action == replay.ACTION_LEFT:
+            changed = self.gameBoard.move(-1, 0, refresh)
+        elif action == replay.ACTION_RIGHT:
+            changed = self.gameBoard.move(1, 0, refresh)
+        elif action == replay.ACTION_ROTATE:
+            changed = self.gameBoard.rotate(refresh)
+        elif action == replay.ACTION_HARDDROP:
+            changed = self.gameBoard.hardDrop(refresh)
+        elif action == replay.ACTION_QUICKFALL:
+            self.quickFall()
+
+        if self.recording and (changed or action in (replay.ACTION_HARDDROP, replay.ACTION_QUICKFALL)):
+            self.recording.record(tick, action)
+        return changed
+
+
+    def processInputs(self):
+        '''
+        Jeden snímek zpracování vstupů: doplní automatická opakování držených
+        kláves, provede všechny akce ve frontě a hrací desku překreslí jednou.
+        '''
+        now = time.perf_counter()
+        engine = self.gameBoard.engine
+
+        for held in self.heldKeys.values():
+            action, pressed, repeats = held
+            elapsed = (now - pressed) * 1000 - self.das
+            if elapsed < 0:
+                continue
+            # ARR 0 => tolik opakování, aby tetromino dojelo až ke stěně
+            due = repeats + engine.width if self.arr <= 0 else 1 + int(elapsed // self.arr)
+            while held[2] < due:
+                self.inputQueue.append((action, now))
+                held[2] += 1
+
+        pressedTimes = []
+        blocked = set()
+        while self.inputQueue:
+            action, pressed = self.inputQueue.popleft()
+            # o stěnu narazivší opakování v tomto snímku už nezkoušíme
+            if action in blocked:
+                continue
+            if not self.handleInput(action, refresh=False) and action in self.REPEATED_ACTIONS:
+                blocked.add(action)
+            pressedTimes.append(pressed)
+
+        self.gameBoard.refresh()
+        if self.profiler:
+            for pressed in pressedTimes:
+                self.profiler.inputFinished(pressed, self.gameBoard.repaintPending)
+
+        if not self.heldKeys:
+            self.inputTimer.stop()
+
+
+    def restartTimer(self):
+        # (znovu)spustí časovač snímků hry; čas, kdy časovač stál, se nedohání
+        self.timer.start(self.FRAME_INTERVAL, self)
+        self.lastFrame = time.perf_counter()
+        self.frameAccumulator = 0.0
+        if self.profiler:
+            self.profiler.timerStarted(self.FRAME_INTERVAL)
+
     def setNormalSpeed(self):
-        # SLOT pro signál "tetrominoeFell()"
-        self.timer.start(self.speed, self)
+        # SLOT pro signál "tetrominoeFell()": další tetromino padá zase normálně
+        # a vygeneruje se až po celém políčku gravitace
+        self.softDrop = False
+        self.gravityAccumulator = 0
+        self.lockFrames = 0
+
+
+    def advanceFrames(self):
+        '''
+        Smyčka s pevným krokem volaná časovačem: odehraje tolik snímků hry,
+        kolik jich odpovídá reálnému času od minulého tiku (nejvýše
+        MAX_CATCHUP_FRAMES), a hrací desku překreslí jednou.
+        '''
+        now = time.perf_counter()
+        self.frameAccumulator += now - self.lastFrame
+        self.lastFrame = now
+        frameTime = 1.0 / GameScore.FRAME_RATE
+        frames = int(self.frameAccumulator / frameTime)
+        if frames > self.MAX_CATCHUP_FRAMES:
+            frames = self.MAX_CATCHUP_FRAMES
+            self.frameAccumulator = 0.0
+        else:
+            self.frameAccumulator -= frames * frameTime
+
+        for i in range(frames):
+            # hra mohla během snímku skončit nebo se zastavit
+            if not self.timer.isActive():
+                break
+            self.gameFrame()
+        self.gameBoard.refresh()
+
+
+    def gameFrame(self):
+        '''
+        Jeden snímek hry: k akumulátoru přičte gravitaci (při zrychleném pádu
+        aspoň SOFT_DROP_GRAVITY) a o celá políčka nechá tetromino spadnout
+        najednou. Ležící tetromino se napevno umístí až po LOCK_DELAY snímcích.
+        '''
+        engine = self.gameBoard.engine
+        if self.playback and not self.playbackInputs():
+            return
+
+        gravity = max(self.gravity, self.SOFT_DROP_GRAVITY) if self.softDrop else self.gravity
+        cells, self.gravityAccumulator = divmod(self.gravityAccumulator + gravity, GameScore.GRAVITY_UNIT)
+
+        if engine.isGrounded():
+            self.lockFrames += 1
+        else:
+            self.lockFrames = 0
+        lock = self.lockFrames >= self.LOCK_DELAY
+        if lock:
+            cells = max(cells, 1)
+        if self.playback:
+            # vstupy záznamu se musí provést přesně v kroku, ve kterém je hráč zadal
+            cells = min(cells, self.playbackNextTick() - engine.tick)
+        if cells:
+            self.gameBoard.fall(cells, lock, refresh=False)
 
 
     # bindování kláves
 
     def quickFall(self):
-        if self.QUICKFALL_SPEED < self.speed:
-            self.timer.start(self.QUICKFALL_SPEED, self)
+        self.softDrop = True
+
+
+    # klávesy a jim odpovídající akce hráče
+    KEY_ACTIONS = {
+        QtCore.Qt.Key_Left: replay.ACTION_LEFT,
+        QtCore.Qt.Key_Right: replay.ACTION_RIGHT,
+        QtCore.Qt.Key_Up: replay.ACTION_ROTATE,
+        QtCore.Qt.Key_Down: replay.ACTION_QUICKFALL,
+        QtCore.Qt.Key_Space: replay.ACTION_HARDDROP,
+    }
+    # akce, které se při držení klávesy opakují (DAS/ARR)
+    REPEATED_ACTIONS = (replay.ACTION_LEFT, replay.ACTION_RIGHT)
 
 
     def keyPressEvent(self, event):
-        if event.key() == QtCore.Qt.Key_Left:
-            self.gameBoard.move(-1, 0)
-        elif event.key() == QtCore.Qt.Key_Right:
-            self.gameBoard.move(1, 0)
-        elif event.key() == QtCore.Qt.Key_Up:
-            self.gameBoard.rotate()
-        elif event.key() == QtCore.Qt.Key_Down:
-            self.quickFall()
+        if event.key() in self.KEY_ACTIONS:
+            # opakování od systému ignorujeme, držení klávesy řeší processInputs();
+            # během přehrávání záznamu hraje záznam
+            if event.isAutoRepeat() or self.playback:
+                return
+            now = time.perf_counter()
+            action = self.KEY_ACTIONS[event.key()]
+            self.inputQueue.append((action, now))
+            if action in self.REPEATED_ACTIONS:
+                self.heldKeys[event.key()] = [action, now, 0]
+            if not self.inputTimer.isActive():
+                # první vstup zpracujeme hned, další v rytmu snímků
+                self.processInputs()
+                self.inputTimer.start(self.FRAME_INTERVAL, self)
         else:
             QtGui.QWidget.keyPressEvent(self, event)
 
 
+    def keyReleaseEvent(self, event):
+        if event.key() in self.KEY_ACTIONS and not event.isAutoRepeat():
+            self.heldKeys.pop(event.key(), None)
+        else:
+            QtGui.QWidget.keyReleaseEvent(self, event)
+
+
     # události
 
     def timerEvent(self, event):
         if event.timerId() == self.timer.timerId():
-            self.gameBoard.step()
+            started = self.profiler and self.profiler.tickStarted()
+            self.advanceFrames()
+            if self.profiler:
+                self.profiler.tickFinished(started)
+        elif event.timerId() == self.inputTimer.timerId():
+            self.processInputs()
+        elif event.timerId() == self.networkTimer.timerId():
+            self.updateOpponents()
         else:
             QtGui.QWidget.timerEvent(self, event)
 
 
     def closeEvent(self, event):
         self.timer.stop()
-        self.highscores.exportData()
+        self.inputTimer.stop()
+        self.networkTimer.stop()
+        if self.versus:
+            self.versus.close()
+        if self.highscores:
+            self.highscores.close()
+        if self.profiler:
+            try:
+                self.profiler.exportCsv(self.PROFILE_FILE)
+            except IOError:
+                print("qtetris.py: can't write profile to file \"%s\"" % self.PROFILE_FILE)
         event.accept()
 
 
@@ -329,13 +815,37 @@ class QTetris(QtGui.QMainWindow):
 
 class GameBoard(QtGui.QFrame):
     '''
-        Třída představuje hrací desku, na níž padají tetromina. Zajišťuje logickou i okenní část.
-    O událostech hry posílá Qt signály, které jsou napojeny na metody třídy QTetris.
-    Konkrétně generuje signály: "gameOver()", "scored(int)", "tetrominoeFell()".
-        Asi nejdůležitější metodou je step(); tato je volána z QTetris na popud časovače
-    a při každém zavolání se aplikace pokusí nechat tetromino spadnout o jedna dolů.
-    Nepodaří-li se to (tetromino narazilo na dno), tak je umístěno, případně jsou smazány
-    kompletní řádky. Vstup do metody step() je výlučný a je zajištěn zámkem stepLock.
+        Třída představuje hrací desku, na níž padají tetromina. Herní logiku
+    obstarává GameEngine (modul engine), tato třída ji pouze vykresluje a události
+    enginu převádí na Qt signály, které jsou napojeny na metody třídy QTetris.
+    Konkrétně generuje signály: "gameOver()", "scored(int)", "tetrominoeFell()"
+    a po prvním vykreslení "painted()".
+        Asi nejdůležitější metodou je fall(); tato je volána ze snímků hry v QTetris
+    a při každém zavolání se aplikace pokusí nechat tetromino spadnout o zadaný počet
+    políček dolů. Nepodaří-li se to (tetromino narazilo na dno), tak je umístěno,
+    případně jsou smazány kompletní řádky. Mazání řádků je animované: řádky nejprve
+    několikrát zablikají, o což se stará vlastní časovač flashTimer, a hra mezitím
+    dál reaguje na vstup i překreslování (engine je po tu dobu ve stavu
+    GamePhase.Clearing).
+        Deska nemá žádný sdílený stav ani zámky: engine, časovače i výřez patří
+    instanci a všechny metody se volají jen z GUI vlákna (z událostí Qt), které
+    je zpracovává postupně jednu po druhé. V jednom procesu tak může běžet více
+    desek vedle sebe (viz SpectatorWall). Sdílené jsou jen atlasy bloků, které
+    se po vytvoření nemění.
+        Vykreslování je inkrementální: refresh() převezme od enginu změněná políčka,
+    překreslí jen je do pixmapy boardPixmap (obsah viditelné části hrací plochy)
+    a nechá Qt překreslit jen jim odpovídající oblast widgetu; paintEvent() už
+    pouze kopíruje z boardPixmap poškozenou oblast.
+        Rozměry desky se zadávají pro každou hru zvlášť. Widget zobrazuje nejvýše
+    MAX_VIEW_COLUMNS x MAX_VIEW_ROWS políček; na větší desce je to výřez, který
+    se posouvá za padajícím tetrominem (obsah boardPixmap se při tom posune
+    a dokreslí se jen nově odkryté řádky a sloupce). Práce při překreslení je tak
+    úměrná počtu změněných viditelných políček, nikoliv velikosti desky.
+        Velikost widgetu není pevná: hrana políčka (rim) se při změně velikosti
+    přepočítá tak, aby se výřez vešel, a boardPixmap má rozlišení v pixelech
+    zařízení (rim * device pixel ratio). Atlasy bloků přeškálované na danou
+    velikost jsou ve sdílené LRU cache, změna velikosti proto obrázky bloků
+    znovu neškáluje ani nenačítá.
 
     Geometrie herní desky je následující (geometrie okna má opačně kladný směr osy y):
 
@@ -346,37 +856,102 @@ class GameBoard(QtGui.QFrame):
 
     '''
 
-    # Zámky zajišťující výlučný vstup do metod
-    stepLock = threading.Lock() # metoda step
-    moveLock = threading.Lock() # metody move, rotate
-
-    # počet pixelů, kolik má hrana tetromina (~ rozměr barevného obrázku tetromina)
+    # výchozí počet pixelů, kolik má hrana tetromina (~ rozměr barevného obrázku
+    # tetromina), a nejmenší hrana, na kterou lze desku zmenšit
     TETROMINOE_RIM_SIZE = 22
+    MIN_RIM_SIZE = 6
     # vnitřní padding hrací plochy od okraje widgetu
     padding = 6
-    # počet tetromin kolik se vejde do hrací pole na výšku/šířku
-    GAMEBOARD_WIDTH = 10
-    GAMEBOARD_HEIGHT = 19
-
-    # Slovník obsahující stavy políček (čtverečků) na hrací ploše.
-    # gameBoardArray[x][y] je jedna z hodnot třídy TetrominoeShape, tedy celé číslo,
-    # jehož hodnota je zároveň indexem obrázku v proměnné blockImages.
-    gameBoardArray = {}
-    currentTetrominoe = None
-    # pozice těžiště tetromina (jeho bodu s relativními souřadnicemi (0,0))
-    currentPosition = QtCore.QPoint(0, 0)
-    # obrázky bloků, které lze vykreslovat na hrací plochu
-    blockImages = tuple(QtGui.QImage("images/block-" + name) for name in ("empty", "azure", "blue", "green", "purple", "red", "sand", "yellow", "flash1", "flash2") )
-
-
-
-    def __init__(self, parent, qtetris):
+    # největší počet políček zobrazených na šířku/výšku; větší deska se
+    # zobrazuje jen výřezem
+    MAX_VIEW_COLUMNS = 30
+    MAX_VIEW_ROWS = 30
+    # kolik políček má zůstat viditelných mezi padajícím tetrominem a okrajem výřezu
+    VIEW_MARGIN = 4
+    # výchozí doba animace mazání plných řádků v milisekundách
+    LINE_CLEAR_DURATION = 300
+    # kolikrát políčka celých řádků během animace přebliknou
+    FLASH_COUNT = 3
+
+    # názvy obrázků bloků (images/SKIN-NÁZEV.png), které lze vykreslovat
+    # na hrací plochu; index obrázku odpovídá hodnotě třídy TetrominoeShape
+    # a zároveň pořadí oblasti bloku v atlasu
+    BLOCK_NAMES = ("empty", "azure", "blue", "green", "purple", "red", "sand", "yellow", "flash1", "flash2", "garbage")
+    # za bloky následují v atlasu oblasti stínů tetromin: stín tvaru shape má
+    # index GHOST_OFFSET + shape a je to blok tvaru poloprůhledně přes prázdné políčko
+    GHOST_OFFSET = len(BLOCK_NAMES) - 1
+    GHOST_OPACITY = 0.3
+    skin = "block"
+    # atlasy: všechny obrázky bloků jednoho skinu vedle sebe v jedné pixmapě,
+    # přeškálované na danou hranu políčka; klíčem je (skin, hrana v pixelech
+    # zařízení), nejdéle nepoužité atlasy se zahazují. Sdílené všemi deskami,
+    # vytvoří se až při první potřebě (pixmapy navíc nejde vytvořit před
+    # vytvořením QApplication).
+    atlasCache = collections.OrderedDict()
+    ATLAS_CACHE_SIZE = 8
+    # zdrojové obrázky bloků podle skinu, z disku se čtou jen jednou
+    blockImages = {}
+    # umí-li Qt nakreslit dávku fragmentů pixmapy jedním voláním (Qt >= 4.7)
+    BATCHED_FRAGMENTS = hasattr(QtGui.QPainter, "drawPixmapFragments")
+
+
+
+    # interval obnovování překryvu s naměřenými časy v milisekundách
+    OVERLAY_INTERVAL = 500
+
+
+
+    def __init__(self, parent, lineClearDuration=LINE_CLEAR_DURATION, profiler=None,
+            boardWidth=GameEngine.WIDTH, boardHeight=GameEngine.HEIGHT, engine=None):
         QtGui.QFrame.__init__(self, parent)
 
-        self.qtetris = qtetris
+        self.lineClearDuration = lineClearDuration
+        # měření časů; je-li zapnuté, zobrazuje se přes hrací plochu překryv s percentily
+        self.profiler = profiler
+        self.overlayTimer = QtCore.QBasicTimer()
+        if profiler:
+            self.overlayTimer.start(self.OVERLAY_INTERVAL, self)
+        # bylo naplánováno překreslení, které ještě neproběhlo
+        self.repaintPending = False
 
         # DATA
-        self.clear()
+        # plné řádky maže až handleFullLines() poté, co je nechá zablikat;
+        # zadaný engine jen zobrazujeme (zrcadlo desky soupeře, viz versus.py)
+        self.engine = engine or GameEngine(boardWidth, boardHeight, autoClear=False)
+
+        # viditelný výřez desky: počet sloupců a řádků a souřadnice jeho
+        # levého dolního políčka
+        self.viewColumns = min(self.engine.width, self.MAX_VIEW_COLUMNS)
+        self.viewRows = min(self.engine.height, self.MAX_VIEW_ROWS)
+        self.viewX = 0
+        self.viewY = 0
+
+        # časovač animace mazání řádků a počet zbývajících přebliknutí
+        self.flashTimer = QtCore.QBasicTimer()
+        self.flashesLeft = 0
+
+        # počítačový hráč pro automatickou hru (None => hraje člověk)
+        self.autoplayBot = None
+
+        # první vykreslení se hlásí signálem "painted()"
+        self.painted = False
+        # hrana políčka v pixelech widgetu a v pixelech zařízení, poměr mezi nimi
+        # a levý horní roh výřezu ve widgetu; nastavuje je setScale()
+        self.rim = None
+        self.tileSize = None
+        self.pixelRatio = None
+        self.boardLeft = self.boardTop = 0
+        # zobrazuje se stín padajícího tetromina (místo, kam dopadne), a jeho
+        # naposledy vykreslená políčka {(x, y): tvar}
+        self.showGhost = True
+        self.ghost = {}
+        # atlas bloků, oblasti jednotlivých bloků v něm (index odpovídá hodnotě
+        # třídy TetrominoeShape) a zapamatovaný obsah viditelného výřezu
+        # (mění se jen změněná políčka)
+        self.atlas = None
+        self.atlasRects = None
+        self.boardPixmap = None
+        self.setScale(self.TETROMINOE_RIM_SIZE, self.devicePixelRatioValue())
 
 
         # GUI
@@ -384,332 +959,509 @@ class GameBoard(QtGui.QFrame):
         self.setFrameStyle(QtGui.QFrame.Box | QtGui.QFrame.Raised)
         self.setLineWidth(2)
 
-        # pevná velikost hracího pole
-        self.setFixedSize(self.TETROMINOE_RIM_SIZE * self.GAMEBOARD_WIDTH + 2*self.padding,
-                self.TETROMINOE_RIM_SIZE * self.GAMEBOARD_HEIGHT + 2*self.padding)
+        # velikost hracího pole se může měnit, výřez se přizpůsobí (viz resizeEvent())
+        self.setSizePolicy(QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Expanding)
 
 
 
-    def clear(self):
+    @classmethod
+    def loadAtlas(cls, tileSize=TETROMINOE_RIM_SIZE, skin=skin):
+        '''
+        Vrátí atlas bloků skinu skin s hranou políčka tileSize pixelů. Blok
+        s indexem i zabírá v atlasu čtverec začínající na x = i * tileSize.
+        Obrázky se přeškálují jen při prvním požadavku na danou velikost,
+        dále se atlas bere z atlasCache.
+        '''
+        key = (skin, tileSize)
+        atlas = cls.atlasCache.get(key)
+        if atlas is not None:
+            cls.atlasCache.move_to_end(key)
+            return atlas
+
+        images = cls.blockImages.get(skin)
+        if images is None:
+            images = tuple(QtGui.QImage(imagePath("%s-%s.png" % (skin, name))) for name in cls.BLOCK_NAMES)
+            cls.blockImages[skin] = images
+        atlas = QtGui.QPixmap(tileSize * (len(images) + TetrominoeShape.count), tileSize)
+        atlas.fill(QtCore.Qt.transparent)
+        painter = QtGui.QPainter(atlas)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        for index, image in enumerate(images):
+            painter.drawImage(QtCore.QRect(index * tileSize, 0, tileSize, tileSize), image)
+        for shape in range(1, TetrominoeShape.count + 1):
+            rect = QtCore.QRect((cls.GHOST_OFFSET + shape) * tileSize, 0, tileSize, tileSize)
+            painter.drawImage(rect, images[TetrominoeShape.NoShape])
+            painter.setOpacity(cls.GHOST_OPACITY)
+            painter.drawImage(rect, images[shape])
+            painter.setOpacity(1.0)
+        painter.end()
+
+        cls.atlasCache[key] = atlas
+        if len(cls.atlasCache) > cls.ATLAS_CACHE_SIZE:
+            cls.atlasCache.popitem(last=False)
+        return atlas
+
+
+    def devicePixelRatioValue(self):
+        # poměr pixelů zařízení k pixelům widgetu; Qt 4 jej nezná => 1
+        ratio = getattr(self, "devicePixelRatioF", None) or getattr(self, "devicePixelRatio", None)
+        return float(ratio()) if ratio else 1.0
+
+
+    def setScale(self, rim, pixelRatio):
         '''
-        Připraví herní desku pro novou hru.
+        Nastaví hranu políčka na rim pixelů widgetu při poměru pixelRatio
+        pixelů zařízení. Při změně vezme atlas příslušné velikosti, vytvoří
+        novou boardPixmap a překreslí do ní celý výřez.
         '''
-        # inicializace gameBoardArray
-        for x in range(self.GAMEBOARD_WIDTH):
-            self.gameBoardArray[x] = {}
-            for y in range(self.GAMEBOARD_HEIGHT):
-                self.gameBoardArray[x][y] = TetrominoeShape.NoShape
+        # výřez se umístí doprostřed widgetu
+        self.boardLeft = (self.width() - rim * self.viewColumns) // 2
+        self.boardTop = (self.height() - rim * self.viewRows) // 2
+        tileSize = max(1, int(round(rim * pixelRatio)))
+        if (rim, tileSize) == (self.rim, self.tileSize):
+            return
+        self.rim = rim
+        self.tileSize = tileSize
+        self.pixelRatio = pixelRatio
+
+        self.atlas = self.loadAtlas(tileSize, self.skin)
+        self.atlasRects = tuple(QtCore.QRectF(index * tileSize, 0, tileSize, tileSize)
+                for index in range(len(self.BLOCK_NAMES) + TetrominoeShape.count))
+        self.boardPixmap = QtGui.QPixmap(tileSize * self.viewColumns, tileSize * self.viewRows)
+        self.engine.dirtyAll = True
+        self.refresh()
+
+
+    def updateScale(self):
+        # přizpůsobí hranu políčka velikosti widgetu a aktuálnímu monitoru
+        rim = min((self.width() - 2*self.padding) // self.viewColumns,
+                (self.height() - 2*self.padding) // self.viewRows)
+        self.setScale(max(self.MIN_RIM_SIZE, rim), self.devicePixelRatioValue())
+        self.update()
+
+
+    def sizeHint(self):
+        return QtCore.QSize(self.TETROMINOE_RIM_SIZE * self.viewColumns + 2*self.padding,
+                self.TETROMINOE_RIM_SIZE * self.viewRows + 2*self.padding)
 
-        self.currentTetrominoe = None
 
-        self.repaint()
+    def minimumSizeHint(self):
+        return QtCore.QSize(self.MIN_RIM_SIZE * self.viewColumns + 2*self.padding,
+                self.MIN_RIM_SIZE * self.viewRows + 2*self.padding)
 
 
-    def markFullLines(self):
+    def resizeEvent(self, event):
+        QtGui.QFrame.resizeEvent(self, event)
+        self.updateScale()
+
+
+    def clear(self, seed=None):
         '''
-        Políčka v plných řádcích přepíše hodnotou TetrominoeShape.Flash1 a vrátí
-        počet celých řádků.
+        Připraví herní desku pro novou hru (viz GameEngine.clear()).
         '''
-        ret = 0
+        self.flashTimer.stop()
+        self.engine.clear(seed)
 
-        for y in range(self.GAMEBOARD_HEIGHT):
-            for x in range(self.GAMEBOARD_WIDTH):
-                if self.gameBoardArray[x][y] == TetrominoeShape.NoShape:
-                    # tento řádek není celý => pokročíme na jinou hodnotu y
-                    break
-            else:
-                ret += 1
-                # na řádku nebylo nalezeno prázdné políčko => je celý zaplněn
-                for x in range(self.GAMEBOARD_WIDTH):
-                    self.gameBoardArray[x][y] = TetrominoeShape.Flash1
-        if ret: self.repaint()
-        return ret
+        self.refresh()
 
 
-    def flashFullLines(self):
+    def handleEvents(self, events):
+        '''
+        Převede události vrácené enginem na Qt signály.
         '''
-        V gameBoadArray změní políčka s hodnou Flash1 na hodnotu Flash2 a opačně.
+        for name, arg in events:
+            if name == GameEvent.GameOver:
+                self.emit(QtCore.SIGNAL("gameOver()"))
+            elif name == GameEvent.TetrominoeSpawned:
+                if self.autoplayBot:
+                    self.autoplay()
+            elif name == GameEvent.TetrominoeFell:
+                # kvůli změnně intervalu časově když se použilo zrychlený padání bloku
+                self.emit(QtCore.SIGNAL("tetrominoeFell()"))
+            elif name == GameEvent.FullLines:
+                self.handleFullLines()
+            elif name == GameEvent.Scored:
+                # připočtení skóre
+                self.emit(QtCore.SIGNAL("scored(int)"), arg)
+
+
+    def setAutoplay(self, enabled):
+        '''
+        Zapne/vypne automatickou hru, při které tetromina umisťuje bot.Bot.
         '''
-        needRepaint = False
-        for x in range(self.GAMEBOARD_WIDTH):
-            for y in range(self.GAMEBOARD_HEIGHT):
-                if self.gameBoardArray[x][y] == TetrominoeShape.Flash1:
-                    needRepaint = True
-                    self.gameBoardArray[x][y] = TetrominoeShape.Flash2
-                elif self.gameBoardArray[x][y] == TetrominoeShape.Flash2:
-                    needRepaint = True
-                    self.gameBoardArray[x][y] = TetrominoeShape.Flash1
-        if needRepaint: self.repaint()
+        self.autoplayBot = bot.Bot() if enabled else None
+        if enabled and self.engine.currentTetrominoe:
+            self.autoplay()
+            self.refresh()
 
 
-    def handleFullLines(self):
-        linesCount = self.markFullLines()
-
-        # nějaký řádek je plný => bude se bourat
-        if linesCount != 0:
-            # zablikání bouraných řádků
-            # Odečítáme 15 milisekund, abychom se pokud možno vyhli tomu
-            # že časovač z QTetris zavolá gameBoard.step() dřív než bude
-            # ukončeno mazání celých řádků.
-            stepTime = (self.qtetris.getSpeed() - 15) / 1000 # výpočet doby probliknutí
-            # kolikrát políčka celých řádků přebliknou?
-            flashCount = 3
-            # TODO nízký stepTime způsobí chybu
-            sleepInterval = stepTime / (flashCount + 1)
-
-            # flashCount-krát problikneme políčka
-            time.sleep(sleepInterval)
-            for i in range(flashCount):
-                self.flashFullLines()
-                time.sleep(sleepInterval)
-
-
-            # smazání bouraných řádků
-            line = 0
-            while line < self.GAMEBOARD_HEIGHT:
-                # tento řádek je plný
-                if self.gameBoardArray[0][line] in (TetrominoeShape.Flash1, TetrominoeShape.Flash2):
-                    # všechny vyšší řádky posuneme o jedno dolů
-                    for x in range(self.GAMEBOARD_WIDTH):
-                        for y in range(line, self.GAMEBOARD_HEIGHT-1):
-                            self.gameBoardArray[x][y] = self.gameBoardArray[x][y+1]
-                    # vrchní řádek bude prázdný
-                    for x in range(self.GAMEBOARD_WIDTH):
-                        self.gameBoardArray[x][self.GAMEBOARD_HEIGHT - 1] = TetrominoeShape.NoShape
-                else:
-                    line += 1
-
-            # připočtení skóre
-            self.emit(QtCore.SIGNAL("scored(int)"), linesCount)
-
-            self.repaint()
-
-
-
-    def step(self):
-        '''
-        Metoda volaná při signálu časovače.
-        '''
-
-        # při mazání celých řádků se užívá time.sleep() => nebezpečí předčasného
-        # spuštění časovače volajícího tuto metodu
-        if self.stepLock.locked_lock():
-            print("warning in GameBoard.step(self): step method called while self.stepLock was locked")
-            return
+    def setShowGhost(self, enabled):
+        '''
+        Zapne/vypne zobrazení stínu padajícího tetromina.
+        '''
+        self.showGhost = enabled
+        self.engine.dirtyAll = True
+        self.refresh()
 
-        self.stepLock.acquire()
 
-        # tetromino byl v předchozím kroku napevno umístěno => je třeba vygenerovat nové
-        if not self.currentTetrominoe:
-            self.currentTetrominoe = Tetrominoe()
-            self.currentPosition = QtCore.QPoint(self.GAMEBOARD_WIDTH // 2, self.GAMEBOARD_HEIGHT-1)
+    def autoplay(self):
+        # natočí a posune právě vygenerované tetromino tam, kam by jej umístil bot;
+        # padá pak samo jako při normální hře
+        placement = self.autoplayBot.bestPlacement(self.engine)
+        if placement:
+            bot.moveToPlacement(self.engine, *placement)
 
-            # kontrola, zda se nově vygenerované tetromino vůbec vejde na hrací plochu
-            if not self.canPlaceTetrominoe(self.currentTetrominoe, self.currentPosition, removeCurrent=False):
-                self.emit(QtCore.SIGNAL("gameOver()"))
-                #return není třeba
 
-            self.placeTetrominoe()
-        # tetromino padá dolů
+    def handleFullLines(self):
+        '''
+        Spustí animaci mazání plných řádků (engine je už označil hodnotou Flash1).
+        Řádky se smažou až po posledním přebliknutí ve flashFullLines().
+        '''
+        self.refresh()
+
+        self.flashesLeft = self.FLASH_COUNT
+        self.flashTimer.start(max(1, self.lineClearDuration // (self.FLASH_COUNT + 1)), self)
+
+
+    def flashFullLines(self):
+        '''
+        Jeden krok animace mazání řádků volaný časovačem flashTimer.
+        '''
+        if self.flashesLeft:
+            self.flashesLeft -= 1
+            self.engine.flashFullLines()
         else:
-            self.fallTetrominoe()
+            # animace skončila => smazání bouraných řádků
+            self.flashTimer.stop()
+            self.handleEvents(self.engine.clearLines())
 
-        self.repaint()
+        self.refresh()
 
-        self.stepLock.release()
 
 
-    def fallTetrominoe(self):
+    def fall(self, cells, lock=True, refresh=True):
         '''
-        Metoda je napojena na stisk šipky dolů pro zrychlení pádu.
+        Metoda volaná ze snímku hry: tetromino spadne o až cells políček najednou
+        (viz GameEngine.fall()), při lock=False ležící tetromino ještě neumístí.
+        Během animace mazání řádků engine pád ignoruje. Při refresh=False
+        překreslení obstará volající (QTetris.advanceFrames()).
         '''
-        if not self.move(0, -1):
-            # aktuální tetromino nemůže spadnout => napevno jeho bloky umístíme
-            # a zajistíme, aby se vygenerovalo nové
-            self.currentTetrominoe = None
-            # kvůli změnně intervalu časově když se použilo zrychlený padání bloku
-            self.emit(QtCore.SIGNAL("tetrominoeFell()"))
-            self.handleFullLines()
+        self.handleEvents(self.engine.fall(cells, lock))
+
+        if refresh:
+            self.refresh()
 
 
-    def move(self, relX, relY):
+    def move(self, relX, relY, refresh=True):
         '''
         Podaří-li se tetromino posunout, vrací True, jinak False.
-        Metoda je napojena na stisky kláves.
-        '''
-        self.moveLock.acquire()
-
-        if not self.currentTetrominoe:
-            ret = False
-        elif self.canPlaceTetrominoe(self.currentTetrominoe, self.currentPosition, relX, relY):
-            # tetromino lze posunout => vymažeme, posuneme, umístíme na novou pozici
-            self.removeTetrominoe()
-            self.currentPosition.setX(self.currentPosition.x() + relX)
-            self.currentPosition.setY(self.currentPosition.y() + relY)
-            self.placeTetrominoe()
-            self.repaint()
-            ret = True
-        else:
-
-            ret = False
-
-        self.moveLock.release()
+        Metoda je napojena na stisky kláves. Při refresh=False překreslení
+        obstará volající (QTetris.processInputs()).
+        '''
+        ret = self.engine.move(relX, relY)
+        if ret and refresh:
+            self.refresh()
 
         return ret
 
 
-    def rotate(self):
+    def rotate(self, refresh=True):
         '''
         Metoda je napojena na stisk šipky nahoru pro otočení padající tetromina.
         '''
-        self.moveLock.acquire()
+        ret = self.engine.rotate()
+        if ret and refresh:
+            self.refresh()
 
-        rotatedTetrominoe = Tetrominoe(self.currentTetrominoe)
-        rotatedTetrominoe.rotate()
-
-        if self.canPlaceTetrominoe(rotatedTetrominoe, self.currentPosition):
-            self.removeTetrominoe()
-            self.currentTetrominoe = rotatedTetrominoe
-            self.placeTetrominoe()
-            self.repaint()
-
-        self.moveLock.release()
+        return ret
 
 
-    def canPlaceTetrominoe(self, tetrominoe, qpoint, relX=0, relY=0, removeCurrent=True):
+    def hardDrop(self, refresh=True):
         '''
-        Otestuje je-li možné tetrominoe umístit na hrací ploše na pozici
-        qpoint s relativním posunutím (relX, relY). self.currentTetrominoe
-        se přitom v závislosti na removeCurrent (ne)uvažuje jako překážka
-        (removeCurrent=False se používá jen když se testuje zda je možné
-        umístit nově vygenerované tetromino na hrací desku).
-        Vrací True, je-li to možné, jinak False.
+        Metoda je napojena na mezerník: tetromino okamžitě dopadne a napevno se umístí.
         '''
-        ret = True
+        events = self.engine.hardDrop()
+        self.handleEvents(events)
+        if refresh:
+            self.refresh()
 
-        if removeCurrent and self.currentTetrominoe:
-            # vymažeme současné tetromino
-            self.removeTetrominoe()
+        return bool(events)
 
-        try:
-            for p in tetrominoe.points:
-                # je políčko prázdné?
-                if self.gameBoardArray[qpoint.x()+relX + p.x()][qpoint.y()+relY + p.y()] != TetrominoeShape.NoShape:
-                    ret = False
-                    break
-        # vylezli jsme mimo hrací plochu
-        except KeyError:
-            ret = False
-
-        if removeCurrent and self.currentTetrominoe:
-            # obnovíme současné tetromino
-            self.placeTetrominoe()
-
-        return ret
 
+    def timerEvent(self, event):
+        if event.timerId() == self.flashTimer.timerId():
+            self.flashFullLines()
+        elif event.timerId() == self.overlayTimer.timerId():
+            self.update(self.overlayRect())
+            self.repaintPending = True
+        else:
+            QtGui.QFrame.timerEvent(self, event)
 
-    def removeTetrominoe(self):
-        # tetromino nahradí prázdnými políčky
-        baseX = self.currentPosition.x()
-        baseY = self.currentPosition.y()
 
-        for p in self.currentTetrominoe.points:
-            self.gameBoardArray[baseX + p.x()][baseY + p.y()] = TetrominoeShape.NoShape
+    def refresh(self):
+        '''
+        Překreslí do boardPixmap políčka změněná enginem a naplánuje
+        překreslení odpovídající oblasti widgetu. Více volání před
+        zpracováním paintEvent() Qt sloučí do jednoho překreslení.
+        '''
+        dirtyCells = self.engine.takeDirtyCells()
+        if dirtyCells is not None and not dirtyCells:
+            return
 
+        colors = self.engine.colors
+        # padající tetromino se kreslí přes napevno umístěná políčka a stín
+        # tetromina jen na prázdná políčka
+        current = self.engine.currentCells()
+        ghost = self.engine.ghostCells() if self.showGhost else {}
+        exposedCells = self.followTetrominoe(current)
+        left, bottom = self.viewX, self.viewY
+        right, top = left + self.viewColumns, bottom + self.viewRows
+        if dirtyCells is None:
+            # změnila se celá deska => překreslí se celý výřez
+            dirtyCells = [(x, y) for y in range(bottom, top) for x in range(left, right)]
+        else:
+            # překreslí se i stará a nová políčka posunutého stínu
+            if ghost != self.ghost:
+                dirtyCells.update(self.ghost)
+                dirtyCells.update(ghost)
+            # políčka mimo výřez se nekreslí, po posunu výřezu přibudou odkrytá
+            dirtyCells = [(x, y) for x, y in dirtyCells if left <= x < right and bottom <= y < top]
+            dirtyCells.extend(exposedCells)
+        self.ghost = ghost
+
+        blocks = []
+        region = QtGui.QRegion()
+        for x, y in dirtyCells:
+            shape = current.get((x, y)) or colors[y][x]
+            if not shape and (x, y) in ghost:
+                shape = self.GHOST_OFFSET + ghost[(x, y)]
+            blocks.append((x, y, shape))
+            region = region.united(self.cellRect(x, y))
+        painter = QtGui.QPainter(self.boardPixmap)
+        self.paintBlocks(painter, blocks)
+        painter.end()
+
+        if exposedCells:
+            # posunul se obsah celého výřezu
+            self.update()
+        else:
+            self.update(region)
+        self.repaintPending = True
 
-    def placeTetrominoe(self):
-        baseX = self.currentPosition.x()
-        baseY = self.currentPosition.y()
 
-        for p in self.currentTetrominoe.points:
-            self.gameBoardArray[baseX + p.x()][baseY + p.y()] = self.currentTetrominoe.shape
+    def followTetrominoe(self, current):
+        '''
+        Posune výřez tak, aby padající tetromino (políčka current) bylo alespoň
+        VIEW_MARGIN políček od jeho okraje. Obsah boardPixmap posune spolu
+        s výřezem a vrátí seznam nově odkrytých políček, která je třeba dokreslit.
+        '''
+        engine = self.engine
+        if not current or (self.viewColumns == engine.width and self.viewRows == engine.height):
+            return []
+
+        xs = [x for x, y in current]
+        ys = [y for x, y in current]
+        viewX = self.scrollTo(self.viewX, self.viewColumns, engine.width, min(xs), max(xs))
+        viewY = self.scrollTo(self.viewY, self.viewRows, engine.height, min(ys), max(ys))
+        dx, dy = viewX - self.viewX, viewY - self.viewY
+        if not dx and not dy:
+            return []
+        self.viewX, self.viewY = viewX, viewY
+
+        left, bottom = viewX, viewY
+        right, top = left + self.viewColumns, bottom + self.viewRows
+        if abs(dx) >= self.viewColumns or abs(dy) >= self.viewRows:
+            # skok o víc než celý výřez => dokreslí se všechno
+            return [(x, y) for y in range(bottom, top) for x in range(left, right)]
+
+        # posun výřezu doprava/nahoru posune obsah pixmapy doleva/dolů
+        tileSize = self.tileSize
+        self.boardPixmap.scroll(-dx * tileSize, dy * tileSize, self.boardPixmap.rect())
+        columns = range(right - dx, right) if dx > 0 else range(left, left - dx)
+        rows = range(top - dy, top) if dy > 0 else range(bottom, bottom - dy)
+        exposed = [(x, y) for y in range(bottom, top) for x in columns]
+        exposed.extend((x, y) for y in rows for x in range(left, right) if x not in columns)
+        return exposed
+
+
+    def scrollTo(self, start, length, size, low, high):
+        # nový začátek výřezu délky length na ose velikosti size, aby byl interval
+        # <low, high> alespoň VIEW_MARGIN od okrajů výřezu (je-li to možné)
+        margin = min(self.VIEW_MARGIN, (length - (high - low + 1)) // 2)
+        if low - margin < start:
+            start = low - margin
+        elif high + margin >= start + length:
+            start = high + margin - length + 1
+        return max(0, min(start, size - length))
+
+
+    def overlayRect(self):
+        # oblast překryvu s naměřenými časy (levý horní roh hrací plochy)
+        return QtCore.QRect(self.padding, self.padding, self.width() - 2*self.padding,
+                14 * (len(FrameProfiler.KINDS) + 2))
+
+
+    def boardRect(self):
+        # obdélník viditelného výřezu v souřadnicích widgetu
+        return QtCore.QRect(self.boardLeft, self.boardTop, self.rim * self.viewColumns, self.rim * self.viewRows)
+
+
+    def cellRect(self, gridX, gridY):
+        # obdélník (viditelného) políčka mřížky v souřadnicích widgetu
+        return QtCore.QRect(self.boardLeft + (gridX - self.viewX) * self.rim,
+                self.boardTop + (self.viewY + self.viewRows - 1 - gridY) * self.rim,
+                self.rim, self.rim)
 
 
     def paintEvent(self, event):
+        started = self.profiler and self.profiler.paintStarted()
+
+        # okno se přesunulo na monitor s jiným poměrem pixelů
+        if self.devicePixelRatioValue() != self.pixelRatio:
+            self.updateScale()
+
         # aby se vykreslil rámeček atd.
         QtGui.QFrame.paintEvent(self, event)
 
-        # vlastní kreslení situace na hracím poli
+        # vlastní kreslení situace na hracím poli: zkopírujeme jen poškozenou
+        # část hrací plochy z boardPixmap (ta má rozlišení v pixelech zařízení)
+        boardRect = self.boardRect()
+        rect = event.rect().intersected(boardRect)
         painter = QtGui.QPainter(self)
+        if not rect.isEmpty():
+            scale = self.tileSize / self.rim
+            source = QtCore.QRectF((rect.x() - boardRect.x()) * scale, (rect.y() - boardRect.y()) * scale,
+                    rect.width() * scale, rect.height() * scale)
+            painter.drawPixmap(QtCore.QRectF(rect), self.boardPixmap, source)
+
+        if self.profiler:
+            self.paintOverlay(painter, event.rect())
+            painter.end()
+            self.profiler.paintFinished(started)
+        self.repaintPending = False
+
+        if not self.painted:
+            self.painted = True
+            self.emit(QtCore.SIGNAL("painted()"))
+
+
+    def paintOverlay(self, painter, rect):
+        # poloprůhledný překryv s percentily naměřených časů
+        overlayRect = self.overlayRect()
+        if not rect.intersects(overlayRect):
+            return
+        painter.setClipRect(rect)
+        painter.fillRect(overlayRect, QtGui.QColor(0, 0, 0, 160))
+        painter.setPen(QtGui.QColor(255, 255, 255))
+        painter.setFont(QtGui.QFont("Courier New", 8))
+        lines = ["%-12s %6s %6s %6s" % ("", "p50", "p95", "p99")] + self.profiler.summary()
+        painter.drawText(overlayRect.adjusted(4, 2, -4, -2), QtCore.Qt.AlignLeft, "\n".join(lines))
 
 
-        for x in range(self.GAMEBOARD_WIDTH):
-            for y in range(self.GAMEBOARD_HEIGHT):
-                self.paintBlock(painter, self.blockImages[ self.gameBoardArray[x][y] ], x, y)
+    def paintBlocks(self, painter, blocks):
+        '''
+        Vykreslí bloky zadané trojicemi (x, y, tvar) v souřadnicích mřížky
+        do boardPixmap (ta obsahuje jen viditelný výřez). Všechny bloky se
+        berou z atlasu a kreslí se jedním voláním drawPixmapFragments();
+        starší Qt bez něj kreslí blok po bloku.
+        '''
+        rim = self.tileSize
+        left = self.viewX
+        top = self.viewY + self.viewRows - 1
+        atlasRects = self.atlasRects
+        if self.BATCHED_FRAGMENTS:
+            # pozice fragmentu určuje jeho střed
+            half = rim / 2
+            fragment = QtGui.QPainter.PixmapFragment.create
+            painter.drawPixmapFragments([fragment(QtCore.QPointF((x - left) * rim + half, (top - y) * rim + half),
+                    atlasRects[shape]) for x, y, shape in blocks], self.atlas)
+        else:
+            for x, y, shape in blocks:
+                painter.drawPixmap(QtCore.QRectF((x - left) * rim, (top - y) * rim, rim, rim),
+                        self.atlas, atlasRects[shape])
 
 
-    def paintBlock(self, painter, qimage, gridX, gridY):
-        # vykreslí obrázek na zadané souřadnice mřížky
-        painter.drawImage(self.padding + gridX * self.TETROMINOE_RIM_SIZE,
-                self.height() - (self.padding + (gridY+1) * self.TETROMINOE_RIM_SIZE),
-                qimage)
 
 
 
-#############################################################################
+class SpectatorWall(QtGui.QWidget):
+    '''
+        Stěna pro diváky: mřížka desek GameBoard, na každé hraje bot vlastní hru
+    s vlastním seedem a po konci hry hned začne novou. Desky jsou na sobě zcela
+    nezávislé (každá má svůj engine, skóre i časovač animace), všechny běží
+    v GUI vlákně a posouvá je jediný časovač snímků.
+    '''
 
+    # o kolik políček tetromina na všech deskách spadnou za jeden snímek
+    WALL_GRAVITY = 1
 
 
-class TetrominoeShape:
-    NoShape = 0
-    OShape = 1
-    TShape = 2
-    SShape = 3
-    ZShape = 4
-    LShape = 5
-    JShape = 6
-    IShape = 7
-    count = 7
-    Flash1 = 8
-    Flash2 = 9
 
+    def __init__(self, count, parent=None, boardWidth=GameEngine.WIDTH, boardHeight=GameEngine.HEIGHT, seed=None):
+        QtGui.QWidget.__init__(self, parent)
 
+        self.setWindowTitle("QTetris - stěna")
+        self.setWindowIcon(QtGui.QIcon(imagePath("icon.png")))
 
-#############################################################################
+        # seedy jednotlivých her
+        self.random = random.Random(seed)
+        self.boards = []
+        self.scores = []
+        self.scoreLabels = []
 
+        # desky v mřížce, co nejblíže čtverci
+        columns = int(math.ceil(math.sqrt(count)))
+        grid = QtGui.QGridLayout()
+        for index in range(count):
+            board = GameBoard(self, boardWidth=boardWidth, boardHeight=boardHeight)
+            label = QtGui.QLabel(self)
+            self.boards.append(board)
+            self.scores.append(GameScore())
+            self.scoreLabels.append(label)
 
+            vbox = QtGui.QVBoxLayout()
+            vbox.addWidget(label)
+            vbox.addWidget(board)
+            grid.addLayout(vbox, index // columns, index % columns)
 
-class Tetrominoe(object):
-    shape = None  # TetrominoeShape integer value
-    points = None # tuple 4x QPoint
+            # signály každé desky se napojí s jejím indexem
+            self.connect(board, QtCore.SIGNAL("scored(int)"),
+                    lambda linesCount, index=index: self.scored(index, linesCount))
+            self.connect(board, QtCore.SIGNAL("gameOver()"), lambda index=index: self.newGame(index))
 
-    # relativní polohy čtverečků tetromin; (0,0) je těžiště kolem
-    # něhož se tetromino otáčí
-    pointsTable = ((None),                             # NoShape
-                   ((0,0), (1,0),   (0,-1),  (1,-1)),  # OShape
-                   ((0,0), (-1,0),  (1,0),   (0,-1)),  # TShape
-                   ((0,0), (-1,0),  (0,-1),  (1,-1)),  # ZShape
-                   ((0,0), (1,0),   (0,-1),  (-1,-1)), # SShape
-                   ((0,0), (-1,-1), (-1,0),  (1,0)),   # LShape
-                   ((0,0), (-1,0),  (1,0),   (1, -1)), # JShape
-                   ((0,0), (-1,0),  (1,0),   (2,0)),   # IShape
-                   )
+            self.newGame(index)
+            board.setAutoplay(True)
+        self.setLayout(grid)
 
+        self.timer = QtCore.QBasicTimer()
+        self.timer.start(QTetris.FRAME_INTERVAL, self)
 
-    def __init__(self, tetrominoe=None):
-        '''
-        Generuje tetromino náhodného tvaru.
-        '''
-        if not tetrominoe:
-            self.shape = random.randint(1, TetrominoeShape.count)
-            self.points = tuple(QtCore.QPoint(x, y) for x, y in self.pointsTable[self.shape])
-        else:
-            self.shape = tetrominoe.shape
-            self.points = tetrominoe.points
 
+    def newGame(self, index):
+        # (znovu)spustí hru na desce index s novým seedem
+        self.scores[index].reset()
+        self.scoreLabels[index].setText("skóre: 0")
+        self.boards[index].clear(self.random.getrandbits(32))
 
 
-    def rotate(self):
-        '''
-        Provádí rotaci tetromina okolo bodu (0,0) ve směru hodinových ručiček.
-        '''
-        if self.shape == TetrominoeShape.OShape:
-            return
+    def scored(self, index, linesCount):
+        # SLOT pro signál "scored(int)" desky index
+        score = self.scores[index]
+        score.scored(linesCount)
+        self.scoreLabels[index].setText("skóre: %d, level %d" % (score.score, score.level))
 
-        newPoints = []
-        for p in self.points:
-            newPoints.append( QtCore.QPoint(p.y(), -p.x()) )
-        self.points = tuple(newPoints)
+
+    def timerEvent(self, event):
+        if event.timerId() == self.timer.timerId():
+            for board in self.boards:
+                board.fall(self.WALL_GRAVITY)
+        else:
+            QtGui.QWidget.timerEvent(self, event)
+
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        event.accept()
 
 
 
@@ -724,11 +1476,58 @@ if __name__ == "__main__":
   sys.stderr = open("stderr.txt", "w")
 
 
-  app = QtGui.QApplication(sys.argv)
+  # doba startu po fázích se po načtení žebříčku vypíše na stderr
+  startup = StartupProfiler(IMPORT_STARTED)
+  startup.mark("import")
 
-  qtetris = QTetris()
-  qtetris.center()
-  qtetris.show()
+  app = QtGui.QApplication(sys.argv)
+  startup.mark("application")
+  GameBoard.loadAtlas()
+  startup.mark("assets")
+
+  # měření časů se zapíná přepínačem --profile nebo proměnnou prostředí QTETRIS_PROFILE
+  profiler = None
+  if "--profile" in sys.argv or os.environ.get("QTETRIS_PROFILE"):
+      profiler = FrameProfiler()
+
+  # hodnota přepínače zadaného jako "--name HODNOTA"
+  def option(name, default, type=int):
+      if name in sys.argv[:-1]:
+          return type(sys.argv[sys.argv.index(name) + 1])
+      return default
+
+  # společný žebříček: --leaderboard HOST:PORT
+  def address(value):
+      host, port = value.rsplit(":", 1)
+      return (host, int(port))
+
+  # rozměry hrací desky: --width SLOUPCŮ, --height ŘÁDKŮ
+  boardWidth = option("--width", GameEngine.WIDTH)
+  boardHeight = option("--height", GameEngine.HEIGHT)
+  if not (1 <= boardWidth <= GameEngine.MAX_WIDTH and 1 <= boardHeight <= GameEngine.MAX_HEIGHT):
+      print("qtetris.py: board size must be between 1x1 and %dx%d" % (GameEngine.MAX_WIDTH, GameEngine.MAX_HEIGHT),
+            file=sys.stderr)
+      sys.exit(2)
+
+  # hra proti soupeřům po síti: --host PORT, nebo --join HOST:PORT
+  hostAddress = None
+  if "--host" in sys.argv:
+      import versus
+      hostAddress = ("", option("--host", versus.PORT))
+  joinAddress = option("--join", None, address)
+
+  if "--wall" in sys.argv:
+      # stěna pro diváky s N hrami bota: --wall N
+      window = SpectatorWall(option("--wall", 9), boardWidth=boardWidth, boardHeight=boardHeight)
+  else:
+      # zpoždění a interval opakování posunu do stran: --das MS, --arr MS
+      window = QTetris(profiler=profiler, das=option("--das", QTetris.DAS), arr=option("--arr", QTetris.ARR),
+              leaderboardAddress=option("--leaderboard", None, address),
+              boardWidth=boardWidth, boardHeight=boardHeight, startup=startup,
+              hostAddress=hostAddress, joinAddress=joinAddress)
+      window.center()
+  startup.mark("window")
+  window.show()
 
   ret = app.exec_()
 
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Replay                                                               #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Záznam a přehrávání her. Protože GameEngine generuje tetromina z vlastního   #
+# generátoru se seedem, stačí si o hře pamatovat seed a posloupnost vstupů     #
+# hráče označených krokem hry (GameEngine.tick), ve kterém nastaly.            #
+#                                                                              #
+# Binární formát souboru:                                                      #
+#   hlavička   "QTRP", verze (1 B), seed (4 B), šířka (2 B), výška (2 B)       #
+#   záznamy    varint (rozdíl kroků od předchozího záznamu << 3 | akce)        #
+# Poslední záznam má akci ACTION_END a určuje krok, ve kterém hra skončila.    #
+# Čísla v hlavičce jsou v pořadí little-endian.                                #
+#                                                                              #
+# Použití (přehrání bez GUI co nejrychleji):                                   #
+#   $ python replay.py hra.qtr [dalsi.qtr ...]                                 #
+#                                                                              #
+################################################################################
+
+
+
+import sys
+import time
+import struct
+
+from engine import GameEngine, GameEvent, GamePhase, GameScore
+
+
+
+
+# akce hráče ukládané do záznamu
+ACTION_LEFT = 0
+ACTION_RIGHT = 1
+ACTION_ROTATE = 2
+ACTION_QUICKFALL = 3
+ACTION_HARDDROP = 4
+ACTION_END = 7
+
+MAGIC = b"QTRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBIHH")
+
+
+
+class ReplayError(Exception):
+    pass
+
+
+
+class Replay(object):
+    '''
+    Záznam jedné hry: seed, rozměry desky a seznam vstupů (krok, akce).
+    '''
+
+    def __init__(self, seed, width=GameEngine.WIDTH, height=GameEngine.HEIGHT):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        # dvojice (krok, akce) seřazené podle kroku
+        self.inputs = []
+        # krok, ve kterém záznam skončil (None => dosud se nahrává)
+        self.endTick = None
+
+
+    def record(self, tick, action):
+        self.inputs.append((tick, action))
+
+
+    def finish(self, tick):
+        self.endTick = tick
+
+
+    def toBytes(self):
+        data = bytearray(HEADER.pack(MAGIC, VERSION, self.seed, self.width, self.height))
+        # nedokončený záznam končí posledním vstupem
+        endTick = self.endTick
+        if endTick is None:
+            endTick = self.inputs[-1][0] if self.inputs else 0
+
+        lastTick = 0
+        records = self.inputs + [(endTick, ACTION_END)]
+        for tick, action in records:
+            value = (tick - lastTick) << 3 | action
+            lastTick = tick
+            # varint: 7 bitů na bajt, nejvyšší bit značí pokračování
+            while value >= 0x80:
+                data.append(value & 0x7f | 0x80)
+                value >>= 7
+            data.append(value)
+        return bytes(data)
+
+
+    @staticmethod
+    def fromBytes(data):
+        if len(data) < HEADER.size:
+            raise ReplayError("replay is too short")
+        magic, version, seed, width, height = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ReplayError("not a QTetris replay or unsupported version")
+
+        replay = Replay(seed, width, height)
+        tick = 0
+        value = shift = 0
+        for byte in data[HEADER.size:]:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80:
+                continue
+            tick += value >> 3
+            action = value & 7
+            value = shift = 0
+            if action == ACTION_END:
+                replay.finish(tick)
+                break
+            replay.record(tick, action)
+        else:
+            raise ReplayError("replay is truncated")
+        return replay
+
+
+    def save(self, fileName):
+        with open(fileName, "wb") as file:
+            file.write(self.toBytes())
+
+
+    @staticmethod
+    def load(fileName):
+        with open(fileName, "rb") as file:
+            return Replay.fromBytes(file.read())
+
+
+
+def applyInput(engine, action):
+    '''
+    Provede v enginu akci hráče a vrátí vzniklé události. ACTION_QUICKFALL
+    mění jen rychlost časovače v GUI, na logiku hry vliv nemá.
+    '''
+    if action == ACTION_LEFT:
+        engine.move(-1, 0)
+    elif action == ACTION_RIGHT:
+        engine.move(1, 0)
+    elif action == ACTION_ROTATE:
+        engine.rotate()
+    elif action == ACTION_HARDDROP:
+        return engine.hardDrop()
+    return []
+
+
+
+def playHeadless(replay, destructionsToLevelUp=GameScore.DESTRUCTIONS_TO_LEVEL_UP):
+    '''
+    Přehraje záznam bez GUI co nejrychleji. Vrací dvojici (engine, skóre)
+    ve stavu na konci záznamu.
+    '''
+    engine = GameEngine(replay.width, replay.height, seed=replay.seed)
+    gameScore = GameScore(destructionsToLevelUp)
+
+    inputs = iter(replay.inputs)
+    nextInput = next(inputs, None)
+    while engine.phase != GamePhase.GameOver:
+        # vstupy, které hráč zadal po engine.tick krocích
+        events = []
+        while nextInput and nextInput[0] <= engine.tick:
+            events.extend(applyInput(engine, nextInput[1]))
+            nextInput = next(inputs, None)
+        if replay.endTick is not None and engine.tick >= replay.endTick:
+            break
+        events.extend(engine.step())
+        for name, arg in events:
+            if name == GameEvent.Scored:
+                gameScore.scored(arg)
+    return engine, gameScore
+
+
+
+def main(argv=None):
+    fileNames = (argv if argv is not None else sys.argv)[1:]
+    if not fileNames:
+        print("usage: replay.py REPLAY [REPLAY ...]", file=sys.stderr)
+        return 2
+
+    ticks = 0
+    start = time.perf_counter()
+    for fileName in fileNames:
+        engine, gameScore = playHeadless(Replay.load(fileName))
+        ticks += engine.tick
+        print("%s: score %d, lines %d, level %d, ticks %d"
+              % (fileName, gameScore.score, gameScore.lines, gameScore.level, engine.tick))
+    elapsed = time.perf_counter() - start
+    print("%d replays, %.0f ticks/s" % (len(fileNames), ticks / elapsed), file=sys.stderr)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
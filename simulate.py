@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Simulate                                                             #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Dávkové hraní her bez GUI. Hraje N her pomocí zvolené strategie (bota)       #
+# rozložených do procesů přes všechna jádra, výsledek každé hry zapisuje       #
+# jako jeden řádek JSON a nakonec vypíše souhrnnou propustnost (hry/s,         #
+# tetromina/s). Slouží pro kontrolu vyváženosti bodování a levelů.             #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python simulate.py -n 1000 --seed 1 --policy random -o vysledky.jsonl    #
+#   $ python simulate.py -n 100 --policy mujmodul:mojeStrategie                #
+#                                                                              #
+# Strategie je funkce policy(engine), která pro právě vygenerované tetromino   #
+# vrátí cílové umístění jako dvojici (natočení, x), případně None, když je     #
+# jedno, kam tetromino spadne.                                                 #
+#                                                                              #
+################################################################################
+
+
+
+import sys
+import os
+import time
+import json
+import random
+import argparse
+import importlib
+import multiprocessing
+
+from engine import GameEngine, GameEvent, GamePhase, GameScore
+import bot
+
+
+
+
+def randomPolicy(engine):
+    '''
+    Strategie umisťující tetromina do náhodného sloupce s náhodným natočením.
+    '''
+    return random.randrange(4), random.randrange(engine.width)
+
+
+# vestavěné strategie dostupné pod krátkým jménem
+POLICIES = {
+    "random": randomPolicy,
+    "ai": bot.aiPolicy,
+}
+
+
+def resolvePolicy(name):
+    '''
+    Vrátí funkci strategie podle jména vestavěné strategie nebo podle
+    cesty ve tvaru "modul:funkce".
+    '''
+    if name in POLICIES:
+        return POLICIES[name]
+    if ":" not in name:
+        raise ValueError("unknown policy \"%s\"" % name)
+    moduleName, functionName = name.split(":", 1)
+    return getattr(importlib.import_module(moduleName), functionName)
+
+
+
+def applyPlacement(engine, placement):
+    '''
+    Přesune padající tetromino do zadaného umístění (natočení, x) a nechá jej
+    spadnout až na dno jedním posunem o dropDistance(). Vrací události
+    vzniklé jeho umístěním.
+    '''
+    if placement:
+        bot.moveToPlacement(engine, *placement)
+    return engine.hardDrop()
+
+
+
+def playGame(task):
+    '''
+    Odehraje jednu hru bez GUI a vrátí slovník s jejím výsledkem.
+    task je n-tice (číslo hry, seed, jméno strategie, max. počet tetromin,
+    počet skórování na level).
+    '''
+    gameIndex, seed, policyName, maxPieces, destructionsToLevelUp = task
+
+    # globální generátor slouží jen strategiím, tetromina generuje engine sám
+    random.seed(seed)
+    policy = resolvePolicy(policyName)
+    engine = GameEngine(seed=seed)
+    gameScore = GameScore(destructionsToLevelUp)
+    pieces = 0
+
+    # první krok vygeneruje tetromino
+    engine.step()
+    while engine.phase != GamePhase.GameOver and pieces < maxPieces:
+        pieces += 1
+        for name, arg in applyPlacement(engine, policy(engine)):
+            if name == GameEvent.Scored:
+                gameScore.scored(arg)
+        engine.step()
+
+    return {
+        "game": gameIndex,
+        "seed": seed,
+        "score": gameScore.score,
+        "lines": gameScore.lines,
+        "level": gameScore.level,
+        "pieces": pieces,
+    }
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dávkové hraní QTetrisu bez GUI.")
+    parser.add_argument("-n", "--games", type=int, default=100, help="počet her")
+    parser.add_argument("--seed", type=int, default=0, help="seed první hry (další hry mají seed+1, ...)")
+    parser.add_argument("--policy", default="random", help="vestavěná strategie (%s) nebo modul:funkce" % ", ".join(sorted(POLICIES)))
+    parser.add_argument("--processes", type=int, default=os.cpu_count(), help="počet procesů (výchozí počet jader)")
+    parser.add_argument("--max-pieces", type=int, default=100000, help="maximální počet tetromin v jedné hře")
+    parser.add_argument("--destructions-to-level-up", type=int, default=GameScore.DESTRUCTIONS_TO_LEVEL_UP,
+            help="kolikrát je třeba skórovat, než se postoupí na další level")
+    parser.add_argument("-o", "--output", default="-", help="soubor pro výsledky v JSONL (výchozí stdout)")
+    args = parser.parse_args(argv)
+
+    # neplatnou strategii ohlásíme hned, ne až v procesech
+    resolvePolicy(args.policy)
+
+    tasks = [(i, args.seed + i, args.policy, args.max_pieces, args.destructions_to_level_up)
+             for i in range(args.games)]
+    # velikost dávky volíme tak, aby každý proces dostal několik dávek
+    chunkSize = max(1, args.games // (args.processes * 8))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    games = pieces = score = 0
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.processes) as pool:
+            for result in pool.imap_unordered(playGame, tasks, chunkSize):
+                output.write(json.dumps(result) + "\n")
+                games += 1
+                pieces += result["pieces"]
+                score += result["score"]
+    finally:
+        if output is not sys.stdout: output.close()
+    elapsed = time.perf_counter() - start
+
+    print("games: %d, pieces: %d, mean score: %.1f" % (games, pieces, score / max(1, games)), file=sys.stderr)
+    print("%.1f games/s, %.0f pieces/s (%.2f s, %d processes)"
+          % (games / elapsed, pieces / elapsed, elapsed, args.processes), file=sys.stderr)
+    return 0
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())
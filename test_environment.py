@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Test Environment                                                     #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#           NumPy                                                              #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Testy prostředí s mnoha hrami (environment.py): pád tetromin celé dávky      #
+# se porovnává s GameEngine.hardDrop() na stejných deskách.                    #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python -m pytest test_environment.py                                     #
+#                                                                              #
+################################################################################
+
+
+
+import random
+import unittest
+
+import numpy
+
+from engine import GameEngine, GamePhase
+import environment
+
+
+
+class HardDropTest(unittest.TestCase):
+
+    def randomEngine(self, rng, width, height, seed):
+        '''
+        Vrací engine s náhodně zaplněnou deskou (včetně převisů) a padajícím
+        tetrominem v náhodné výšce, případně None, pokud hra skončila.
+        '''
+        engine = GameEngine(width, height, seed=seed)
+        for piece in range(rng.randrange(12)):
+            engine.step()
+            for i in range(rng.randrange(4)):
+                engine.move(rng.choice((-1, 1)), 0)
+                engine.rotate()
+            # tetromino občas jen spustíme a posuneme stranou => převisy
+            for i in range(rng.randrange(height)):
+                engine.move(0, -1)
+            engine.move(rng.choice((-1, 1)), 0)
+            engine.hardDrop()
+        engine.step()
+        if engine.phase != GamePhase.Falling or not engine.currentTetrominoe:
+            return None
+        for i in range(rng.randrange(height)):
+            engine.move(0, -1)
+        for i in range(rng.randrange(4)):
+            engine.move(rng.choice((-1, 1)), 0)
+        return engine
+
+
+    def test_matchesEngine(self):
+        for seed in range(40):
+            rng = random.Random(seed)
+            width, height = rng.choice(((10, 19), (4, 8), (13, 30), (7, 5)))
+            engines = []
+            while len(engines) < 24:
+                engine = self.randomEngine(rng, width, height, rng.randrange(10 ** 6))
+                if engine:
+                    engines.append(engine)
+
+            env = environment.BatchEnvironment(len(engines), width, height, seed=seed)
+            padding = env.PADDING
+            for index, engine in enumerate(engines):
+                for y, row in enumerate(engine.rows):
+                    env.board[index, padding + y] = env.emptyRow | (row << padding)
+                tetrominoe = engine.currentTetrominoe
+                env.shape[index] = tetrominoe.shape
+                env.rotation[index] = tetrominoe.rotation
+                env.x[index], env.y[index] = engine.currentPosition
+
+            # jen část her (i s první), ať se zkouší i indexy vybraných her
+            games = numpy.array(sorted({0} | set(rng.sample(range(len(engines)), len(engines) // 2))))
+            env.hardDrop(games)
+            rewards = numpy.zeros(len(engines), dtype=numpy.int64)
+            env.lock(games, rewards)
+            rows = env.rows()
+            for index in games:
+                engine = engines[index]
+                x, y = engine.currentPosition
+                expectedY = y
+                while engine.canPlaceTetrominoe(engine.currentTetrominoe, (x, expectedY - 1)):
+                    expectedY -= 1
+                self.assertEqual(int(env.y[index]), expectedY, (seed, index))
+                engine.hardDrop()
+                self.assertEqual([int(row) for row in rows[index]], engine.rows, (seed, index))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Test Evaluation                                                      #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#           NumPy                                                              #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Testy dávkového ohodnocení desek (evaluation.py): na náhodných deskách        #
+# a v hrách se seedem se porovnává se skalárním boardFeatures() a bot.Bot.     #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python -m pytest test_evaluation.py                                      #
+#                                                                              #
+################################################################################
+
+
+
+import random
+import unittest
+
+import numpy
+
+from engine import GameEngine, GamePhase, Tetrominoe
+import evaluation
+import bot
+
+
+
+class EvaluationTest(unittest.TestCase):
+
+    def randomBoards(self, rng, count, width, height):
+        # desky s náhodnou výškou zdi, dírami a občas plnými řádky
+        fullRow = (1 << width) - 1
+        boards = []
+        for i in range(count):
+            top = rng.randrange(height + 1)
+            density = rng.random()
+            board = []
+            for y in range(height):
+                if y >= top:
+                    board.append(0)
+                elif rng.random() < 0.15:
+                    board.append(fullRow)
+                else:
+                    board.append(sum(1 << x for x in range(width) if rng.random() < density))
+            boards.append(board)
+        return boards
+
+
+    def test_featuresMatchScalar(self):
+        rng = random.Random(8)
+        for width, height in ((10, 19), (4, 6), (1, 5), (17, 25), (evaluation.MAX_WIDTH, 8)):
+            boards = self.randomBoards(rng, 200, width, height)
+            features = evaluation.evaluateBoards(numpy.array(boards, dtype=numpy.int64), width)
+            cells = evaluation.rowsToCells(boards, width)
+            fromCells = evaluation.evaluateBoards(cells)
+            for index, board in enumerate(boards):
+                expected = evaluation.boardFeatures(board, width)
+                for name in evaluation.FEATURES:
+                    self.assertEqual(int(features[name][index]), expected[name], (width, height, index, name))
+                    self.assertEqual(int(fromCells[name][index]), expected[name])
+
+
+    def test_candidatesMatchBot(self):
+        player = bot.Bot()
+        for seed in range(20):
+            rng = random.Random(seed)
+            engine = GameEngine(seed=seed)
+            for piece in range(60):
+                engine.step()
+                if engine.phase == GamePhase.GameOver:
+                    break
+                placement = player.bestPlacement(engine)
+                self.assertEqual(evaluation.bestPlacement(engine), placement)
+
+                placements, boards = evaluation.candidateBoards(engine)
+                features = evaluation.evaluateBoards(boards, engine.width)
+                points = Tetrominoe.rotationsTable[engine.currentTetrominoe.shape]
+                expected = [bot.placementFeatures(engine.rows, engine.width, points[rotation], x, y)
+                            for rotation, x, y in bot.enumeratePlacements(engine, engine.currentTetrominoe.shape)]
+                self.assertEqual(len(placements), len(expected))
+                for index, values in enumerate(expected):
+                    self.assertEqual(tuple(int(features[name][index]) for name in evaluation.FEATURES[:4]), values)
+
+                # občas náhodné umístění, aby desky nebyly jen "hezké"
+                if not placement or rng.random() < 0.3:
+                    placement = (rng.randrange(4), rng.randrange(engine.width))
+                bot.moveToPlacement(engine, *placement)
+                engine.hardDrop()
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Test Highscores                                                      #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Náhodné testy žebříčku (highscores.py): bloky SortedRecords a Highscores     #
+# se porovnávají s obyčejným seznamem seřazeným funkcí sorted().               #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python -m pytest test_highscores.py                                      #
+#                                                                              #
+################################################################################
+
+
+
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+import highscores
+
+
+
+class SmallRecords(highscores.SortedRecords):
+    # malé bloky => časté dělení a zánik bloků
+    LOAD = 3
+
+
+
+class SortedRecordsTest(unittest.TestCase):
+
+    def reference(self, records):
+        # stabilní seřazení sestupně podle skóre (stejná skóre v pořadí vložení)
+        return sorted(records, key=lambda record: -record[1])
+
+
+    def check(self, records, expected, rng):
+        self.assertEqual(len(records), len(expected))
+        self.assertEqual(list(records), expected)
+        if expected:
+            self.assertEqual(records.last(), expected[-1])
+        for index in range(-len(expected), len(expected)):
+            self.assertEqual(records[index], expected[index])
+        for index in (len(expected), -len(expected) - 1):
+            self.assertRaises(IndexError, records.__getitem__, index)
+        for i in range(5):
+            start = rng.randrange(-len(expected) - 3, len(expected) + 4)
+            stop = rng.randrange(-len(expected) - 3, len(expected) + 4)
+            step = rng.choice((None, 1, 2, -1))
+            self.assertEqual(records[start:stop:step], expected[start:stop:step])
+        self.assertEqual(records[:], expected)
+
+
+    def test_randomOperations(self):
+        for seed in range(300):
+            rng = random.Random(seed)
+            initial = self.reference(("init%d" % i, rng.randrange(20)) for i in range(rng.randrange(15)))
+            records = SmallRecords(initial)
+            expected = list(initial)
+            self.check(records, expected, rng)
+            for step in range(rng.randrange(1, 120)):
+                operation = rng.random()
+                if operation < 0.6:
+                    record = ("p%d" % step, rng.randrange(-5, 25))
+                    index = records.insert(record)
+                    expected = self.reference(expected + [record])
+                    self.assertEqual(expected[index], record)
+                    # stejná skóre => nový záznam za všemi dosavadními
+                    self.assertEqual(index, max(i for i, r in enumerate(expected) if r[1] == record[1]))
+                elif operation < 0.9:
+                    if not expected:
+                        self.assertRaises(IndexError, records.pop)
+                        continue
+                    self.assertEqual(records.pop(), expected.pop())
+                else:
+                    score = rng.randrange(-6, 26)
+                    self.assertEqual(records.bisectRight(score), sum(1 for r in expected if r[1] >= score))
+                self.check(records, expected, rng)
+
+
+    def test_largeTable(self):
+        # výchozí velikost bloků s několika děleními
+        rng = random.Random(1)
+        records = highscores.SortedRecords()
+        expected = []
+        for i in range(5000):
+            record = ("p%d" % i, rng.randrange(1000))
+            records.insert(record)
+            expected.append(record)
+        expected = self.reference(expected)
+        self.assertEqual(list(records), expected)
+        for i in range(200):
+            index = rng.randrange(len(expected))
+            self.assertEqual(records[index], expected[index])
+            self.assertEqual(records[index:index + 50], expected[index:index + 50])
+
+
+
+class HighscoresTest(unittest.TestCase):
+
+    def test_addHighscore(self):
+        for seed in range(50):
+            rng = random.Random(seed)
+            maxRecords = rng.randrange(1, 40)
+            table = highscores.Highscores(maxRecords)
+            table.records = SmallRecords()
+            expected = []
+            for i in range(200):
+                name, score = "p%d" % rng.randrange(6), rng.randrange(50)
+                rank = sum(1 for r in expected if r[1] >= score) + 1
+                self.assertEqual(table.rank(score), rank)
+                self.assertEqual(table.isNewHighscore(score), rank <= maxRecords)
+                if rank > maxRecords:
+                    self.assertIsNone(table.addHighscore(name, score))
+                    continue
+                self.assertEqual(table.addHighscore(name, score), rank)
+                expected.insert(rank - 1, (name, score))
+                del expected[maxRecords:]
+                self.assertEqual(list(table.records), expected)
+                for player in set(name for name, score in expected):
+                    self.assertEqual(table.bestScore(player), max(s for n, s in expected if n == player))
+            self.assertEqual(table.page(0, maxRecords).count("\n") + 1, len(expected))
+
+
+    def test_migrationRetry(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        fileName = os.path.join(directory.name, "highscores.db")
+        legacyFileName = os.path.join(directory.name, "highscores.txt")
+        source = highscores.Highscores(10)
+        for i in range(15):
+            source.addHighscore("p%d" % i, i * 7 % 11)
+        source.exportData(legacyFileName)
+        with open(legacyFileName, "rb") as file:
+            valid = file.read()
+
+        # poškozený soubor => převod se odvolá, databáze zůstane bez záznamů
+        with open(legacyFileName, "wb") as file:
+            file.write(valid[:len(valid) // 2])
+        table = highscores.Highscores(10)
+        table.open(fileName, legacyFileName)
+        self.assertIsNone(table.storage)
+        self.assertEqual(list(table.records), [])
+        connection = sqlite3.connect(fileName)
+        self.assertEqual(connection.execute("SELECT name FROM sqlite_master").fetchall(), [])
+        connection.close()
+
+        # opravený soubor se při dalším otevření převede
+        with open(legacyFileName, "wb") as file:
+            file.write(valid)
+        table = highscores.Highscores(10)
+        table.open(fileName, legacyFileName)
+        self.assertEqual(list(table.records), list(source.records))
+        table.addHighscore("novy", 100)
+        table.close()
+
+        # převedená databáze se už znovu nepřevádí
+        table = highscores.Highscores(10)
+        table.open(fileName, legacyFileName)
+        self.assertEqual(table.records[0], ("novy", 100))
+        self.assertEqual(len(table.records), 10)
+        table.close()
+
+
+
+if __name__ == "__main__":
+    unittest.main()
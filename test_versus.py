@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Test Versus                                                          #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Testy hry více hráčů (versus.py) přes skutečná TCP spojení na localhostu     #
+# s libovolnými volnými porty; nepotřebují PyQt4.                              #
+#                                                                              #
+# Použití:                                                                     #
+#   $ python -m pytest test_versus.py                                          #
+#                                                                              #
+################################################################################
+
+
+
+import time
+import unittest
+
+from engine import GameEngine, GamePhase, GameScore
+import versus
+
+
+
+class VersusTest(unittest.TestCase):
+
+    # nejvyšší povolený průměrný tok dat jednoho hráče v bajtech za sekundu
+    BYTES_PER_SECOND = 1024
+    TIMEOUT = 5.0
+
+
+    def connect(self, players):
+        '''
+        Vrací seznam players her (VersusGame) s prázdnými deskami, host je
+        první; hry jsou propojené a každá už zrcadlí všechny soupeře.
+        '''
+        host = versus.VersusPeer.host((versus.HOST, 0))
+        peers = [host] + [versus.VersusPeer.join(host.address) for i in range(players - 1)]
+        games = [versus.VersusGame(peer, GameEngine(seed=i), i) for i, peer in enumerate(peers)]
+        for game in games:
+            self.addCleanup(game.close)
+        self.pump(games, lambda: all(len(game.mirrors) == players - 1 for game in games))
+        return games
+
+
+    def pump(self, games, condition):
+        # zpracovává zprávy všech her, dokud neplatí condition()
+        deadline = time.perf_counter() + self.TIMEOUT
+        while not condition():
+            self.assertLess(time.perf_counter(), deadline, "messages were not delivered in time")
+            for game in games:
+                game.update()
+
+
+    def garbage(self, game):
+        return sum(count for count, hole in game.engine.pendingGarbage)
+
+
+    def test_mirrorsMatchBoards(self):
+        bots, frames = versus.playMatch(4, 600 * GameScore.FRAME_RATE, 3)
+        self.assertGreater(sum(player.gameScore.lines for player in bots), 0)
+        for index, player in enumerate(bots):
+            for other in bots:
+                if other is player:
+                    continue
+                mirror = other.versus.mirrors[index]
+                self.assertEqual(mirror.colors, player.engine.colors)
+                self.assertEqual(versus.piece(mirror), versus.piece(player.engine))
+        # prohry hráčů se dozvěděli všichni soupeři
+        for index, player in enumerate(bots):
+            lost = {other for other, opponent in enumerate(bots)
+                    if opponent is not player and opponent.engine.phase == GamePhase.GameOver}
+            self.assertEqual(player.versus.lost, lost)
+
+
+    def test_garbageLines(self):
+        games = self.connect(3)
+        # zbořené řádky => řádky odpadu každému soupeři
+        for sender, lines, expected in ((0, 1, 0), (0, 2, 1), (1, 3, 2), (2, 4, 4)):
+            before = [self.garbage(game) for game in games]
+            games[sender].scored(lines)
+            targets = [i for i in range(len(games)) if i != sender]
+            self.pump(games, lambda: all(self.garbage(games[i]) == before[i] + expected for i in targets))
+            self.assertEqual(self.garbage(games[sender]), before[sender])
+            for game in games:
+                game.update()
+            self.assertEqual([self.garbage(game) for game in games],
+                             [before[i] + (expected if i in targets else 0) for i in range(len(games))])
+        self.assertEqual([game.garbageSent for game in games], [1, 2, 4])
+        self.assertEqual([game.garbageReceived for game in games], [6, 5, 3])
+
+        # odpad se na desku dostane před dalším tetrominem, díra zůstane prázdná
+        engine = games[1].engine
+        engine.currentTetrominoe = None
+        engine.spawn()
+        for y in range(5):
+            self.assertEqual(bin(engine.rows[y]).count("1"), engine.width - 1)
+        self.assertEqual(len(set(engine.rows[:4])), 1)
+        self.assertEqual(engine.pendingGarbage, [])
+
+
+    def test_invalidBoardSize(self):
+        games = self.connect(2)
+        # hráč s nepřípustnou deskou se vyřadí, platné ohlášení jej vrátí
+        for width, height in ((0, 19), (10, 0), (GameEngine.MAX_WIDTH + 1, 19), (10, 10 ** 9)):
+            data = bytearray()
+            versus.encodeVarint(width, data)
+            versus.encodeVarint(height, data)
+            games[1].peer.send(versus.MSG_JOIN, bytes(data))
+            self.pump(games, lambda: 1 not in games[0].mirrors)
+            games[1].newGame()
+            self.pump(games, lambda: 1 in games[0].mirrors)
+            self.assertEqual((games[0].mirrors[1].width, games[0].mirrors[1].height), (10, 19))
+
+
+    def test_invalidPiece(self):
+        engine = GameEngine()
+        engine.step()
+        encoded = versus.StateEncoder(engine).encode()
+        mirror = GameEngine(seed=1)
+        versus.applyState(mirror, encoded)
+        self.assertEqual(versus.piece(mirror), versus.piece(engine))
+        shape, rotation, x, y = versus.piece(engine)
+
+        def state(value, x, y):
+            data = bytearray((versus.STATE_PIECE, value))
+            versus.encodeVarint(x, data)
+            versus.encodeVarint(y, data)
+            return bytes(data)
+        # tvar 0 s nenulovým natočením, tetromino mimo desku
+        for data in (state(1, x, y), state(shape << 2 | rotation, engine.width, y),
+                     state(shape << 2 | rotation, x, engine.height), state(shape << 2 | rotation, 0, y),
+                     state(shape << 2 | rotation, x, 0)):
+            self.assertRaises(versus.VersusError, versus.applyState, GameEngine(), data)
+        # tetromino, kterým hra skončila, smí přesahovat vrchol desky
+        versus.applyState(mirror, state(shape << 2 | rotation, x, engine.height - 1))
+
+
+    def test_bandwidth(self):
+        bots, frames = versus.playMatch(3, 300 * GameScore.FRAME_RATE, 7)
+        seconds = frames / GameScore.FRAME_RATE
+        for player in bots:
+            peer = player.versus.peer
+            self.assertLess(peer.bytesSent / seconds, self.BYTES_PER_SECOND)
+            if not peer.server:
+                # klient přijímá data všech soupeřů
+                self.assertLess(peer.bytesReceived / seconds, self.BYTES_PER_SECOND * (len(bots) - 1))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,735 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+################################################################################
+#                                                                              #
+# Name:   Versus                                                               #
+#                                                                              #
+#                                                                              #
+# Requires: Python 3                                                           #
+#                                                                              #
+#                                                                              #
+# Desription:                                                                  #
+# ----------                                                                   #
+# Hra více hráčů proti sobě po TCP (v LAN nebo na localhostu). Jeden hráč hru  #
+# hostí (VersusPeer.host), ostatní se k němu připojí (VersusPeer.join) a host  #
+# přeposílá zprávy každého hráče všem ostatním. Zbourá-li hráč víc řádků       #
+# najednou, pošle soupeřům řádky odpadu (GARBAGE_LINES). Desky soupeřů se      #
+# zrcadlí živě: StateEncoder posílá jen změněné řádky a padající tetromino,    #
+# applyState() je zapisuje do enginu zrcadla, který sám nehraje.               #
+#                                                                              #
+# Protokol: zpráva začíná délkou těla (varint), tělo je typ zprávy (1 B),      #
+# číslo hráče (1 B, u zpráv od klientů jej doplní host) a data:                #
+#   MSG_JOIN     šířka a výška desky (varint); hráč se připojil / nová hra     #
+#   MSG_STATE    příznaky (1 B), [počet řádků, (y, barvy po 4 bitech)...],     #
+#                [tvar << 2 | natočení (1 B), x, y] (tvar 0 => nic nepadá)     #
+#   MSG_GARBAGE  počet řádků odpadu, sloupec díry                              #
+#   MSG_OVER     hráč prohrál                                                  #
+#   MSG_LEAVE    hráč se odpojil                                               #
+#                                                                              #
+# Použití (zápas botů na localhostu, vypíše přenesená data na hráče):          #
+#   $ python versus.py --players 3 --seconds 60                                #
+# Hra v GUI:                                                                   #
+#   $ python qtetris.py --host 47600                                           #
+#   $ python qtetris.py --join 192.168.0.10:47600                              #
+#                                                                              #
+################################################################################
+
+
+
+import sys
+import time
+import random
+import socket
+import argparse
+import selectors
+
+from engine import GameEngine, GameEvent, GamePhase, GameScore, Tetrominoe, TetrominoeShape
+import bot
+
+
+
+
+HOST = "127.0.0.1"
+PORT = 47600
+# nejdelší přijímaná zpráva a nejvíce neodeslaných dat jednomu spojení v bajtech
+MAX_MESSAGE = 64 * 1024
+MAX_BACKLOG = 1024 * 1024
+# nejvíce hráčů včetně hosta (číslo hráče se posílá v jednom bajtu)
+MAX_PLAYERS = 16
+
+# typy zpráv
+MSG_JOIN = 1
+MSG_STATE = 2
+MSG_GARBAGE = 3
+MSG_OVER = 4
+MSG_LEAVE = 5
+
+# příznaky zprávy MSG_STATE: obsahuje změněné řádky / padající tetromino
+STATE_ROWS = 1
+STATE_PIECE = 2
+
+# číslo hráče hosta, připojení hráči dostávají čísla od 1
+HOST_PLAYER = 0
+
+# počet řádků odpadu poslaných soupeřům podle počtu najednou zbouraných řádků
+GARBAGE_LINES = (0, 0, 1, 2, 4)
+
+
+
+class VersusError(Exception):
+    pass
+
+
+
+def encodeVarint(value, data):
+    # varint jako v replay.py: 7 bitů na bajt, nejvyšší bit značí pokračování
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def decodeVarint(data, offset):
+    '''
+    Přečte varint z data od pozice offset. Vrací dvojici (hodnota, pozice
+    za varintem).
+    '''
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise VersusError("message is truncated")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset
+
+
+def frameMessage(kind, player, payload=b""):
+    # zpráva připravená k odeslání: délka těla, typ, číslo hráče a data
+    data = bytearray()
+    encodeVarint(2 + len(payload), data)
+    data.append(kind)
+    data.append(player)
+    data += payload
+    return data
+
+
+
+def piece(engine):
+    # padající tetromino jako (tvar, natočení, x, y), None => žádné nepadá
+    tetrominoe = engine.currentTetrominoe
+    return tetrominoe and (tetrominoe.shape, tetrominoe.rotation) + engine.currentPosition
+
+
+
+#############################################################################
+
+
+
+class StateEncoder(object):
+    '''
+        Delta kódování stavu desky pro zrcadla soupeřů. Pamatuje si, co už
+    odeslal (barvy řádků a padající tetromino), a encode() vrací jen změny
+    od minula. Řádek se posílá celý, barvy políček po 4 bitech, takže řádek
+    standardní desky zabere i s y-ovou souřadnicí 6 bajtů. Porovnávají se jen
+    řádky pod vrcholem nejvyššího sloupce (teď nebo při minulém odeslání).
+        Během animace mazání řádků se řádky neposílají (blikání by jen
+    zabíralo přenos), odejdou až po smazání.
+    '''
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.reset()
+
+
+    def reset(self):
+        '''
+        Zapomene odeslaný stav; příští encode() pošle všechny neprázdné řádky
+        (zrcadlo nového hráče začíná s prázdnou deskou).
+        '''
+        empty = [TetrominoeShape.NoShape] * self.engine.width
+        self.sentRows = [empty] * self.engine.height
+        # nad touto výškou byly odeslány jen prázdné řádky
+        self.sentTop = 0
+        # odeslané tetromino (tvar, natočení, x, y), None => žádné nepadá
+        self.sentPiece = None
+
+
+    def encode(self):
+        '''
+        Vrátí data zprávy MSG_STATE se změnami od minulého volání, případně
+        None, pokud se nic nezměnilo.
+        '''
+        engine = self.engine
+        data = bytearray(1)
+
+        if engine.phase != GamePhase.Clearing:
+            top = max(engine.columnHeights)
+            colors = engine.colors
+            changed = [y for y in range(max(top, self.sentTop)) if colors[y] != self.sentRows[y]]
+            if changed:
+                data[0] |= STATE_ROWS
+                encodeVarint(len(changed), data)
+                for y in changed:
+                    row = colors[y]
+                    encodeVarint(y, data)
+                    for x in range(0, engine.width, 2):
+                        data.append(row[x] | (row[x + 1] << 4 if x + 1 < engine.width else 0))
+                    self.sentRows[y] = list(row)
+            self.sentTop = top
+
+        current = piece(engine)
+        if current != self.sentPiece:
+            data[0] |= STATE_PIECE
+            if current:
+                shape, rotation, x, y = current
+                data.append(shape << 2 | rotation)
+                encodeVarint(x, data)
+                encodeVarint(y, data)
+            else:
+                data.append(0)
+            self.sentPiece = current
+
+        return bytes(data) if data[0] else None
+
+
+
+def applyState(engine, data):
+    '''
+    Zapíše změny z dat zprávy MSG_STATE do enginu zrcadla a změněná políčka
+    označí k překreslení.
+    '''
+    flags = data[0]
+    offset = 1
+    if flags & STATE_ROWS:
+        count, offset = decodeVarint(data, offset)
+        rowSize = (engine.width + 1) // 2
+        changed = []
+        for i in range(count):
+            y, offset = decodeVarint(data, offset)
+            packed = data[offset:offset + rowSize]
+            offset += rowSize
+            if y >= engine.height or len(packed) < rowSize:
+                raise VersusError("invalid row")
+            row = [packed[x >> 1] >> (x & 1) * 4 & 0xf for x in range(engine.width)]
+            if max(row) > TetrominoeShape.Garbage:
+                raise VersusError("invalid cell color")
+            engine.colors[y] = row
+            engine.rows[y] = sum(1 << x for x, color in enumerate(row) if color)
+            changed.append(y)
+        engine.markRowsDirty(changed)
+        for x in range(engine.width):
+            height = engine.height
+            while height and not engine.rows[height - 1] >> x & 1:
+                height -= 1
+            engine.columnHeights[x] = height
+
+    if flags & STATE_PIECE:
+        if offset >= len(data):
+            raise VersusError("message is truncated")
+        value = data[offset]
+        offset += 1
+        if engine.currentTetrominoe:
+            engine.markTetrominoeDirty()
+        engine.currentTetrominoe = None
+        if value:
+            shape = value >> 2
+            if not 1 <= shape <= TetrominoeShape.count:
+                raise VersusError("invalid tetrominoe")
+            tetrominoe = Tetrominoe(shape=shape, rotation=value & 3)
+            x, offset = decodeVarint(data, offset)
+            y, offset = decodeVarint(data, offset)
+            # tetromino, kterým hra skončila, smí přesahovat vrchol desky
+            # (kreslí se jen výřez), jinak musí ležet na desce
+            if not 0 <= y < engine.height or not all(0 <= x + pointX < engine.width and y + pointY >= 0
+                                                       for pointX, pointY in tetrominoe.points):
+                raise VersusError("tetrominoe out of board")
+            engine.currentTetrominoe = tetrominoe
+            engine.currentPosition = (x, y)
+            engine.markTetrominoeDirty()
+
+
+
+#############################################################################
+
+
+
+class Connection(object):
+    '''
+    Jedno TCP spojení: přijatá data čekající na celou zprávu a data čekající
+    na odeslání. Na straně hosta má spojení přidělené číslo hráče.
+    '''
+
+    def __init__(self, sock, player=None):
+        self.socket = sock
+        self.player = player
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+
+
+    def takeMessages(self):
+        '''
+        Vyjme z přijatých dat všechny celé zprávy a vrátí jejich těla.
+        '''
+        inbox = self.inbox
+        bodies = []
+        offset = 0
+        while offset < len(inbox):
+            end = offset
+            while end < len(inbox) and inbox[end] & 0x80:
+                end += 1
+            if end >= len(inbox):
+                # délka ještě nedorazila celá
+                break
+            length, start = decodeVarint(inbox, offset)
+            if not 2 <= length <= MAX_MESSAGE:
+                raise VersusError("invalid message length")
+            if start + length > len(inbox):
+                break
+            bodies.append(bytes(inbox[start:start + length]))
+            offset = start + length
+        del inbox[:offset]
+        if len(inbox) > MAX_MESSAGE + 3:
+            raise VersusError("invalid message length")
+        return bodies
+
+
+
+class VersusPeer(object):
+    '''
+        Síťová část hry: neblokující TCP spojení obsluhovaná z poll(), které
+    se volá z hlavní smyčky hry (v GUI z časovače), takže nepotřebuje žádné
+    vlákno. Host přijímá spojení ostatních hráčů a jejich zprávy přeposílá
+    všem ostatním, klient má jediné spojení s hostem.
+        Host si pamatuje poslední MSG_JOIN každého hráče a nově připojenému
+    je pošle hned po připojení; o odpojení hráče dá ostatním vědět MSG_LEAVE.
+    '''
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        # naslouchající socket hosta (u klienta None)
+        self.server = None
+        self.connections = []
+        # číslo vlastního hráče; klientovi jej doplňuje host
+        self.player = None
+        self.nextPlayer = HOST_PLAYER + 1
+        # data poslední zprávy MSG_JOIN známých hráčů {číslo hráče: data}
+        self.joins = {}
+        # vlastní odeslaná data, data přeposlaná hostem a všechna přijatá data v bajtech
+        self.bytesSent = 0
+        self.bytesRelayed = 0
+        self.bytesReceived = 0
+
+
+    @classmethod
+    def host(cls, address=("", PORT)):
+        '''
+        Začne hostit hru na adrese address (port 0 => libovolný volný).
+        '''
+        peer = cls()
+        peer.player = HOST_PLAYER
+        peer.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        peer.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        peer.server.bind(address)
+        peer.server.listen(MAX_PLAYERS)
+        peer.server.setblocking(False)
+        peer.selector.register(peer.server, selectors.EVENT_READ)
+        return peer
+
+
+    @classmethod
+    def join(cls, address, timeout=5.0):
+        '''
+        Připojí se ke hře hostované na adrese address.
+        '''
+        peer = cls()
+        sock = socket.create_connection(address, timeout)
+        peer.register(Connection(sock))
+        return peer
+
+
+    @property
+    def address(self):
+        # adresa, na které host naslouchá
+        return self.server.getsockname()
+
+
+    def register(self, connection):
+        connection.socket.setblocking(False)
+        connection.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.selector.register(connection.socket, selectors.EVENT_READ, connection)
+        self.connections.append(connection)
+
+
+    def send(self, kind, payload=b""):
+        '''
+        Pošle zprávu všem ostatním hráčům (klient hostovi, který ji přepošle).
+        Data se odesílají hned, co nejde odeslat, odejde z poll().
+        '''
+        message = frameMessage(kind, self.player or 0, payload)
+        if kind == MSG_JOIN and self.server:
+            self.joins[self.player] = payload
+        self.bytesSent += len(message)
+        for connection in self.connections:
+            connection.outbox += message
+        self.flush()
+
+
+    def relay(self, message, source):
+        # host přepošle zprávu hráče source všem ostatním
+        for connection in self.connections:
+            if connection is not source:
+                connection.outbox += message
+                self.bytesRelayed += len(message)
+
+
+    def poll(self):
+        '''
+        Přijme nová spojení a data a odešle, co čeká na odeslání. Vrací
+        seznam přijatých zpráv jako trojic (typ, číslo hráče, data).
+        '''
+        messages = []
+        for key, mask in self.selector.select(0):
+            if key.fileobj is self.server:
+                self.accept()
+            else:
+                messages.extend(self.receive(key.data))
+        messages.extend(self.flush())
+        return messages
+
+
+    def accept(self):
+        try:
+            sock, address = self.server.accept()
+        except BlockingIOError:
+            return
+        if len(self.connections) + 1 >= MAX_PLAYERS or self.nextPlayer > 255:
+            sock.close()
+            return
+        connection = Connection(sock, self.nextPlayer)
+        self.nextPlayer += 1
+        self.register(connection)
+        # nový hráč se dozví o všech, kdo už hrají
+        for player, payload in self.joins.items():
+            connection.outbox += frameMessage(MSG_JOIN, player, payload)
+
+
+    def receive(self, connection):
+        try:
+            data = connection.socket.recv(MAX_MESSAGE)
+        except BlockingIOError:
+            return []
+        except OSError:
+            data = b""
+        if not data:
+            return self.disconnect(connection)
+        self.bytesReceived += len(data)
+        connection.inbox += data
+        try:
+            bodies = connection.takeMessages()
+        except VersusError:
+            return self.disconnect(connection)
+
+        messages = []
+        for body in bodies:
+            kind, player, payload = body[0], body[1], body[2:]
+            if self.server:
+                # zprávy klientů se označí číslem jejich hráče a přepošlou ostatním
+                player = connection.player
+                if kind == MSG_LEAVE:
+                    continue
+                self.relay(frameMessage(kind, player, payload), connection)
+            if kind == MSG_JOIN:
+                self.joins[player] = payload
+            elif kind == MSG_LEAVE:
+                self.joins.pop(player, None)
+            messages.append((kind, player, payload))
+        return messages
+
+
+    def flush(self):
+        # odešle z bufferů spojení, co socket přijme; vrací zprávy o odpojení
+        messages = []
+        for connection in list(self.connections):
+            if not connection.outbox:
+                continue
+            try:
+                sent = connection.socket.send(connection.outbox)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                messages.extend(self.disconnect(connection))
+                continue
+            del connection.outbox[:sent]
+            if len(connection.outbox) > MAX_BACKLOG:
+                # hráč data nepřijímá
+                messages.extend(self.disconnect(connection))
+        return messages
+
+
+    def disconnect(self, connection):
+        '''
+        Uzavře spojení a vrátí zprávy MSG_LEAVE za hráče, kteří jím odešli.
+        '''
+        self.selector.unregister(connection.socket)
+        connection.socket.close()
+        self.connections.remove(connection)
+        if self.server:
+            if connection.player not in self.joins:
+                return []
+            del self.joins[connection.player]
+            self.relay(frameMessage(MSG_LEAVE, connection.player), None)
+            return [(MSG_LEAVE, connection.player, b"")]
+        # skončilo spojení s hostem => odešli všichni soupeři
+        messages = [(MSG_LEAVE, player, b"") for player in self.joins]
+        self.joins = {}
+        return messages
+
+
+    def close(self):
+        for connection in list(self.connections):
+            self.selector.unregister(connection.socket)
+            connection.socket.close()
+        self.connections = []
+        if self.server:
+            self.selector.unregister(self.server)
+            self.server.close()
+            self.server = None
+        self.selector.close()
+
+
+
+#############################################################################
+
+
+
+class VersusGame(object):
+    '''
+        Hra jednoho hráče proti soupeřům: propojuje vlastní engine s VersusPeer.
+    Odesílá změny vlastní desky, posílá a přijímá řádky odpadu a drží zrcadla
+    desek soupeřů (GameEngine, který sám nehraje, jen se do něj zapisuje stav
+    ze zpráv MSG_STATE).
+        Přijatý odpad se v enginu jen zařadí, na desku se dostane až před
+    dalším tetrominem (viz GameEngine.addGarbage()).
+    '''
+
+    def __init__(self, peer, engine, seed=None):
+        self.peer = peer
+        self.engine = engine
+        self.encoder = StateEncoder(engine)
+        # sloupce děr v posílaném odpadu
+        self.random = random.Random(seed)
+        # zrcadla desek soupeřů {číslo hráče: GameEngine} a soupeři, kteří prohráli
+        self.mirrors = {}
+        self.lost = set()
+        # počet poslaných a přijatých řádků odpadu
+        self.garbageSent = 0
+        self.garbageReceived = 0
+        self.newGame()
+
+
+    def newGame(self):
+        # ohlásí soupeřům (novou) hru; zrcadla začnou s prázdnou deskou
+        data = bytearray()
+        encodeVarint(self.engine.width, data)
+        encodeVarint(self.engine.height, data)
+        self.peer.send(MSG_JOIN, bytes(data))
+        self.encoder.reset()
+
+
+    def scored(self, linesCount):
+        '''
+        Hráč zbořil linesCount řádků; soupeřům se pošle odpad podle GARBAGE_LINES.
+        '''
+        count = GARBAGE_LINES[min(linesCount, len(GARBAGE_LINES) - 1)]
+        if count and self.mirrors:
+            data = bytearray()
+            encodeVarint(count, data)
+            encodeVarint(self.random.randrange(self.engine.width), data)
+            self.peer.send(MSG_GARBAGE, bytes(data))
+            self.garbageSent += count
+
+
+    def gameOver(self):
+        self.peer.send(MSG_OVER)
+
+
+    def update(self):
+        '''
+        Síťová část jednoho snímku: zpracuje přijaté zprávy a odešle změny
+        vlastní desky. Vrací množinu čísel hráčů, jejichž zrcadlo se změnilo,
+        přibylo nebo zmizelo.
+        '''
+        changed = set()
+        for kind, player, payload in self.peer.poll():
+            try:
+                if kind == MSG_JOIN:
+                    width, offset = decodeVarint(payload, 0)
+                    height, offset = decodeVarint(payload, offset)
+                    if not (1 <= width <= GameEngine.MAX_WIDTH and 1 <= height <= GameEngine.MAX_HEIGHT):
+                        raise VersusError("invalid board size %dx%d" % (width, height))
+                    mirror = self.mirrors.get(player)
+                    if mirror is None:
+                        # nový soupeř potřebuje celou desku
+                        self.encoder.reset()
+                    if mirror and (mirror.width, mirror.height) == (width, height):
+                        # soupeř začal novou hru, zrcadlo zůstává
+                        mirror.clear()
+                    else:
+                        self.mirrors[player] = GameEngine(width, height)
+                    self.lost.discard(player)
+                elif player not in self.mirrors:
+                    continue
+                elif kind == MSG_STATE:
+                    applyState(self.mirrors[player], payload)
+                elif kind == MSG_GARBAGE:
+                    count, offset = decodeVarint(payload, 0)
+                    hole, offset = decodeVarint(payload, offset)
+                    self.engine.addGarbage(count, hole)
+                    self.garbageReceived += count
+                elif kind == MSG_OVER:
+                    self.lost.add(player)
+                elif kind == MSG_LEAVE:
+                    del self.mirrors[player]
+                    self.lost.discard(player)
+            except VersusError as e:
+                # zrcadlo mohlo zůstat napůl zapsané => hráče vyřadíme, dokud
+                # neohlásí novou hru
+                print("versus.py: invalid message from player %d: %s" % (player, e), file=sys.stderr)
+                self.mirrors.pop(player, None)
+                self.lost.discard(player)
+            changed.add(player)
+
+        state = self.encoder.encode()
+        if state:
+            self.peer.send(MSG_STATE, state)
+        return changed
+
+
+    def close(self):
+        self.peer.close()
+
+
+
+#############################################################################
+
+
+
+class BotPlayer(object):
+    '''
+    Hráč zápasu bez GUI: tetromina umisťuje bot.Bot, padají gravitací levelu
+    a ležící tetromino se umístí po LOCK_DELAY snímcích, stejně jako v QTetris.
+    '''
+
+    LOCK_DELAY = 30
+
+
+    def __init__(self, peer, seed):
+        self.engine = GameEngine(seed=seed)
+        self.gameScore = GameScore()
+        self.bot = bot.Bot()
+        self.versus = VersusGame(peer, self.engine, seed)
+        self.gravityAccumulator = 0
+        self.lockFrames = 0
+
+
+    def frame(self):
+        engine = self.engine
+        if engine.phase != GamePhase.GameOver:
+            cells, self.gravityAccumulator = divmod(self.gravityAccumulator + self.gameScore.gravity(),
+                    GameScore.GRAVITY_UNIT)
+            self.lockFrames = self.lockFrames + 1 if engine.isGrounded() else 0
+            lock = self.lockFrames >= self.LOCK_DELAY
+            if lock:
+                cells = max(cells, 1)
+            for name, arg in engine.fall(cells, lock) if cells else []:
+                if name == GameEvent.TetrominoeSpawned:
+                    placement = self.bot.bestPlacement(engine)
+                    if placement:
+                        bot.moveToPlacement(engine, *placement)
+                elif name == GameEvent.TetrominoeFell:
+                    self.gravityAccumulator = 0
+                    self.lockFrames = 0
+                elif name == GameEvent.Scored:
+                    self.gameScore.scored(arg)
+                    self.versus.scored(arg)
+                elif name == GameEvent.GameOver:
+                    self.versus.gameOver()
+        self.versus.update()
+
+
+
+def playMatch(players, frames, seed, port=0):
+    '''
+    Zápas players botů na localhostu přes skutečná TCP spojení, nejvýše
+    frames snímků (skončí dřív, zbude-li jediný hráč). Vrací dvojici
+    (boti, počet odehraných snímků); zrcadla desek jsou na konci dorovnaná.
+    '''
+    host = VersusPeer.host((HOST, port))
+    peers = [host] + [VersusPeer.join(host.address) for i in range(players - 1)]
+    bots = [BotPlayer(peer, seed + i) for i, peer in enumerate(peers)]
+    try:
+        frame = 0
+        while frame < frames:
+            frame += 1
+            for player in bots:
+                player.frame()
+            if sum(player.engine.phase != GamePhase.GameOver for player in bots) <= 1:
+                break
+        # doručení zpráv, které jsou ještě na cestě
+        deadline = time.perf_counter() + 1.0
+        while time.perf_counter() < deadline and not mirrorsInSync(bots):
+            for player in bots:
+                player.versus.update()
+        return bots, frame
+    finally:
+        for player in bots:
+            player.versus.close()
+
+
+def mirrorsInSync(bots):
+    # zrcadla všech hráčů odpovídají deskám, které zrcadlí
+    for index, player in enumerate(bots):
+        for other in bots:
+            if other is player:
+                continue
+            mirror = other.versus.mirrors.get(index)
+            if mirror is None or mirror.colors != player.engine.colors \
+                    or piece(mirror) != piece(player.engine):
+                return False
+    return True
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Zápas botů QTetrisu po TCP na localhostu.")
+    parser.add_argument("--players", type=int, default=3, help="počet hráčů")
+    parser.add_argument("--seconds", type=float, default=60, help="nejdelší doba zápasu v sekundách hry")
+    parser.add_argument("--seed", type=int, default=0, help="seed prvního hráče (další mají seed+1, ...)")
+    parser.add_argument("--port", type=int, default=0, help="port hosta (0 => libovolný volný)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    bots, frames = playMatch(args.players, int(args.seconds * GameScore.FRAME_RATE), args.seed, args.port)
+    elapsed = time.perf_counter() - start
+    seconds = frames / GameScore.FRAME_RATE
+
+    for index, player in enumerate(bots):
+        versus = player.versus
+        print("player %d: score %d, lines %d, garbage sent %d, received %d, %s, sent %.0f B/s"
+              % (index, player.gameScore.score, player.gameScore.lines, versus.garbageSent,
+                 versus.garbageReceived, "lost" if player.engine.phase == GamePhase.GameOver else "playing",
+                 versus.peer.bytesSent / seconds))
+    inSync = mirrorsInSync(bots)
+    print("%.1f s of game in %.2f s, mirrors %s" % (seconds, elapsed, "in sync" if inSync else "OUT OF SYNC"),
+          file=sys.stderr)
+    return 0 if inSync else 1
+
+
+
+if __name__ == "__main__":
+    sys.exit(main())